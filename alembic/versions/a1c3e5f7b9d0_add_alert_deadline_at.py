@@ -0,0 +1,64 @@
+"""add alert deadline_at and pending deadline index
+
+Revision ID: a1c3e5f7b9d0
+Revises:
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from config import ALERT_TIMEOUT_MINUTES
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f7b9d0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+PENDING_TRIGGER_WHERE = sa.text("om_type = '告警触发' AND processed = false AND timeout_triggered = false")
+SQLITE_PENDING_TRIGGER_WHERE = sa.text("om_type = '告警触发' AND processed = 0 AND timeout_triggered = 0")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() 可能已经按最新模型建表，已存在的列和索引不再重复创建
+    columns = {column["name"] for column in inspector.get_columns("alerts")}
+    if "deadline_at" not in columns:
+        op.add_column("alerts", sa.Column("deadline_at", sa.DateTime(), nullable=True))
+
+    # 回填已有"告警触发"的截止时间：告警时间 + ALERT_TIMEOUT_MINUTES
+    timeout_seconds = ALERT_TIMEOUT_MINUTES * 60
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            sa.text(
+                "UPDATE alerts SET deadline_at = time + (:seconds * interval '1 second') "
+                "WHERE om_type = '告警触发' AND deadline_at IS NULL"
+            ).bindparams(seconds=timeout_seconds)
+        )
+    else:
+        op.execute(
+            sa.text(
+                "UPDATE alerts SET deadline_at = datetime(time, '+' || :seconds || ' seconds') "
+                "WHERE om_type = '告警触发' AND deadline_at IS NULL"
+            ).bindparams(seconds=timeout_seconds)
+        )
+
+    indexes = {index["name"] for index in inspector.get_indexes("alerts")}
+    if "ix_alerts_pending_deadline" not in indexes:
+        op.create_index(
+            "ix_alerts_pending_deadline",
+            "alerts",
+            ["deadline_at"],
+            postgresql_where=PENDING_TRIGGER_WHERE,
+            sqlite_where=SQLITE_PENDING_TRIGGER_WHERE
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_alerts_pending_deadline", table_name="alerts")
+    op.drop_column("alerts", "deadline_at")
@@ -0,0 +1,52 @@
+"""add fields parsed from alert input as columns
+
+Revision ID: a7c9e1f3b5d6
+Revises: f6b8d0e2a4c5
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1f3b5d6'
+down_revision = 'f6b8d0e2a4c5'
+branch_labels = None
+depends_on = None
+
+
+PARSED_COLUMNS = [
+    sa.Column("region", sa.String(length=50), nullable=True),
+    sa.Column("metric", sa.String(length=100), nullable=True),
+    sa.Column("rule_name", sa.String(length=200), nullable=True),
+    sa.Column("generator_url", sa.Text(), nullable=True),
+    sa.Column("alert_summary", sa.Text(), nullable=True),
+    sa.Column("alert_details", sa.Text(), nullable=True),
+    sa.Column("script_name", sa.String(length=200), nullable=True),
+]
+INDEXED_COLUMNS = ["region", "metric", "rule_name"]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() 可能已经按最新模型建表，已存在的列和索引不再重复创建
+    # 已有记录不在迁移中解析（数据量可能很大），迁移后运行 python backfill.py 分批回填
+    columns = {column["name"] for column in inspector.get_columns("alerts")}
+    for column in PARSED_COLUMNS:
+        if column.name not in columns:
+            op.add_column("alerts", column)
+
+    indexes = {index["name"] for index in inspector.get_indexes("alerts")}
+    for name in INDEXED_COLUMNS:
+        if f"ix_alerts_{name}" not in indexes:
+            op.create_index(f"ix_alerts_{name}", "alerts", [name])
+
+
+def downgrade() -> None:
+    for name in INDEXED_COLUMNS:
+        op.drop_index(f"ix_alerts_{name}", table_name="alerts")
+    for column in PARSED_COLUMNS:
+        op.drop_column("alerts", column.name)
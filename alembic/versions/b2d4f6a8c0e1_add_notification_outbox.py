@@ -0,0 +1,54 @@
+"""add notification outbox
+
+Revision ID: b2d4f6a8c0e1
+Revises: a1c3e5f7b9d0
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c0e1'
+down_revision = 'a1c3e5f7b9d0'
+branch_labels = None
+depends_on = None
+
+
+PENDING_WHERE = sa.text("status = 'pending'")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() 可能已经按最新模型建表
+    if "notification_outbox" not in inspector.get_table_names():
+        op.create_table(
+            "notification_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("alert_id", sa.Integer(), nullable=True),
+            sa.Column("enterprise_name", sa.String(length=200), nullable=True),
+            sa.Column("payload", sa.Text(), nullable=True),
+            sa.Column("status", sa.String(length=20), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=True),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_notification_outbox_id", "notification_outbox", ["id"])
+        op.create_index("ix_notification_outbox_alert_id", "notification_outbox", ["alert_id"])
+        op.create_index(
+            "ix_notification_outbox_due",
+            "notification_outbox",
+            ["next_attempt_at"],
+            postgresql_where=PENDING_WHERE,
+            sqlite_where=PENDING_WHERE
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("notification_outbox")
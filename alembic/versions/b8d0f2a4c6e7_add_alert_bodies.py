@@ -0,0 +1,56 @@
+"""add content-addressed alert body store
+
+Revision ID: b8d0f2a4c6e7
+Revises: a7c9e1f3b5d6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from bodies import restore_batch
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c6e7'
+down_revision = 'a7c9e1f3b5d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() 可能已经按最新模型建表，已存在的表、列和索引不再重复创建
+    if not inspector.has_table("alert_bodies"):
+        op.create_table(
+            "alert_bodies",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("hash", sa.String(length=64), nullable=False),
+            sa.Column("encoding", sa.String(length=20), nullable=False),
+            sa.Column("content", sa.LargeBinary(), nullable=False),
+            sa.Column("original_size", sa.Integer(), nullable=False),
+            sa.Column("stored_size", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("last_used_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("hash"),
+        )
+
+    # 已有记录的 input 不在迁移中搬移（数据量可能很大），迁移后运行 python bodies.py migrate 分批迁移
+    if "body_hash" not in {column["name"] for column in inspector.get_columns("alerts")}:
+        op.add_column("alerts", sa.Column("body_hash", sa.String(length=64), nullable=True))
+    if "ix_alerts_body_hash" not in {index["name"] for index in inspector.get_indexes("alerts")}:
+        op.create_index("ix_alerts_body_hash", "alerts", ["body_hash"])
+
+
+def downgrade() -> None:
+    # 先把 alert_bodies 中的消息写回 alerts.input，再删除表
+    bind = op.get_bind()
+    last_id, count = 0, 1
+    while count:
+        last_id, count = restore_batch(bind, last_id, 1000)
+    op.drop_index("ix_alerts_body_hash", table_name="alerts")
+    op.drop_column("alerts", "body_hash")
+    op.drop_table("alert_bodies")
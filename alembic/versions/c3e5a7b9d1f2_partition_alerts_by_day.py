@@ -0,0 +1,59 @@
+"""partition alerts by day on PostgreSQL
+
+Revision ID: c3e5a7b9d1f2
+Revises: b2d4f6a8c0e1
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from config import ALERT_PARTITION_DAYS_AHEAD
+from partitions import is_partitioned, convert_to_partitioned, convert_to_plain
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f2'
+down_revision = 'b2d4f6a8c0e1'
+branch_labels = None
+depends_on = None
+
+
+# 本次迁移时的 alerts 表结构（不能使用运行时的 Alert 模型：之后的迁移新增的列和索引由各自的迁移创建）
+alerts = sa.Table(
+    "alerts",
+    sa.MetaData(),
+    sa.Column("id", sa.Integer(), primary_key=True, index=True),
+    sa.Column("input", sa.Text()),
+    sa.Column("enterprise_name", sa.String(200), index=True),
+    sa.Column("time", sa.DateTime(), index=True),
+    sa.Column("alert_type", sa.String(50), index=True),
+    sa.Column("template_name", sa.String(200), index=True),
+    sa.Column("om_type", sa.String(100)),
+    sa.Column("alert_key", sa.String(200), index=True),
+    sa.Column("processed", sa.Boolean()),
+    sa.Column("timeout_triggered", sa.Boolean()),
+    sa.Column("deadline_at", sa.DateTime()),
+    sa.Column("created_at", sa.DateTime()),
+    sa.Column("updated_at", sa.DateTime()),
+)
+sa.Index(
+    "ix_alerts_pending_deadline",
+    alerts.c.deadline_at,
+    postgresql_where=sa.text("om_type = '告警触发' AND processed = false AND timeout_triggered = false")
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # SQLite 继续使用单表；init_db() 已经创建了分区表时不再转换
+    if bind.dialect.name != "postgresql" or is_partitioned(bind):
+        return
+    convert_to_partitioned(bind, days_ahead=ALERT_PARTITION_DAYS_AHEAD, table=alerts)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not is_partitioned(bind):
+        return
+    convert_to_plain(bind, table=alerts)
@@ -0,0 +1,36 @@
+"""add composite indexes for keyset pagination of alerts
+
+Revision ID: d4f6b8c0e2a3
+Revises: c3e5a7b9d1f2
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c0e2a3'
+down_revision = 'c3e5a7b9d1f2'
+branch_labels = None
+depends_on = None
+
+
+KEYSET_INDEXES = {
+    "ix_alerts_enterprise_time_id": "enterprise_name",
+    "ix_alerts_alert_type_time_id": "alert_type",
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # init_db() 可能已经按最新模型创建了这些索引（分区表上的索引会自动创建到每个分区）
+    indexes = {index["name"] for index in sa.inspect(bind).get_indexes("alerts")}
+    for name, column in KEYSET_INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, "alerts", [sa.text(column), sa.text("time DESC"), sa.text("id")])
+
+
+def downgrade() -> None:
+    for name in KEYSET_INDEXES:
+        op.drop_index(name, table_name="alerts")
@@ -0,0 +1,50 @@
+"""add alert_rollups statistics table
+
+Revision ID: e5a7c9d1f3b4
+Revises: d4f6b8c0e2a3
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from rollups import rebuild_rollups
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d1f3b4'
+down_revision = 'd4f6b8c0e2a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() 可能已经按最新模型建表
+    if "alert_rollups" not in inspector.get_table_names():
+        op.create_table(
+            "alert_rollups",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("bucket_start", sa.DateTime(), nullable=False),
+            sa.Column("enterprise_name", sa.String(length=200), nullable=False),
+            sa.Column("om_type", sa.String(length=100), nullable=False),
+            sa.Column("alert_type", sa.String(length=50), nullable=False),
+            sa.Column("alert_count", sa.Integer(), nullable=False),
+            sa.Column("trigger_count", sa.Integer(), nullable=False),
+            sa.Column("recovery_count", sa.Integer(), nullable=False),
+            sa.Column("timeout_count", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint(
+                "bucket_start", "enterprise_name", "om_type", "alert_type", name="uq_alert_rollups_bucket"
+            ),
+        )
+        op.create_index("ix_alert_rollups_bucket_start", "alert_rollups", ["bucket_start"])
+
+    # 用 alerts 表中现有的数据一次性批量生成汇总
+    rebuild_rollups(bind, full=True)
+
+
+def downgrade() -> None:
+    op.drop_table("alert_rollups")
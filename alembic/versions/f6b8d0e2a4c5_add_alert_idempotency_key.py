@@ -0,0 +1,36 @@
+"""add alert idempotency_key and unique index
+
+Revision ID: f6b8d0e2a4c5
+Revises: e5a7c9d1f3b4
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e2a4c5'
+down_revision = 'e5a7c9d1f3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() 可能已经按最新模型建表，已存在的列和索引不再重复创建
+    # 已有记录不回填幂等键（其中可能已经有重复的告警），NULL 不参与唯一约束
+    columns = {column["name"] for column in inspector.get_columns("alerts")}
+    if "idempotency_key" not in columns:
+        op.add_column("alerts", sa.Column("idempotency_key", sa.String(length=64), nullable=True))
+
+    indexes = {index["name"] for index in inspector.get_indexes("alerts")}
+    if "uq_alerts_idempotency_key_time" not in indexes:
+        op.create_index("uq_alerts_idempotency_key_time", "alerts", ["idempotency_key", "time"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_alerts_idempotency_key_time", table_name="alerts")
+    op.drop_column("alerts", "idempotency_key")
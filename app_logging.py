@@ -0,0 +1,143 @@
+"""
+应用日志：队列化的日志处理器和请求日志中间件
+
+setup_logging() 让根日志记录器只挂一个 QueueHandler，日志记录放入内存队列后立即返回，
+文件和控制台的写入由 QueueListener 的后台线程完成，不阻塞事件循环；
+队列满时（磁盘长时间阻塞）丢弃新的日志记录并计数，而不是让请求等待。
+
+RequestLoggingMiddleware 是纯 ASGI 中间件（不使用 BaseHTTPMiddleware，没有额外的任务和响应包装）：
+每个请求只记录一行响应日志，参数在真正输出时才格式化；成功且不慢的请求可以按比例采样，
+错误响应、慢请求和异常总是记录；请求详情（请求头、查询参数）只在 DEBUG 级别启用时才生成。
+"""
+import json
+import logging
+import queue
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional
+
+
+class BeijingFormatter(logging.Formatter):
+    """使用北京时间的日志格式化器"""
+    def formatTime(self, record, datefmt=None):
+        # 获取北京时间
+        beijing_tz = timezone(timedelta(hours=8))
+        beijing_time = datetime.fromtimestamp(record.created, beijing_tz)
+
+        if datefmt:
+            return beijing_time.strftime(datefmt)
+        else:
+            # 默认格式：YYYY-MM-DD HH:MM:SS,毫秒
+            return beijing_time.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志记录（计入 dropped），调用方永远不会阻塞"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(
+    log_file: str = "app.log",
+    level: str = "INFO",
+    queue_size: int = 10000
+) -> QueueListener:
+    """
+    配置根日志记录器：QueueHandler -> 队列 -> QueueListener 线程 -> 文件和控制台处理器
+    返回已启动的 QueueListener，应用关闭时调用 stop() 写出队列中剩余的日志
+    """
+    formatter = BeijingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    console_handler = logging.StreamHandler()
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    listener = QueueListener(queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+    listener.start()
+    return listener
+
+
+def _request_details(scope) -> str:
+    """请求详情的 JSON（排除 authorization、cookie 请求头），只在启用 DEBUG 日志时调用"""
+    client = scope.get("client")
+    return json.dumps({
+        "method": scope["method"],
+        "path": scope["path"],
+        "query_string": scope.get("query_string", b"").decode("latin-1"),
+        "headers": {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+            if name.lower() not in (b"authorization", b"cookie")
+        },
+        "client": client[0] if client else None,
+    }, ensure_ascii=False)
+
+
+class RequestLoggingMiddleware:
+    """
+    请求日志中间件（纯 ASGI）
+    每个请求记录一行 "响应: 方法 路径 - 状态码 (耗时)"，耗时包括响应体发送完毕（流式导出也是完整耗时）。
+    状态码 >= 400 或耗时 >= slow_seconds 的请求记为 WARNING 并总是记录，
+    其他请求按 sample_rate 的比例采样记录（1 表示全部记录，0 表示不记录）
+    """
+
+    def __init__(
+        self,
+        app,
+        logger: Optional[logging.Logger] = None,
+        sample_rate: float = 1.0,
+        slow_seconds: float = 1.0,
+        sampler: Callable[[], float] = random.random
+    ):
+        self.app = app
+        self._logger = logger or logging.getLogger(__name__)
+        self._sample_rate = sample_rate
+        self._slow_seconds = slow_seconds
+        self._sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        logger = self._logger
+        start = time.perf_counter()
+        status = 500  # 应用没有发出响应就出错时按 500 记录
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"收到请求: {scope['method']} {scope['path']}，详情: {_request_details(scope)}")
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            logger.error(f"处理请求时出错: {scope['method']} {scope['path']} ({time.perf_counter() - start:.3f}s)",
+                         exc_info=True)
+            raise
+
+        elapsed = time.perf_counter() - start
+        if status >= 400 or elapsed >= self._slow_seconds:
+            logger.warning(f"响应: {scope['method']} {scope['path']} - {status} ({elapsed:.3f}s)")
+        elif self._sample_rate >= 1 or (self._sample_rate > 0 and self._sampler() < self._sample_rate):
+            logger.info(f"响应: {scope['method']} {scope['path']} - {status} ({elapsed:.3f}s)")
@@ -0,0 +1,84 @@
+"""
+回填已有告警中从 input 解析出的字段（region、metric、rule_name 等，见 parser.PARSED_FIELDS）
+
+按 id 顺序分批读取尚未解析的告警（解析字段全部为空），每批一个事务，用一条 executemany UPDATE 写回；
+--processes 大于 1 时用进程池并行解析（parser.parse_many）。
+可以在服务运行时执行，中断后重新执行会从头跳过已解析的记录：
+
+    python backfill.py [--batch-size 1000] [--pause 0.1] [--processes 4] [--all]
+"""
+import argparse
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+from sqlalchemy import and_, bindparam, select, update
+
+from database import engine, Alert, init_db, alert_columns_from_parsed
+from parser import PARSED_FIELDS, parse_many
+from bodies import load_bodies_sync, alert_input
+
+
+def unparsed_condition():
+    """解析字段全部为空（尚未解析，或 input 中没有可解析的内容）"""
+    return and_(*[getattr(Alert, name).is_(None) for name in PARSED_FIELDS])
+
+
+def backfill_parsed_fields(
+    batch_size: int = 1000,
+    pause: float = 0.0,
+    reparse_all: bool = False,
+    executor: Optional[Executor] = None
+) -> int:
+    """分批解析并回填，返回更新的记录数；传入 executor（进程池）时并行解析"""
+    # 条件中带上 time：PostgreSQL 分区表的主键为 (id, time)，每条 UPDATE 只访问一个分区
+    statement = (
+        update(Alert.__table__)
+        .where(and_(Alert.__table__.c.id == bindparam("b_id"), Alert.__table__.c.time == bindparam("b_time")))
+        .values({name: bindparam(name) for name in PARSED_FIELDS})
+    )
+    last_id = 0
+    scanned = 0
+    updated = 0
+    while True:
+        query = select(Alert.id, Alert.time, Alert.input, Alert.body_hash).where(Alert.id > last_id)
+        if not reparse_all:
+            query = query.where(unparsed_condition())
+        with engine.begin() as conn:
+            rows = conn.execute(query.order_by(Alert.id).limit(batch_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            scanned += len(rows)
+            params = []
+            bodies = load_bodies_sync(conn, [row.body_hash for row in rows])
+            parsed = parse_many([alert_input(row.input, row.body_hash, bodies) for row in rows], executor=executor)
+            for row, fields in zip(rows, parsed):
+                columns = alert_columns_from_parsed(fields)
+                if reparse_all or any(value is not None for value in columns.values()):
+                    params.append({"b_id": row.id, "b_time": row.time, **columns})
+            if params:
+                conn.execute(statement, params)
+            updated += len(params)
+        print(f"[回填] 已扫描 {scanned} 条，已更新 {updated} 条（id <= {last_id}）")
+        if pause:
+            time.sleep(pause)
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填告警消息中解析出的字段")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的告警数量")
+    parser.add_argument("--pause", type=float, default=0.0, help="两批之间的停顿（秒），减轻对在线服务的影响")
+    parser.add_argument("--processes", type=int, default=1, help="解析使用的进程数，大于 1 时使用进程池")
+    parser.add_argument("--all", action="store_true", help="重新解析所有告警（默认只处理尚未解析的告警）")
+    args = parser.parse_args()
+
+    init_db()
+    begin = time.monotonic()
+    if args.processes > 1:
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            count = backfill_parsed_fields(args.batch_size, args.pause, args.all, executor=pool)
+    else:
+        count = backfill_parsed_fields(args.batch_size, args.pause, args.all)
+    print(f"已回填 {count} 条告警的解析字段，耗时 {time.monotonic() - begin:.2f} 秒")
@@ -0,0 +1,227 @@
+"""
+异步数据库访问基准测试：对比同步 Session（改造前）与 AsyncSession（改造后）的并发请求延迟
+
+通过 sqlite3 的 connection factory 给每次 COMMIT 注入固定延迟，模拟 PostgreSQL 提交变慢：
+- 改造前：同步驱动在事件循环线程中等待提交，所有请求（包括 /health）一起被阻塞
+- 改造后：aiosqlite 在独立线程中提交，事件循环继续处理其他请求
+
+SQLite 的写入本身是串行的，两种实现的写入吞吐接近；差异体现在 /health 探测次数、
+其他请求的延迟和事件循环最大延迟上。
+
+用法:
+    python benchmarks/bench_async_db.py --requests 200 --concurrency 20 --commit-latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_async_db_")
+_db_path = os.path.join(_tmp_dir, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+
+import httpx
+import logging
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+import main
+from database import Base, Alert, get_async_db, to_db_time
+from models import AlertInput, AlertResponse
+from parser import parse_time
+
+COMMIT_LATENCY_SECONDS = 0.0
+
+
+class SlowCommitConnection(sqlite3.Connection):
+    """每次 COMMIT 前固定休眠，模拟远程数据库的提交延迟"""
+    def commit(self):
+        time.sleep(COMMIT_LATENCY_SECONDS)
+        return super().commit()
+
+
+def build_legacy_app(session_factory) -> FastAPI:
+    """改造前的实现：async 接口中直接使用同步 Session"""
+    legacy_app = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @legacy_app.post("/api/alert", response_model=AlertResponse)
+    async def receive_alert(alert_data: AlertInput, db: Session = Depends(get_db)):
+        alert = Alert(
+            input=alert_data.input,
+            enterprise_name=alert_data.enterprise_name,
+            time=to_db_time(parse_time(alert_data.time)),
+            alert_type=alert_data.alert_type,
+            template_name=alert_data.template_name,
+            om_type=alert_data.om_type,
+            alert_key=alert_data.alert_key,
+            processed=False,
+            timeout_triggered=False
+        )
+        db.add(alert)
+        db.commit()
+        db.refresh(alert)
+
+        if alert_data.om_type == "告警恢复":
+            matching_triggers = db.query(Alert).filter(
+                Alert.enterprise_name == alert_data.enterprise_name,
+                Alert.alert_key == alert_data.alert_key,
+                Alert.om_type == "告警触发",
+                Alert.processed == False,
+                Alert.timeout_triggered == False,
+                Alert.time <= alert.time
+            ).all()
+            if matching_triggers:
+                for trigger in matching_triggers:
+                    trigger.processed = True
+                db.commit()
+        return AlertResponse.model_validate(alert)
+
+    @legacy_app.get("/health")
+    async def health_check():
+        return {"status": "ok"}
+
+    return legacy_app
+
+
+def make_alert(i: int) -> dict:
+    # 使用"告警恢复"：不会启动超时检查任务，但会执行恢复匹配的 UPDATE
+    return {
+        "input": "✅ **【告警恢复】监控告警**",
+        "enterprise_name": f"Enterprise-{i % 10}",
+        "time": "2025-12-10 10:00:00",
+        "alert_type": "告警恢复",
+        "template_name": "Bench",
+        "om_type": "告警恢复",
+        "alert_key": f"key-{i}",
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(app, total: int, concurrency: int) -> dict:
+    """并发发送 POST /api/alert，同时以固定间隔探测 /health 和事件循环延迟"""
+    transport = httpx.ASGITransport(app=app)
+    post_latencies, probe_latencies, loop_lags = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post_one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/alert", json=make_alert(i))
+                response.raise_for_status()
+                post_latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        async def loop_monitor():
+            interval = 0.005
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(interval)
+                loop_lags.append(time.perf_counter() - start - interval)
+
+        background = [asyncio.create_task(probe()), asyncio.create_task(loop_monitor())]
+        started = time.perf_counter()
+        await asyncio.gather(*(post_one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*background)
+
+    return {
+        "elapsed": elapsed,
+        "throughput": total / elapsed,
+        "post_p50_ms": percentile(post_latencies, 50) * 1000,
+        "post_p95_ms": percentile(post_latencies, 95) * 1000,
+        "post_max_ms": max(post_latencies) * 1000,
+        "health_probes": len(probe_latencies),
+        "health_p50_ms": percentile(probe_latencies, 50) * 1000 if probe_latencies else 0.0,
+        "health_max_ms": max(probe_latencies) * 1000 if probe_latencies else 0.0,
+        "loop_lag_max_ms": max(loop_lags) * 1000 if loop_lags else 0.0,
+    }
+
+
+def print_result(name: str, result: dict):
+    print(f"{name}:")
+    print(f"  总耗时 {result['elapsed']:.2f}s, 吞吐 {result['throughput']:.1f} req/s")
+    print(f"  POST /api/alert  p50={result['post_p50_ms']:.1f}ms  p95={result['post_p95_ms']:.1f}ms  "
+          f"max={result['post_max_ms']:.1f}ms")
+    print(f"  GET /health      完成 {result['health_probes']} 次  p50={result['health_p50_ms']:.1f}ms  "
+          f"max={result['health_max_ms']:.1f}ms")
+    print(f"  事件循环最大延迟  {result['loop_lag_max_ms']:.1f}ms")
+
+
+async def main_async(args):
+    global COMMIT_LATENCY_SECONDS
+    COMMIT_LATENCY_SECONDS = args.commit_latency_ms / 1000
+
+    sync_engine = create_engine(
+        f"sqlite:///{_db_path}",
+        connect_args={"check_same_thread": False, "factory": SlowCommitConnection, "timeout": 30}
+    )
+    # SQLite 同一时间只允许一个写事务，异步连接池限制为 1 个连接，让写请求在连接池中排队而不是在数据库锁上忙等
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{_db_path}",
+        connect_args={"factory": SlowCommitConnection, "timeout": 30},
+        pool_size=1,
+        max_overflow=0
+    )
+    Base.metadata.create_all(bind=sync_engine)
+
+    # 改造前：同步 Session
+    legacy_app = build_legacy_app(sessionmaker(autocommit=False, autoflush=False, bind=sync_engine))
+    before = await run_load(legacy_app, args.requests, args.concurrency)
+
+    # 改造后：main.app 中的 AsyncSession 实现
+    async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_bench_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    main.app.dependency_overrides[get_async_db] = get_bench_async_db
+    after = await run_load(main.app, args.requests, args.concurrency)
+
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+    print(f"请求数={args.requests}, 并发={args.concurrency}, 每次提交延迟={args.commit_latency_ms}ms")
+    print_result("改造前（同步 Session）", before)
+    print_result("改造后（AsyncSession）", after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同步/异步数据库访问并发延迟对比")
+    parser.add_argument("--requests", type=int, default=200, help="POST /api/alert 请求总数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发请求数")
+    parser.add_argument("--commit-latency-ms", type=float, default=20.0, help="每次 COMMIT 注入的延迟（毫秒）")
+    args = parser.parse_args()
+
+    # 基准测试期间只保留警告日志，避免请求日志影响计时
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main_async(args))
@@ -0,0 +1,87 @@
+"""
+Dify HTTP 客户端基准测试：共享连接池客户端 vs 每次调用新建客户端
+
+对本地 Dify 桩服务发送超时通知请求，统计每秒通知数和建立的 TCP 连接数。
+本地桩服务使用明文 HTTP，生产环境中每次新建连接还要额外付出 DNS 和 TLS 握手的开销，差距会更大。
+
+用法:
+    python benchmarks/bench_dify_client.py --notifications 500 --concurrency 10 --latency-ms 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from dify_client import create_dify_client
+from stub_dify import StubDifyServer
+
+
+def make_payload(i: int) -> dict:
+    return {
+        "inputs": {
+            "input": "🔴 **【告警触发】监控告警**",
+            "enterprise_name": f"Enterprise-{i % 10}",
+            "time": "2025-12-10 10:25:34",
+        },
+        "response_mode": "blocking",
+        "user": "alert-system",
+    }
+
+
+async def run_per_call(url: str, total: int, concurrency: int) -> float:
+    """改造前：每次通知新建 httpx.AsyncClient"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.post(url, json=make_payload(i))
+                response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_shared(url: str, total: int, concurrency: int) -> float:
+    """改造后：所有通知复用应用级共享客户端"""
+    semaphore = asyncio.Semaphore(concurrency)
+    client = create_dify_client()
+
+    async def send(i):
+        async with semaphore:
+            response = await client.post(url, json=make_payload(i))
+            response.raise_for_status()
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(total)))
+        return time.perf_counter() - start
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享 / 每次新建 Dify HTTP 客户端的通知吞吐对比")
+    parser.add_argument("--notifications", type=int, default=500, help="通知请求总数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发请求数")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="桩服务每次请求的处理延迟（毫秒）")
+    args = parser.parse_args()
+
+    with StubDifyServer(latency_ms=args.latency_ms) as stub:
+        print(f"通知数={args.notifications}, 并发={args.concurrency}, 桩服务延迟={args.latency_ms}ms")
+        for name, runner in (("每次新建客户端", run_per_call), ("共享连接池客户端", run_shared)):
+            stub.reset_counters()
+            elapsed = asyncio.run(runner(stub.url, args.notifications, args.concurrency))
+            print(f"{name}: {args.notifications / elapsed:.1f} 通知/秒 "
+                  f"(总耗时 {elapsed:.2f}s, TCP 连接 {stub.connections} 个)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+指标记录开销基准测试：计数器、带标签的计数器、直方图的单次记录耗时，以及 /metrics 的渲染耗时
+
+接收告警的每个请求记录一次带标签的计数器和一次带标签的直方图（observe_receive），
+这里测的就是这两步相对于一个请求（毫秒级）可以忽略不计。
+
+用法:
+    python benchmarks/bench_metrics.py --iterations 1000000 --label-values 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+
+
+def measure(name: str, function, iterations: int):
+    begin = time.perf_counter()
+    function(iterations)
+    elapsed = time.perf_counter() - begin
+    print(f"  {name:<36} {elapsed / iterations * 1e9:>8.0f} ns/次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指标记录开销基准测试")
+    parser.add_argument("--iterations", type=int, default=1000000, help="每项测量的记录次数")
+    parser.add_argument("--label-values", type=int, default=20, help="alert_type 标签的取值个数")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "计数器")
+    labeled = registry.counter("bench_labeled_total", "带标签的计数器", ("alert_type", "result"))
+    histogram = registry.histogram("bench_seconds", "直方图")
+    labeled_histogram = registry.histogram("bench_labeled_seconds", "带标签的直方图", ("alert_type",))
+    alert_types = [f"type-{index}" for index in range(args.label_values)]
+    values = [(index % 997) / 997 * 0.2 for index in range(1000)]
+
+    def counter_inc(n):
+        for _ in range(n):
+            counter.inc()
+
+    def labeled_inc(n):
+        for index in range(n):
+            labeled.labels(alert_types[index % len(alert_types)], "created").inc()
+
+    def histogram_observe(n):
+        for index in range(n):
+            histogram.observe(values[index % 1000])
+
+    def receive_path(n):
+        # 与 main.observe_receive 相同：一次带标签的计数器加一次带标签的直方图，包括 perf_counter
+        for index in range(n):
+            start = time.perf_counter()
+            alert_type = alert_types[index % len(alert_types)]
+            labeled.labels(alert_type, "created").inc()
+            labeled_histogram.labels(alert_type).observe(time.perf_counter() - start)
+
+    def empty_loop(n):
+        for index in range(n):
+            alert_types[index % len(alert_types)]
+
+    print(f"记录 {args.iterations} 次，alert_type 取值 {args.label_values} 个:")
+    measure("空循环（基线）", empty_loop, args.iterations)
+    measure("Counter.inc()", counter_inc, args.iterations)
+    measure("Counter.labels(...).inc()", labeled_inc, args.iterations)
+    measure("Histogram.observe()", histogram_observe, args.iterations)
+    measure("接收告警的记录（计数器 + 直方图）", receive_path, args.iterations)
+
+    repeat = 100
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        text = registry.render()
+    elapsed = (time.perf_counter() - begin) / repeat
+    print(f"渲染 /metrics: {len(text.splitlines())} 行，{elapsed * 1000:.2f}ms/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+告警消息解析基准测试：对比旧的逐字段 re.search 实现与单次扫描的 parse_alert_input / parse_many
+
+消息按 test_api.py 中的告警格式生成（告警触发 / 告警恢复，不同的区域、指标、企业和详情行数），
+另外混入缺少字段、取值换行、CRLF、详情中带 "**" 等变形，先逐条核对新旧实现的输出完全一致，再测吞吐。
+
+用法:
+    python benchmarks/bench_parser.py --messages 20000 --details-lines 3 --processes 4
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import parse_alert_input, parse_many
+
+
+def legacy_parse_alert_input(input_text: str) -> Dict[str, Optional[str]]:
+    """改造前的实现（每个字段一次全文 re.search），用于核对输出和对比性能"""
+    result = {
+        "alert_type": None,
+        "region": None,
+        "metric": None,
+        "rule_name": None,
+        "generator_url": None,
+        "alert_summary": None,
+        "alert_details": None,
+        "script_name": None,
+    }
+    if "【告警触发】" in input_text:
+        result["alert_type"] = "告警触发"
+    elif "【告警恢复】" in input_text:
+        result["alert_type"] = "告警恢复"
+    region_match = re.search(r"\*\*区域\s*\(Region\):\*\*\s*(\w+)", input_text)
+    if region_match:
+        result["region"] = region_match.group(1).strip()
+    metric_match = re.search(r"\*\*指标\s*\(Metric\):\*\*\s*(\w+)", input_text)
+    if metric_match:
+        result["metric"] = metric_match.group(1).strip()
+    rule_match = re.search(r"\*\*规则名称\s*\(Rule Name\):\*\*\s*([^\n]+)", input_text)
+    if rule_match:
+        result["rule_name"] = rule_match.group(1).strip()
+    url_match = re.search(r"\*\*告警链接\s*\(GeneratorURL\):\*\*\s*(https?://[^\s\n\)]+)", input_text)
+    if url_match:
+        result["generator_url"] = url_match.group(1).strip()
+    summary_match = re.search(r"\*\*告警摘要:\*\*\s*\n([^\n]+)", input_text)
+    if summary_match:
+        result["alert_summary"] = summary_match.group(1).strip()
+    details_match = re.search(r"\*\*告警详情:\*\*\s*\n((?:.|\n)+?)(?=\n\n|\*\*|$)", input_text)
+    if details_match:
+        result["alert_details"] = details_match.group(1).strip()
+    script_match = re.search(r"企业\s+([^的\n]+?)(?:\s+CG)?\s+的", input_text)
+    if script_match:
+        result["script_name"] = script_match.group(1).strip()
+    return result
+
+
+REGIONS = ["IDN", "PHL", "MEX", "THA", "VNM", "BRA"]
+METRICS = ["ConnectionRate", "CallVolume", "AnswerRate", "AvgDuration"]
+ENTERPRISES = ["KrediOne CG", "Finture", "Kredit Pintar", "AdaKami", "Tunaiku CG"]
+
+
+def make_message(rng: random.Random, details_lines: int) -> str:
+    """按 test_api.py 的格式生成一条告警消息"""
+    trigger = rng.random() < 0.5
+    region = rng.choice(REGIONS)
+    metric = rng.choice(METRICS)
+    details = [f"在过去十五分钟内的接通率为 {rng.uniform(0, 30):.2f}%", f"呼叫量为 {rng.randint(100, 5000)}"]
+    details += [f"参考阈值: 0.5%~20%（第 {i} 项）" for i in range(max(details_lines - 2, 0))]
+    return (
+        f"{'🔴' if trigger else '✅'} **【{'告警触发' if trigger else '告警恢复'}】监控告警**\n"
+        f"🌐 **区域 (Region):** {region}\n"
+        f"📊 **指标 (Metric):** {metric}\n"
+        f"🔍 **规则名称 (Rule Name):** {region}-Enterprise-{metric}\n"
+        f"🔗 **告警链接 (GeneratorURL):** https://monitor.talkbots.cn:443/alerting/grafana/"
+        f"{rng.getrandbits(40):x}/view?orgId=1\n"
+        f"\n"
+        f"**告警摘要:**\n"
+        f"企业 {rng.choice(ENTERPRISES)} 的接通率\n"
+        f"\n"
+        f"**告警详情:**\n"
+        + "\n".join(details)
+    )
+
+
+def mutate(rng: random.Random, text: str) -> str:
+    """变形：删除或重复某一行、取值换到下一行、CRLF、多余空白、详情中插入 "**"、结尾换行等"""
+    lines = text.split("\n")
+    for _ in range(rng.randint(1, 3)):
+        choice = rng.randrange(9)
+        index = rng.randrange(len(lines))
+        if choice == 0:
+            del lines[index]
+        elif choice == 1:
+            lines.insert(index, lines[rng.randrange(len(lines))])
+        elif choice == 2:
+            lines[index] = lines[index].replace(":** ", ":**\n", 1)
+        elif choice == 3:
+            lines[index] += "\r"
+        elif choice == 4:
+            lines.insert(index, rng.choice(["", "   ", "\t"]))
+        elif choice == 5:
+            lines[index] += " **备注** 见附件"
+        elif choice == 6:
+            lines[index] = lines[index].replace(" ", "  ").replace(":**", ":** ")
+        elif choice == 7:
+            lines.append(rng.choice(["", "\n", "  "]))
+        else:
+            lines[index] = lines[index][: rng.randrange(len(lines[index]) + 1)]
+    return "\n".join(lines)
+
+
+def build_corpus(count: int, details_lines: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        text = make_message(rng, details_lines)
+        if rng.random() < 0.2:
+            text = mutate(rng, text)
+        messages.append(text)
+    return messages
+
+
+def verify(messages: List[str]) -> int:
+    """逐条核对新旧实现的输出，返回不一致的数量（打印前几条）"""
+    mismatches = 0
+    for text in messages:
+        expected = legacy_parse_alert_input(text)
+        actual = parse_alert_input(text)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"输出不一致:\n{text!r}\n旧: {expected}\n新: {actual}")
+    return mismatches
+
+
+def measure(name: str, parse, messages: List[str], repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        parse(messages)
+        best = min(best, time.perf_counter() - begin)
+    print(f"  {name:<32} {len(messages) / best:>12,.0f} 条/秒  ({best * 1000:.1f}ms)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="告警消息解析基准测试")
+    parser.add_argument("--messages", type=int, default=20000, help="消息数量")
+    parser.add_argument("--details-lines", type=int, default=3, help="告警详情的行数（测试长消息时调大）")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="parse_many 进程池大小")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    messages = build_corpus(args.messages, args.details_lines, args.seed)
+    average_length = sum(len(text) for text in messages) / len(messages)
+    print(f"消息 {len(messages)} 条，平均长度 {average_length:.0f} 字符，其中约 20% 为变形消息")
+
+    mismatches = verify(messages)
+    print(f"新旧实现输出核对: {'一致' if not mismatches else f'{mismatches} 条不一致'}")
+
+    print("吞吐:")
+    legacy = measure("旧实现（逐字段 re.search）", lambda texts: [legacy_parse_alert_input(t) for t in texts],
+                     messages, args.repeat)
+    single = measure("parse_alert_input（单次扫描）", lambda texts: [parse_alert_input(t) for t in texts],
+                     messages, args.repeat)
+    measure("parse_many（当前进程）", parse_many, messages, args.repeat)
+    if args.processes > 1:
+        measure(f"parse_many（{args.processes} 个进程）",
+                lambda texts: parse_many(texts, processes=args.processes), messages, args.repeat)
+    print(f"单次扫描相对旧实现: {legacy / single:.2f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
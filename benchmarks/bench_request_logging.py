@@ -0,0 +1,191 @@
+"""
+请求日志开销基准测试：对比原来的 @app.middleware("http") 请求日志（同步写文件和控制台）
+与纯 ASGI 的 RequestLoggingMiddleware + QueueHandler/QueueListener
+
+直接调用 ASGI 应用（不经过网络和 HTTP 客户端），每种配置发送相同数量的请求，
+输出每个请求的平均耗时、p99 和相对无日志中间件的额外开销。日志写到临时文件，控制台输出写到 os.devnull。
+
+用法:
+    python benchmarks/bench_request_logging.py --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueListener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+
+from app_logging import BeijingFormatter, DroppingQueueHandler, RequestLoggingMiddleware
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/alerts/{alert_id}")
+    async def get_alert(alert_id: int):
+        return {"id": alert_id, "enterprise_name": "KrediOne CG", "alert_type": "告警触发"}
+
+    return app
+
+
+def add_legacy_middleware(app: FastAPI, logger: logging.Logger):
+    """改造前 main.py 中的请求日志中间件"""
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        beijing_tz = timezone(timedelta(hours=8))
+        start_time = datetime.now(beijing_tz)
+        log_data = {
+            "timestamp": start_time.isoformat(),
+            "method": request.method,
+            "url": str(request.url),
+            "path": request.url.path,
+            "query_params": dict(request.query_params),
+            "headers": {k: v for k, v in request.headers.items() if k.lower() not in ['authorization', 'cookie']},
+            "client": request.client.host if request.client else None,
+        }
+        logger.info(f"收到请求: {request.method} {request.url.path}")
+        logger.debug(f"请求详情: {json.dumps(log_data, indent=2, ensure_ascii=False)}")
+        response = await call_next(request)
+        process_time = (datetime.now(beijing_tz) - start_time).total_seconds()
+        logger.info(f"响应: {request.method} {request.url.path} - {response.status_code} ({process_time:.3f}s)")
+        return response
+
+
+def make_handlers(directory: str, name: str):
+    formatter = BeijingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(os.path.join(directory, f"{name}.log"), encoding="utf-8")
+    console_handler = logging.StreamHandler(open(os.devnull, "w", encoding="utf-8"))
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+
+def make_logger(name: str, handlers) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers = list(handlers)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+async def drive(app, count: int) -> list:
+    """直接调用 ASGI 应用 count 次，返回每次的耗时（秒）"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/alerts/42",
+        "raw_path": b"/api/alerts/42",
+        "root_path": "",
+        "query_string": b"fields=id,enterprise_name",
+        "headers": [
+            (b"host", b"alert-api:8000"),
+            (b"user-agent", b"python-httpx/0.27.0"),
+            (b"accept", b"application/json"),
+            (b"authorization", b"Bearer secret"),
+        ],
+        "client": ("10.0.0.8", 52311),
+        "server": ("10.0.0.2", 8000),
+    }
+
+    never = asyncio.Event()
+
+    def make_receive():
+        # 与服务器一致：先返回请求体，之后等待客户端断开（响应发送完后由框架取消）
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await never.wait()
+        return receive
+
+    async def send(message):
+        pass
+
+    timings = []
+    for _ in range(count):
+        begin = time.perf_counter()
+        await app(dict(scope), make_receive(), send)
+        timings.append(time.perf_counter() - begin)
+    return timings
+
+
+def report(name: str, timings: list, baseline: float = None) -> float:
+    mean = statistics.fmean(timings)
+    p99 = sorted(timings)[int(len(timings) * 0.99)]
+    overhead = f"  额外开销 {(mean - baseline) * 1e6:>7.1f}µs" if baseline is not None else ""
+    print(f"  {name:<40} 平均 {mean * 1e6:>7.1f}µs  p99 {p99 * 1e6:>7.1f}µs{overhead}")
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求日志开销基准测试")
+    parser.add_argument("--requests", type=int, default=5000, help="每种配置的请求数量")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configs = []
+
+        configs.append(("无请求日志", make_app(), None))
+
+        legacy_app = make_app()
+        add_legacy_middleware(legacy_app, make_logger("legacy", make_handlers(directory, "legacy")))
+        configs.append(('原中间件（@app.middleware，同步写日志）', legacy_app, None))
+
+        listeners = []
+        for name, sample_rate in (
+            ("队列日志 + 纯 ASGI 中间件", 1.0),
+            ("队列日志 + 纯 ASGI 中间件（采样 10%）", 0.1),
+            ("队列日志 + 纯 ASGI 中间件（只记录错误和慢请求）", 0.0),
+        ):
+            queue_handler = DroppingQueueHandler(queue.Queue(maxsize=100000))
+            listener = QueueListener(queue_handler.queue, *make_handlers(directory, f"queued{len(listeners)}"))
+            listener.start()
+            listeners.append(listener)
+            app = make_app()
+            app.add_middleware(
+                RequestLoggingMiddleware,
+                logger=make_logger(f"queued{len(listeners)}", [queue_handler]),
+                sample_rate=sample_rate
+            )
+            configs.append((name, app, queue_handler))
+
+        async def run():
+            results = {}
+            for name, app, queue_handler in configs:
+                await drive(app, min(500, args.requests))  # 预热
+                results[name] = await drive(app, args.requests)
+                # 等待日志线程写完本轮的日志，避免影响下一种配置的计时
+                while queue_handler is not None and not queue_handler.queue.empty():
+                    await asyncio.sleep(0.01)
+            return results
+
+        results = asyncio.run(run())
+        for listener in listeners:
+            listener.stop()
+
+        print(f"每种配置 {args.requests} 个请求（GET /api/alerts/42，直接调用 ASGI 应用）:")
+        baseline = None
+        for name, _, queue_handler in configs:
+            mean = report(name, results[name], baseline)
+            if baseline is None:
+                baseline = mean
+            if queue_handler is not None and queue_handler.dropped:
+                print(f"    队列满丢弃日志 {queue_handler.dropped} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+本地 Dify workflow API 桩服务，供基准测试使用
+
+提供 POST /v1/workflows/run，按配置的延迟返回与 Dify blocking 模式相近的响应，
+并统计收到的请求数和 TCP 连接数（按客户端源端口计数，用于观察连接复用情况）。
+fail_every=N 时每第 N 个请求返回 503，用于测试重试逻辑。
+
+用法:
+    with StubDifyServer(latency_ms=5) as stub:
+        url = stub.url  # http://127.0.0.1:<port>/v1/workflows/run
+"""
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_stub_app(state: dict) -> FastAPI:
+    stub_app = FastAPI()
+
+    @stub_app.post("/v1/workflows/run")
+    async def run_workflow(request: Request):
+        body = await request.json()
+        state["requests"] += 1
+        if request.client:
+            # 每个客户端源端口对应一条 TCP 连接
+            state["client_ports"].add(request.client.port)
+        if state["fail_every"] and state["requests"] % state["fail_every"] == 0:
+            return JSONResponse(status_code=503, content={"code": "unavailable", "message": "stub failure"})
+        if state["latency"]:
+            await asyncio.sleep(state["latency"])
+        return {
+            "workflow_run_id": f"stub-{state['requests']}",
+            "task_id": f"task-{state['requests']}",
+            "data": {
+                "status": "succeeded",
+                "outputs": {"enterprise_name": body.get("inputs", {}).get("enterprise_name")},
+            },
+        }
+
+    return stub_app
+
+
+class StubDifyServer:
+    """在后台线程中运行的 Dify 桩服务"""
+
+    def __init__(self, latency_ms: float = 0.0, fail_every: int = 0, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = _free_port(host)
+        self.state = {
+            "requests": 0,
+            "client_ports": set(),
+            "latency": latency_ms / 1000,
+            "fail_every": fail_every,
+        }
+        config = uvicorn.Config(
+            build_stub_app(self.state),
+            host=host,
+            port=self.port,
+            log_level="warning",
+            lifespan="off",
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1/workflows/run"
+
+    def start(self):
+        self._thread.start()
+        deadline = time.time() + 10
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("Dify 桩服务启动超时")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+    @property
+    def requests(self) -> int:
+        return self.state["requests"]
+
+    @property
+    def connections(self) -> int:
+        return len(self.state["client_ports"])
+
+    def reset_counters(self):
+        self.state["requests"] = 0
+        self.state["client_ports"] = set()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
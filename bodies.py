@@ -0,0 +1,377 @@
+"""
+告警消息内容存储（alert_bodies）
+
+告警消息几乎都是同一个 Grafana 模板，只有区域、指标、数字和企业名称不同。
+消息按内容寻址：alerts.body_hash 为消息（UTF-8）的 SHA-256，相同的消息在 alert_bodies 中只存一份；
+每份消息可以用 zlib 压缩（ALERT_BODY_COMPRESSION），dict 模式使用内置的模板共享字典，
+相似的消息压缩后基本只剩下不同的部分。alerts.input 只保留在启用本功能之前写入的记录中。
+
+读取告警时由 load_bodies() / rehydrate_alerts() 还原 input，已解压的消息按哈希缓存在进程内（内容寻址，不需要失效）。
+已有记录可以在服务运行时分批迁移到 alert_bodies，report 统计去重和压缩效果，restore 把消息写回 alerts.input：
+
+    python bodies.py migrate [--batch-size 1000] [--pause 0.1]
+    python bodies.py report [--sample 2000]
+    python bodies.py restore [--batch-size 1000]
+"""
+import argparse
+import hashlib
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import LargeBinary, and_, bindparam, cast, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from config import ALERT_BODY_COMPRESSION, ALERT_BODY_CACHE_SIZE
+from database import Alert, AlertBody, beijing_now_naive, dialect_insert
+
+
+ENCODING_PLAIN = "plain"  # UTF-8 原文
+ENCODING_ZLIB = "zlib"  # zlib 压缩（raw deflate，不带头部和校验和，完整性由 SHA-256 保证）
+ENCODING_ZLIB_DICT = "zlib-dict-"  # 使用共享字典的 zlib 压缩，后缀为字典版本
+
+COMPRESSION_MODES = ("none", "zlib", "dict")
+
+# 共享字典：告警模板（parser.py 解析的格式）中的固定文本，不包含具体部署的域名、区域等取值。
+# zlib 优先匹配距离近的内容，出现最频繁的文本放在最后。
+# 字典一经使用不能修改（已压缩的消息需要同一个字典解压），调整时新增版本并修改 CURRENT_DICTIONARY_VERSION
+BODY_DICTIONARIES = {
+    1: "\n".join([
+        "ConnectionRate CallVolume AnswerRate AvgDuration",
+        "-Enterprise-ConnectionRate",
+        "参考阈值: 0.5%~20%",
+        "呼叫量为 ",
+        "在过去十五分钟内的接通率为 ",
+        "/alerting/grafana/",
+        "/view?orgId=1\n\n**告警摘要:**\n企业 ",
+        "🔗 **告警链接 (GeneratorURL):** https://",
+        "🔍 **规则名称 (Rule Name):** ",
+        "📊 **指标 (Metric):** ",
+        "🌐 **区域 (Region):** ",
+        "✅ **【告警恢复】监控告警**\n",
+        "🔴 **【告警触发】监控告警**\n",
+        "的接通率\n\n**告警详情:**\n在过去十五分钟内的接通率为 ",
+    ]).encode("utf-8"),
+}
+CURRENT_DICTIONARY_VERSION = 1
+
+
+def body_hash(text: str) -> str:
+    """消息内容的哈希（64 位十六进制 SHA-256）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_body(text: str, compression: str = ALERT_BODY_COMPRESSION) -> Tuple[str, bytes]:
+    """按压缩方式编码消息，返回 (encoding, content)；压缩后没有变小时保存原文"""
+    raw = text.encode("utf-8")
+    if compression == "zlib":
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        encoding = ENCODING_ZLIB
+    elif compression == "dict":
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=BODY_DICTIONARIES[CURRENT_DICTIONARY_VERSION])
+        encoding = f"{ENCODING_ZLIB_DICT}{CURRENT_DICTIONARY_VERSION}"
+    else:
+        return ENCODING_PLAIN, raw
+    content = compressor.compress(raw) + compressor.flush()
+    if len(content) >= len(raw):
+        return ENCODING_PLAIN, raw
+    return encoding, content
+
+
+def decode_body(encoding: str, content: bytes) -> str:
+    """解码 encode_body() 的结果"""
+    if encoding == ENCODING_PLAIN:
+        return bytes(content).decode("utf-8")
+    if encoding == ENCODING_ZLIB:
+        decompressor = zlib.decompressobj(-15)
+    elif encoding.startswith(ENCODING_ZLIB_DICT):
+        decompressor = zlib.decompressobj(-15, zdict=BODY_DICTIONARIES[int(encoding[len(ENCODING_ZLIB_DICT):])])
+    else:
+        raise ValueError(f"未知的消息编码: {encoding}")
+    return (decompressor.decompress(content) + decompressor.flush()).decode("utf-8")
+
+
+class BodyCache:
+    """已解压消息的 LRU 缓存（哈希 -> 消息），内容寻址的消息不会变化，不需要失效"""
+
+    def __init__(self, max_entries: int = 2000):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: str, text: str):
+        if self._max_entries <= 0:
+            return
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+body_cache = BodyCache(ALERT_BODY_CACHE_SIZE)
+
+
+def body_rows(texts: Iterable[str], compression: str = ALERT_BODY_COMPRESSION) -> Tuple[List[Optional[str]], List[dict]]:
+    """
+    返回 (每条消息的哈希, 需要写入 alert_bodies 的行)；空消息的哈希为 None，不写入
+    写入的行按哈希去重并排序，并发事务以相同顺序加锁，避免死锁
+    """
+    now = beijing_now_naive()
+    hashes = []
+    rows = {}
+    for text in texts:
+        if not text:
+            hashes.append(None)
+            continue
+        key = body_hash(text)
+        hashes.append(key)
+        if key not in rows:
+            encoding, content = encode_body(text, compression)
+            rows[key] = {
+                "hash": key,
+                "encoding": encoding,
+                "content": content,
+                "original_size": len(text.encode("utf-8")),
+                "stored_size": len(content),
+                "created_at": now,
+                "last_used_at": now,
+            }
+            body_cache.put(key, text)
+    return hashes, [rows[key] for key in sorted(rows)]
+
+
+def upsert_bodies_statement():
+    """INSERT ... ON CONFLICT (hash) DO UPDATE：已存在的消息只更新 last_used_at（数据清理不会回收正在被引用的消息）"""
+    stmt = dialect_insert(AlertBody)
+    return stmt.on_conflict_do_update(index_elements=["hash"], set_={"last_used_at": stmt.excluded.last_used_at})
+
+
+async def store_bodies(db: AsyncSession, texts: List[str]) -> List[Optional[str]]:
+    """在当前事务中写入消息内容，返回每条消息的哈希（空消息为 None），与 texts 一一对应"""
+    hashes, rows = body_rows(texts)
+    if rows:
+        await db.execute(upsert_bodies_statement(), rows)
+    return hashes
+
+
+def _cached_bodies(hashes: Iterable[Optional[str]]) -> Tuple[Dict[str, str], List[str]]:
+    found = {}
+    missing = []
+    for key in set(hashes):
+        if key is None:
+            continue
+        text = body_cache.get(key)
+        if text is None:
+            missing.append(key)
+        else:
+            found[key] = text
+    return found, missing
+
+
+def _decode_rows(rows, found: Dict[str, str]) -> Dict[str, str]:
+    for row in rows:
+        text = decode_body(row.encoding, row.content)
+        body_cache.put(row.hash, text)
+        found[row.hash] = text
+    return found
+
+
+def _bodies_query(hashes: List[str]):
+    return select(AlertBody.hash, AlertBody.encoding, AlertBody.content).where(AlertBody.hash.in_(hashes))
+
+
+async def load_bodies(db: AsyncSession, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+    """按哈希读取并解压消息（一条 SELECT ... IN，先查进程内缓存），返回 哈希 -> 消息"""
+    found, missing = _cached_bodies(hashes)
+    if missing:
+        _decode_rows((await db.execute(_bodies_query(missing))).all(), found)
+    return found
+
+
+def load_bodies_sync(conn: Connection, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+    """load_bodies() 的同步版本（命令行工具和迁移使用）"""
+    found, missing = _cached_bodies(hashes)
+    if missing:
+        _decode_rows(conn.execute(_bodies_query(missing)).all(), found)
+    return found
+
+
+def missing_body(key: str) -> str:
+    """alert_bodies 中找不到消息时返回的占位内容（例如消息被手工删除），接口不因为 input 为空而报错"""
+    return f"[消息内容缺失: alert_bodies 中没有 {key}]"
+
+
+def alert_input(input_text: Optional[str], key: Optional[str], bodies: Dict[str, str]) -> Optional[str]:
+    """告警的消息内容：alerts.input（启用消息存储之前的记录），否则按 body_hash 从 bodies 中取，找不到时为占位内容"""
+    if input_text is not None or key is None:
+        return input_text
+    return bodies.get(key) or missing_body(key)
+
+
+async def rehydrate_alerts(db: AsyncSession, alerts: Iterable[Alert]):
+    """
+    还原查询出的 Alert 对象的 input（查询时需要 undefer(Alert.input)）
+    用 set_committed_value 赋值，不会被当作修改写回数据库
+    """
+    pending = [alert for alert in alerts if alert.input is None and alert.body_hash is not None]
+    if not pending:
+        return
+    bodies = await load_bodies(db, [alert.body_hash for alert in pending])
+    for alert in pending:
+        set_committed_value(alert, "input", alert_input(None, alert.body_hash, bodies))
+
+
+def _by_id(table, statement):
+    # 条件中带上 time：PostgreSQL 分区表的主键为 (id, time)，每条 UPDATE 只访问一个分区
+    return statement.where(and_(table.c.id == bindparam("b_id"), table.c.time == bindparam("b_time")))
+
+
+def migrate_batch(conn: Connection, last_id: int, batch_size: int, compression: str = ALERT_BODY_COMPRESSION) -> Tuple[int, int]:
+    """把 id > last_id 的一批 alerts.input 写入 alert_bodies 并清空 input，返回 (本批最大 id, 迁移数量)"""
+    rows = conn.execute(
+        select(Alert.id, Alert.time, Alert.input)
+        .where(Alert.id > last_id, Alert.input.isnot(None), Alert.input != "", Alert.body_hash.is_(None))
+        .order_by(Alert.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return last_id, 0
+    hashes, bodies = body_rows([row.input for row in rows], compression)
+    conn.execute(upsert_bodies_statement(), bodies)
+    table = Alert.__table__
+    conn.execute(
+        _by_id(table, update(table)).values(body_hash=bindparam("b_hash"), input=None),
+        [{"b_id": row.id, "b_time": row.time, "b_hash": key} for row, key in zip(rows, hashes)]
+    )
+    return rows[-1].id, len(rows)
+
+
+def restore_batch(conn: Connection, last_id: int, batch_size: int) -> Tuple[int, int]:
+    """把 id > last_id 的一批告警的消息写回 alerts.input 并清空 body_hash，返回 (本批最大 id, 还原数量)"""
+    rows = conn.execute(
+        select(Alert.id, Alert.time, Alert.body_hash)
+        .where(Alert.id > last_id, Alert.body_hash.isnot(None))
+        .order_by(Alert.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return last_id, 0
+    bodies = load_bodies_sync(conn, [row.body_hash for row in rows])
+    table = Alert.__table__
+    conn.execute(
+        _by_id(table, update(table)).values(input=bindparam("b_input"), body_hash=None),
+        [{"b_id": row.id, "b_time": row.time, "b_input": bodies.get(row.body_hash)} for row in rows]
+    )
+    return rows[-1].id, len(rows)
+
+
+def run_batches(engine, step, batch_size: int, pause: float, label: str) -> int:
+    """按 id 顺序分批执行 step，每批一个事务，返回处理的记录总数"""
+    last_id = 0
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            last_id, count = step(conn, last_id, batch_size)
+        if not count:
+            return total
+        total += count
+        print(f"[{label}] 已处理 {total} 条（id <= {last_id}）")
+        if pause:
+            time.sleep(pause)
+
+
+def _octet_length(conn: Connection, column):
+    if conn.dialect.name == "postgresql":
+        return func.octet_length(column)
+    return func.length(cast(column, LargeBinary))
+
+
+def report(conn: Connection, sample: int = 2000) -> List[str]:
+    """统计消息存储的去重和压缩效果，并在最近的 sample 条消息上对比各种压缩方式，返回报告的各行"""
+    alerts, stored_alerts, referenced_bytes = conn.execute(
+        select(func.count(), func.count(Alert.body_hash), func.coalesce(func.sum(AlertBody.original_size), 0))
+        .select_from(Alert)
+        .outerjoin(AlertBody, AlertBody.hash == Alert.body_hash)
+    ).one()
+    inline_alerts, inline_bytes = conn.execute(
+        select(func.count(), func.coalesce(func.sum(_octet_length(conn, Alert.input)), 0))
+        .where(Alert.input.isnot(None))
+    ).one()
+    bodies, original_bytes, stored_bytes = conn.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(AlertBody.original_size), 0),
+            func.coalesce(func.sum(AlertBody.stored_size), 0)
+        )
+    ).one()
+    encodings = conn.execute(
+        select(AlertBody.encoding, func.count()).group_by(AlertBody.encoding).order_by(AlertBody.encoding)
+    ).all()
+
+    def ratio(numerator, denominator) -> str:
+        return f"{numerator / denominator:.2f}x" if denominator else "-"
+
+    lines = [
+        f"告警 {alerts} 条：消息在 alert_bodies 中 {stored_alerts} 条，仍在 alerts.input 中 {inline_alerts} 条"
+        f"（{inline_bytes:,} 字节，可运行 python bodies.py migrate 迁移）",
+        f"alert_bodies：{bodies} 份不同的消息，原文 {original_bytes:,} 字节，存储 {stored_bytes:,} 字节，"
+        f"编码 {', '.join(f'{encoding} {count}' for encoding, count in encodings) or '-'}",
+        f"  去重：被引用的消息原文共 {referenced_bytes:,} 字节，去重后 {original_bytes:,} 字节（{ratio(referenced_bytes, original_bytes)}）",
+        f"  压缩：{ratio(original_bytes, stored_bytes)}；去重 + 压缩合计 {ratio(referenced_bytes, stored_bytes)}",
+    ]
+
+    recent = conn.execute(
+        select(Alert.input, Alert.body_hash).order_by(Alert.id.desc()).limit(sample)
+    ).all()
+    bodies_by_hash = load_bodies_sync(conn, [row.body_hash for row in recent])
+    texts = [text for text in (row.input or bodies_by_hash.get(row.body_hash) for row in recent) if text]
+    if texts:
+        distinct = list(dict.fromkeys(texts))
+        raw = sum(len(text.encode("utf-8")) for text in texts)
+        lines.append(f"最近 {len(texts)} 条消息（{raw:,} 字节，{len(distinct)} 份不同的消息）按压缩方式对比（去重后）：")
+        for mode in COMPRESSION_MODES:
+            size = sum(len(encode_body(text, mode)[1]) for text in distinct)
+            lines.append(f"  {mode:<5} {size:>12,} 字节  {ratio(raw, size)}")
+    return lines
+
+
+if __name__ == "__main__":
+    from database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="告警消息内容存储（alert_bodies）维护")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="把已有告警的 input 分批迁移到 alert_bodies")
+    migrate_parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的告警数量")
+    migrate_parser.add_argument("--pause", type=float, default=0.0, help="两批之间的停顿（秒），减轻对在线服务的影响")
+    migrate_parser.add_argument("--compression", choices=COMPRESSION_MODES, default=ALERT_BODY_COMPRESSION,
+                                help="压缩方式（默认 ALERT_BODY_COMPRESSION）")
+    report_parser = subparsers.add_parser("report", help="统计去重和压缩效果")
+    report_parser.add_argument("--sample", type=int, default=2000, help="对比压缩方式使用的最近消息数量")
+    restore_parser = subparsers.add_parser("restore", help="把 alert_bodies 中的消息写回 alerts.input（停用消息存储前执行）")
+    restore_parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的告警数量")
+    restore_parser.add_argument("--pause", type=float, default=0.0, help="两批之间的停顿（秒）")
+    args = parser.parse_args()
+
+    init_db()
+    begin = time.monotonic()
+    if args.command == "migrate":
+        count = run_batches(
+            engine, lambda conn, last_id, size: migrate_batch(conn, last_id, size, args.compression),
+            args.batch_size, args.pause, "迁移"
+        )
+        print(f"已迁移 {count} 条告警的消息内容，耗时 {time.monotonic() - begin:.2f} 秒")
+        print("PostgreSQL 上 alerts 表释放的空间在 VACUUM 之后才能被重用")
+    elif args.command == "restore":
+        count = run_batches(engine, restore_batch, args.batch_size, args.pause, "还原")
+        print(f"已还原 {count} 条告警的消息内容，耗时 {time.monotonic() - begin:.2f} 秒")
+    else:
+        with engine.connect() as connection:
+            print("\n".join(report(connection, args.sample)))
@@ -0,0 +1,202 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+# 写入告警的 (id, enterprise_name, alert_type, time)
+AlertWrite = Tuple[int, Optional[str], Optional[str], Optional[datetime]]
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "alert_id", "alert_time", "scope")
+
+    def __init__(self, value, expires_at: float, alert_id=None, alert_time=None, scope=None):
+        self.value = value
+        self.expires_at = expires_at
+        self.alert_id = alert_id  # 单个告警的缓存
+        self.alert_time = alert_time
+        self.scope = scope  # 列表的缓存：(enterprise_name, alert_type, 时间下界, 时间上界)
+
+
+class QueryCache:
+    """
+    告警查询缓存（进程内，容量有上限的 LRU + TTL）
+
+    缓存键由接口名和规范化后的查询参数组成。写入时按告警精确失效：
+    - 单个告警（GET /api/alerts/{alert_id}）：该告警被新增、更新或删除时失效
+    - 告警列表（GET /api/alerts）：写入告警的 enterprise_name、alert_type、time 落在列表的过滤条件内时失效
+    - 数据清理删除某个时间之前的告警时，失效可能包含这些告警的缓存
+    查询开始前取 generation()，写回时如果期间发生过失效则不写入，避免把失效前读到的旧结果放回缓存。
+    TTL 是兜底：其他进程（例如迁移或手工修改数据库）的写入不会通知到这里。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # 列表缓存按 (enterprise_name, alert_type) 过滤条件建索引，写入时只检查可能受影响的列表
+        self._lists: Dict[Tuple[Optional[str], Optional[str]], Set[Hashable]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0 and self._ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generation(self) -> int:
+        """当前失效代数，查询数据库之前获取，写回缓存时传入"""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """命中返回缓存的值，未命中或已过期返回 None"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put_alert(self, alert_id: int, value, generation: int, alert_time: Optional[datetime]):
+        """缓存单个告警，缓存键为 alert_cache_key(alert_id)"""
+        self._put(alert_cache_key(alert_id), _Entry(value, 0, alert_id=alert_id, alert_time=alert_time), generation)
+
+    def put_list(
+        self,
+        key: Hashable,
+        value,
+        generation: int,
+        enterprise_name: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ):
+        """缓存告警列表，scope 为列表的过滤条件（告警时间范围 [start_time, end_time)）"""
+        self._put(key, _Entry(value, 0, scope=(enterprise_name, alert_type, start_time, end_time)), generation)
+
+    def _put(self, key: Hashable, entry: _Entry, generation: int):
+        if not self.enabled or generation != self._generation:
+            return
+        if key in self._entries:
+            self._remove(key)
+        entry.expires_at = self._clock() + self._ttl
+        self._entries[key] = entry
+        if entry.scope is not None:
+            self._lists.setdefault(entry.scope[:2], set()).add(key)
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.scope is not None:
+            keys = self._lists.get(entry.scope[:2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._lists[entry.scope[:2]]
+
+    def _drop(self, keys: Iterable[Hashable]) -> int:
+        dropped = 0
+        for key in list(keys):
+            if key in self._entries:
+                self._remove(key)
+                dropped += 1
+        self.invalidations += dropped
+        return dropped
+
+    def invalidate_alerts(self, alerts: Iterable[AlertWrite]) -> int:
+        """告警被新增或更新后调用：失效这些告警的单个缓存，以及过滤条件包含它们的列表缓存"""
+        self._generation += 1
+        if not self._entries:
+            return 0
+        alerts = list(alerts)
+        stale = [alert_cache_key(alert_id) for alert_id, _, _, _ in alerts]
+        # 同一过滤条件组合下只需要检查每个列表一次
+        times_by_filter: Dict[Tuple[Optional[str], Optional[str]], list] = {}
+        for _, enterprise_name, alert_type, alert_time in alerts:
+            for scope in (
+                (enterprise_name, alert_type),
+                (enterprise_name, None),
+                (None, alert_type),
+                (None, None)
+            ):
+                if scope in self._lists:
+                    times_by_filter.setdefault(scope, []).append(alert_time)
+        for scope, alert_times in times_by_filter.items():
+            for key in self._lists[scope]:
+                _, _, start_time, end_time = self._entries[key].scope
+                if any(_in_range(alert_time, start_time, end_time) for alert_time in alert_times):
+                    stale.append(key)
+        return self._drop(stale)
+
+    def invalidate_before(self, cutoff: datetime) -> int:
+        """数据清理删除 cutoff 之前的告警后调用：失效这些告警的单个缓存和时间范围覆盖 cutoff 之前的列表缓存"""
+        self._generation += 1
+        stale = [
+            key for key, entry in self._entries.items()
+            if (entry.alert_id is not None and (entry.alert_time is None or entry.alert_time < cutoff))
+            or (entry.scope is not None and (entry.scope[2] is None or entry.scope[2] < cutoff))
+        ]
+        return self._drop(stale)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._lists.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self._max_entries,
+            "ttl_seconds": self._ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def alert_cache_key(alert_id: int) -> Hashable:
+    """单个告警的缓存键"""
+    return ("get_alert", alert_id)
+
+
+def _in_range(alert_time: Optional[datetime], start_time: Optional[datetime], end_time: Optional[datetime]) -> bool:
+    if alert_time is None:
+        return True
+    if start_time is not None and alert_time < start_time:
+        return False
+    if end_time is not None and alert_time >= end_time:
+        return False
+    return True
+
+
+def cursor_end_time(end_time: Optional[datetime], after_time: datetime) -> datetime:
+    """游标分页的页面只包含 time <= after_time 的告警，更晚写入的告警不影响这一页"""
+    upper = after_time + timedelta(microseconds=1)
+    return upper if end_time is None else min(end_time, upper)
@@ -25,13 +25,78 @@ else:
 
 # Dify Workflow API 配置
 DIFY_WEBHOOK_URL = os.getenv("DIFY_WEBHOOK_URL", "")  # 接收告警数据的 Dify workflow webhook
-DIFY_WEBHOOK_URL_TIMEOUT = os.getenv("DIFY_WEBHOOK_URL_TIMEOUT", "")  # 20分钟超时后触发的 Dify workflow webhook
+DIFY_WEBHOOK_URL_TIMEOUT = os.getenv("DIFY_WEBHOOK_URL_TIMEOUT", "")  # 20分钟超时后触发的 Dify workflow webhook（为空时超时告警只做标记，不写入发件箱）
 DIFY_API_KEY = os.getenv("DIFY_API_KEY", "")  # Dify API Key (Bearer Token)
 DIFY_USER_ID = os.getenv("DIFY_USER_ID", "alert-system")  # Dify User ID (可选，默认值)
 
+# Dify HTTP 客户端连接池配置（应用内共享一个客户端，复用 TCP/TLS 连接）
+DIFY_HTTP_TIMEOUT_SECONDS = float(os.getenv("DIFY_HTTP_TIMEOUT_SECONDS", "30"))  # 单次请求超时
+DIFY_MAX_CONNECTIONS = int(os.getenv("DIFY_MAX_CONNECTIONS", "20"))  # 最大连接数
+DIFY_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DIFY_MAX_KEEPALIVE_CONNECTIONS", "10"))  # 最大空闲（keep-alive）连接数
+DIFY_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("DIFY_KEEPALIVE_EXPIRY_SECONDS", "30"))  # 空闲连接保持时间
+
 # 超时时间配置（分钟，支持小数，例如 0.167 表示 10 秒）
 ALERT_TIMEOUT_MINUTES = float(os.getenv("ALERT_TIMEOUT_MINUTES", "25"))
 
 # 检查间隔（秒）
 CHECK_INTERVAL_SECONDS = int(os.getenv("CHECK_INTERVAL_SECONDS", "60"))
 
+# 超时调度器每批处理的到期告警数量上限
+TIMEOUT_FIRE_BATCH_SIZE = int(os.getenv("TIMEOUT_FIRE_BATCH_SIZE", "100"))
+
+# 超时通知发件箱投递配置
+DIFY_DISPATCH_CONCURRENCY = int(os.getenv("DIFY_DISPATCH_CONCURRENCY", "10"))  # 并行发送通知的上限
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))  # 每批领取的待投递通知数量
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "5"))  # 没有新通知时的轮询间隔（秒）
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))  # 最大投递次数，超过后标记为 dead
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "5"))  # 重试退避基数（秒），每次失败翻倍
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "600"))  # 重试退避上限（秒）
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "0"))  # 领取后的投递租约（秒），进程崩溃时租约到期后重新投递；0 表示按批量大小、并发上限和请求超时自动计算
+
+# 按企业合并超时通知（同一企业短时间内的多个超时告警合并为一次 workflow 调用）
+OUTBOX_COALESCE_ENABLED = os.getenv("OUTBOX_COALESCE_ENABLED", "false").lower() in ("1", "true", "yes")
+OUTBOX_COALESCE_WINDOW_SECONDS = float(os.getenv("OUTBOX_COALESCE_WINDOW_SECONDS", "30"))  # 静默窗口：该企业这么久没有新的超时告警后发送
+OUTBOX_COALESCE_MAX_ALERTS = int(os.getenv("OUTBOX_COALESCE_MAX_ALERTS", "20"))  # 每次合并的告警数量上限，达到后立即发送
+OUTBOX_COALESCE_MAX_DELAY_SECONDS = float(os.getenv("OUTBOX_COALESCE_MAX_DELAY_SECONDS", "120"))  # 最早的告警最长等待时间（秒）
+
+# 数据清理配置（删除前一天的记录，全天分块增量执行）
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "300"))  # 清理任务运行间隔（秒）
+RETENTION_MAX_ROWS_PER_RUN = int(os.getenv("RETENTION_MAX_ROWS_PER_RUN", "50000"))  # 每次运行最多删除的记录数
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "1000"))  # 每个删除事务覆盖的 id 区间大小
+RETENTION_CHUNK_PAUSE_SECONDS = float(os.getenv("RETENTION_CHUNK_PAUSE_SECONDS", "0"))  # 两个删除事务之间的停顿（秒）
+RETENTION_GRACE_MINUTES = float(os.getenv("RETENTION_GRACE_MINUTES", "25"))  # 前一天最后多少分钟内未处理且未超时的记录保留到第二天
+
+# alerts 表按天分区（仅 PostgreSQL；SQLite 始终使用单表）
+ALERT_PARTITIONING_ENABLED = os.getenv("ALERT_PARTITIONING_ENABLED", "true").lower() in ("1", "true", "yes")  # 新部署是否创建分区表
+ALERT_PARTITION_DAYS_AHEAD = int(os.getenv("ALERT_PARTITION_DAYS_AHEAD", "7"))  # 提前创建未来多少天的分区
+
+# 告警导出：服务端游标每批读取的记录数
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# 告警统计汇总（alert_rollups，5 分钟时间桶）保留天数，超过后由数据清理任务删除；0 表示不删除
+ROLLUP_RETENTION_DAYS = int(os.getenv("ROLLUP_RETENTION_DAYS", "30"))
+
+# 告警查询缓存（GET /api/alerts 和 GET /api/alerts/{alert_id}，进程内 LRU + TTL，写入时精确失效）
+ALERT_CACHE_MAX_ENTRIES = int(os.getenv("ALERT_CACHE_MAX_ENTRIES", "1000"))  # 最多缓存的查询结果数量，0 表示禁用缓存
+ALERT_CACHE_TTL_SECONDS = float(os.getenv("ALERT_CACHE_TTL_SECONDS", "30"))  # 缓存有效期（秒），0 表示禁用缓存
+
+# 告警消息内容存储（alert_bodies，按内容 SHA-256 寻址，相同的消息只存一份）
+ALERT_BODY_STORE_ENABLED = os.getenv("ALERT_BODY_STORE_ENABLED", "false").lower() in ("1", "true", "yes")  # 新告警的消息写入 alert_bodies（alerts.input 为空）
+ALERT_BODY_COMPRESSION = os.getenv("ALERT_BODY_COMPRESSION", "dict").lower()  # 压缩方式：none / zlib / dict（zlib + 内置的模板共享字典）
+ALERT_BODY_CACHE_SIZE = int(os.getenv("ALERT_BODY_CACHE_SIZE", "2000"))  # 进程内缓存的已解压消息数量，0 表示不缓存
+
+# 日志配置（文件和控制台写入在后台线程中完成，见 app_logging.py）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # 日志级别，DEBUG 时记录每个请求的请求头和查询参数
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # 待写出日志的队列长度，队列满时丢弃新的日志记录
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1"))  # 成功且不慢的请求记录响应日志的比例（0~1）
+REQUEST_LOG_SLOW_SECONDS = float(os.getenv("REQUEST_LOG_SLOW_SECONDS", "1"))  # 慢请求阈值（秒），慢请求和错误响应总是记录
+
+# 结构化事件环形缓冲区容量（每个告警的接收、超时检查、通知投递结果，GET /debug/events 查询），0 表示不保存事件
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+
+# 按请求开启的性能剖析（SQL 语句数和耗时、最慢的语句、可选的调用栈采样，见 profiling.py）
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")  # 请求头 X-Profile-Token 与此一致时剖析该请求，为空时不接受请求头开启
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # 随机抽样剖析的请求比例（0~1），0 表示不抽样
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "200"))  # 保存最近多少个剖析结果（GET /debug/profiles 查询）
+PROFILING_SLOW_STATEMENTS = int(os.getenv("PROFILING_SLOW_STATEMENTS", "5"))  # 每个请求保存最慢的几条 SQL 语句
+PROFILING_STACK_INTERVAL_MS = float(os.getenv("PROFILING_STACK_INTERVAL_MS", "5"))  # 调用栈采样间隔（毫秒）
@@ -1,8 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import (
+    create_engine, inspect, Column, Integer, String, DateTime, Boolean, Text, LargeBinary, Index, UniqueConstraint,
+    and_
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, deferred
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from datetime import datetime, timezone, timedelta
-from config import DATABASE_URL
+from typing import Optional
+from parser import extract_alert_fields, PARSED_FIELDS
+from config import DATABASE_URL, ALERT_PARTITIONING_ENABLED, ALERT_PARTITION_DAYS_AHEAD
 
 # 北京时间时区 (UTC+8)
 BEIJING_TZ = timezone(timedelta(hours=8))
@@ -11,6 +18,33 @@ def beijing_now():
     """获取当前北京时间"""
     return datetime.now(BEIJING_TZ)
 
+
+def to_db_time(dt: datetime) -> datetime:
+    """
+    转换为数据库存储使用的时间（不带时区的北京时间）
+    数据库中的 datetime 字段是 naive 的，存储的是北京时间；
+    asyncpg 不接受带时区的 datetime 与 timestamp without time zone 比较，统一在应用层去掉时区
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(BEIJING_TZ).replace(tzinfo=None)
+    return dt
+
+
+def beijing_now_naive():
+    """获取当前北京时间（不带时区，用于写入和比较数据库字段）"""
+    return to_db_time(beijing_now())
+
+
+def to_async_url(url: str) -> str:
+    """将 config.py 中的同步数据库 URL 转换为异步驱动 URL（asyncpg / aiosqlite）"""
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+", 1)[0].lower()
+    if driver in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
 # 配置数据库连接，设置时区
 if "postgresql" in DATABASE_URL.lower():
     # PostgreSQL: 在连接参数中设置时区
@@ -24,6 +58,24 @@ else:
 engine = create_engine(DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步数据库连接（供 async 接口和后台任务使用，不阻塞事件循环）
+if "postgresql" in DATABASE_URL.lower():
+    # asyncpg: 通过 server_settings 设置时区
+    async_connect_args = {
+        "server_settings": {"timezone": "Asia/Shanghai"}
+    }
+else:
+    # aiosqlite: 在独立线程中执行 SQLite 调用
+    async_connect_args = {}
+
+async_engine = create_async_engine(to_async_url(DATABASE_URL), connect_args=async_connect_args)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -34,25 +86,171 @@ class Alert(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # 直接输入的字段
-    input = Column(Text)  # 告警消息内容
+    input = deferred(Column(Text))  # 告警消息内容（延迟加载：列表查询不读取，需要时用 undefer(Alert.input)）；消息存入 alert_bodies 时为空
+    body_hash = Column(String(64), index=True)  # 消息内容的 SHA-256（alert_bodies.hash），读取时由 bodies.rehydrate_alerts 还原 input
     enterprise_name = Column(String(200), index=True)  # 企业名称
     time = Column(DateTime, index=True)  # 告警时间
     alert_type = Column(String(50), index=True)  # 告警类型："告警触发" 或 "告警恢复"
     template_name = Column(String(200), index=True)  # 模板名称/话术名称
     om_type = Column(String(100))  # OM 类型
     alert_key = Column(String(200), index=True)  # 告警唯一标识键
+    idempotency_key = Column(String(64))  # 幂等键：请求头 Idempotency-Key 或告警内容的 SHA-256，重放的告警不重复写入
+    
+    # 从 input 中解析出的字段（parser.parse_alert_input，接收告警时写入，已有记录用 backfill.py 回填）
+    region = Column(String(50), index=True)  # 区域
+    metric = Column(String(100), index=True)  # 指标
+    rule_name = Column(String(200), index=True)  # 规则名称
+    generator_url = Column(Text)  # 告警链接
+    alert_summary = Column(Text)  # 告警摘要
+    alert_details = Column(Text)  # 告警详情
+    script_name = Column(String(200))  # 话术名称
     
     # 状态字段
     processed = Column(Boolean, default=False)  # 是否已处理
     timeout_triggered = Column(Boolean, default=False)  # 是否已触发超时通知
+    deadline_at = Column(DateTime)  # 超时截止时间（告警时间 + ALERT_TIMEOUT_MINUTES），仅"告警触发"有值
     
     # 时间戳（使用北京时间）
-    created_at = Column(DateTime, default=lambda: beijing_now())
-    updated_at = Column(DateTime, default=lambda: beijing_now(), onupdate=lambda: beijing_now())
+    created_at = Column(DateTime, default=lambda: beijing_now_naive())
+    updated_at = Column(DateTime, default=lambda: beijing_now_naive(), onupdate=lambda: beijing_now_naive())
+
+
+def parsed_alert_columns(input_text: Optional[str]) -> dict:
+    """从告警消息中解析区域、指标、规则名称等字段（parser.PARSED_FIELDS），超过列长度的部分截断"""
+    return alert_columns_from_parsed(extract_alert_fields(input_text))
+
+
+def alert_columns_from_parsed(parsed: dict) -> dict:
+    """把解析结果（parse_alert_input / parse_many）转换为 alerts 表的列值，超过列长度的部分截断"""
+    columns = {}
+    for name in PARSED_FIELDS:
+        value = parsed[name]
+        length = getattr(Alert.__table__.c[name].type, "length", None)
+        columns[name] = value[:length] if value is not None and length is not None else value
+    return columns
+
+
+# 游标分页的复合索引：按企业 / 告警类型过滤，按 (time DESC, id) 排序
+Index("ix_alerts_enterprise_time_id", Alert.enterprise_name, Alert.time.desc(), Alert.id)
+Index("ix_alerts_alert_type_time_id", Alert.alert_type, Alert.time.desc(), Alert.id)
+
+# 幂等键唯一索引：包含分区键 time，PostgreSQL 分区表上也可以建唯一索引（幂等键本身由告警时间参与计算）
+Index("uq_alerts_idempotency_key_time", Alert.idempotency_key, Alert.time, unique=True)
+
+
+# 待检查"告警触发"的截止时间部分索引：定期检查只扫描已到期的告警
+PENDING_TRIGGER_CONDITION = and_(
+    Alert.om_type == "告警触发",
+    Alert.processed == False,
+    Alert.timeout_triggered == False
+)
+Index(
+    "ix_alerts_pending_deadline",
+    Alert.deadline_at,
+    postgresql_where=PENDING_TRIGGER_CONDITION,
+    sqlite_where=PENDING_TRIGGER_CONDITION
+)
+
+
+# 超时通知发件箱状态
+OUTBOX_PENDING = "pending"  # 待投递（包括等待重试）
+OUTBOX_SENT = "sent"  # 已投递
+OUTBOX_DEAD = "dead"  # 超过最大重试次数，不再投递
+
+
+class NotificationOutbox(Base):
+    """
+    超时通知发件箱
+    超时检测在标记 timeout_triggered=True 的同一事务中写入，由后台投递器发送到 Dify，
+    进程崩溃或 Dify 不可用时通知不会丢失
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alert_id = Column(Integer, index=True)  # 对应的"告警触发" ID
+    enterprise_name = Column(String(200))  # 企业名称
+    payload = Column(Text)  # Dify workflow 的 inputs（JSON）
+
+    # 投递状态
+    status = Column(String(20), default=OUTBOX_PENDING)  # pending / sent / dead
+    attempts = Column(Integer, default=0)  # 已尝试投递次数
+    next_attempt_at = Column(DateTime, default=lambda: beijing_now_naive())  # 下次可投递时间（重试退避 / 投递租约）
+    last_error = Column(Text)  # 最近一次投递失败的原因
+    sent_at = Column(DateTime)  # 投递成功时间
+
+    # 时间戳（使用北京时间）
+    created_at = Column(DateTime, default=lambda: beijing_now_naive())
+    updated_at = Column(DateTime, default=lambda: beijing_now_naive(), onupdate=lambda: beijing_now_naive())
+
+
+# 待投递通知的部分索引：投递器只扫描到期的 pending 记录
+Index(
+    "ix_notification_outbox_due",
+    NotificationOutbox.next_attempt_at,
+    postgresql_where=NotificationOutbox.status == OUTBOX_PENDING,
+    sqlite_where=NotificationOutbox.status == OUTBOX_PENDING
+)
+
+
+class AlertRollup(Base):
+    """
+    告警统计汇总表：按 5 分钟时间桶、企业、OM 类型、告警类型累计告警数量
+    接收告警和超时检测时在同一事务中增量更新（upsert），GET /api/stats 只读这张表
+    """
+    __tablename__ = "alert_rollups"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "enterprise_name", "om_type", "alert_type", name="uq_alert_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)  # 时间桶开始时间（告警时间向下取整到 5 分钟）
+    enterprise_name = Column(String(200), nullable=False)  # 企业名称
+    om_type = Column(String(100), nullable=False)  # OM 类型
+    alert_type = Column(String(50), nullable=False)  # 告警类型
+
+    alert_count = Column(Integer, nullable=False, default=0)  # 告警总数
+    trigger_count = Column(Integer, nullable=False, default=0)  # "告警触发"数量
+    recovery_count = Column(Integer, nullable=False, default=0)  # "告警恢复"数量
+    timeout_count = Column(Integer, nullable=False, default=0)  # 超时未恢复的"告警触发"数量（计入告警时间所在的时间桶）
+
+    updated_at = Column(DateTime, default=lambda: beijing_now_naive(), onupdate=lambda: beijing_now_naive())
+
+
+class AlertBody(Base):
+    """
+    告警消息内容表：按内容 SHA-256 寻址，相同的消息只存一份（见 bodies.py）
+    content 为原文或 zlib 压缩后的字节，encoding 记录编码方式（plain / zlib / zlib-dict-<字典版本>）
+    """
+    __tablename__ = "alert_bodies"
+
+    id = Column(Integer, primary_key=True)
+    hash = Column(String(64), nullable=False, unique=True)  # 消息内容（UTF-8）的 SHA-256
+    encoding = Column(String(20), nullable=False)  # 编码方式
+    content = Column(LargeBinary, nullable=False)  # 编码后的消息内容
+    original_size = Column(Integer, nullable=False)  # 原文字节数（UTF-8）
+    stored_size = Column(Integer, nullable=False)  # 编码后的字节数
+
+    created_at = Column(DateTime, default=lambda: beijing_now_naive())
+    last_used_at = Column(DateTime, default=lambda: beijing_now_naive())  # 最近一次被告警引用的时间，数据清理据此回收不再引用的消息
+
+
+def dialect_insert(model):
+    """返回当前数据库方言的 insert()，支持 on_conflict_do_update / on_conflict_do_nothing（PostgreSQL 和 SQLite）"""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
 
 
 def init_db():
     """初始化数据库表"""
+    if engine.dialect.name == "postgresql" and ALERT_PARTITIONING_ENABLED:
+        # PostgreSQL 新部署直接创建按天分区的 alerts 表（已有的普通表由 Alembic 迁移转换）
+        from partitions import create_partitioned_table, ensure_partitions
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(Alert.__tablename__):
+                create_partitioned_table(conn)
+                today = beijing_now_naive().date()
+                ensure_partitions(conn, today, today + timedelta(days=ALERT_PARTITION_DAYS_AHEAD))
     Base.metadata.create_all(bind=engine)
 
 
@@ -64,3 +262,8 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
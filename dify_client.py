@@ -0,0 +1,77 @@
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import (
+    DIFY_API_KEY,
+    DIFY_USER_ID,
+    DIFY_HTTP_TIMEOUT_SECONDS,
+    DIFY_MAX_CONNECTIONS,
+    DIFY_MAX_KEEPALIVE_CONNECTIONS,
+    DIFY_KEEPALIVE_EXPIRY_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# 应用级共享的 Dify HTTP 客户端（连接池 + keep-alive），启动时创建，关闭时释放
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_dify_client() -> httpx.AsyncClient:
+    """按配置创建带连接池限制的 Dify HTTP 客户端"""
+    return httpx.AsyncClient(
+        timeout=DIFY_HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=DIFY_MAX_CONNECTIONS,
+            max_keepalive_connections=DIFY_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=DIFY_KEEPALIVE_EXPIRY_SECONDS
+        )
+    )
+
+
+async def start_dify_client():
+    """应用启动时创建共享客户端"""
+    global _client
+    if _client is None:
+        _client = create_dify_client()
+        logger.info(f"[Dify 客户端] 已创建共享 HTTP 客户端: 最大连接数={DIFY_MAX_CONNECTIONS}, "
+                    f"最大空闲连接数={DIFY_MAX_KEEPALIVE_CONNECTIONS}, "
+                    f"空闲连接保持={DIFY_KEEPALIVE_EXPIRY_SECONDS}秒")
+
+
+async def close_dify_client():
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("[Dify 客户端] 已关闭共享 HTTP 客户端")
+
+
+def get_dify_client() -> httpx.AsyncClient:
+    """获取共享客户端；未经启动事件（例如脚本中直接调用）时按需创建"""
+    global _client
+    if _client is None:
+        _client = create_dify_client()
+    return _client
+
+
+async def run_workflow(url: str, inputs: Dict[str, Any]) -> httpx.Response:
+    """
+    调用 Dify workflow API（POST /v1/workflows/run，阻塞模式）
+    非 2xx 响应和网络错误直接抛出，由调用方决定是否重试
+    """
+    payload = {
+        "inputs": inputs,
+        "response_mode": "blocking",  # 阻塞模式，等待响应
+        "user": DIFY_USER_ID
+    }
+    headers = {"Content-Type": "application/json"}
+    # 如果配置了 API Key，添加到 Authorization header
+    if DIFY_API_KEY:
+        headers["Authorization"] = f"Bearer {DIFY_API_KEY}"
+
+    response = await get_dify_client().post(url, json=payload, headers=headers)
+    response.raise_for_status()
+    return response
@@ -0,0 +1,127 @@
+"""
+结构化事件记录：固定容量的内存环形缓冲区
+
+后台循环（超时检查、超时调度、发件箱投递）和接收告警时，每个告警的处理结果记录为一条类型化的事件，
+而不是一行格式化的 INFO 日志；普通日志只保留每一轮的汇总。记录事件只是把一个元组追加到 deque，
+不格式化字符串、不写磁盘；缓冲区满时丢弃最早的事件，内存占用固定。
+事件通过 GET /debug/events 按类型、告警 ID、企业名称和时间过滤查询。
+"""
+import itertools
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 事件类型
+EVENT_RECEIVED = "received"  # 接收并写入告警
+EVENT_DUPLICATE = "duplicate"  # 重放的告警（幂等键已存在），没有写入
+EVENT_SCHEDULED = "scheduled"  # "告警触发"已登记到超时调度器
+EVENT_CHECKED = "checked"  # 完成一轮超时检查（每轮一条，details 为本轮的计数）
+EVENT_SKIPPED = "skipped"  # 超时调度器到期的告警已被处理（收到告警恢复或已被定期检查处理），跳过
+EVENT_RECOVERED = "recovered"  # "告警触发"已收到匹配的"告警恢复"，不再检查超时
+EVENT_TIMED_OUT = "timed_out"  # "告警触发"超时未收到告警恢复，已写入通知发件箱
+EVENT_NOTIFIED = "notified"  # 超时通知投递成功
+EVENT_NOTIFY_RETRY = "notify_retry"  # 超时通知投递失败，等待重试
+EVENT_NOTIFY_DEAD = "notify_dead"  # 超时通知超过最大投递次数，不再重试
+
+EVENT_KINDS = (
+    EVENT_RECEIVED,
+    EVENT_DUPLICATE,
+    EVENT_SCHEDULED,
+    EVENT_CHECKED,
+    EVENT_SKIPPED,
+    EVENT_RECOVERED,
+    EVENT_TIMED_OUT,
+    EVENT_NOTIFIED,
+    EVENT_NOTIFY_RETRY,
+    EVENT_NOTIFY_DEAD,
+)
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# (序号, 时间戳, 类型, 告警 ID, 企业名称, 其他字段)
+Event = Tuple[int, float, str, Optional[int], Optional[str], Optional[Dict[str, Any]]]
+
+
+class EventRecorder:
+    """
+    事件环形缓冲区（collections.deque(maxlen=capacity)）
+    记录时只保存原始值（时间戳为 time.time()），查询时才转换为北京时间和字典；
+    counts 为进程启动以来每种事件的累计数量（包括已被挤出缓冲区的事件）
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self._events: "deque[Event]" = deque(maxlen=max(capacity, 0))
+        self._sequence = itertools.count(1)
+        self._counts: Counter = Counter()
+
+    @property
+    def capacity(self) -> int:
+        return self._events.maxlen
+
+    def record(
+        self,
+        kind: str,
+        alert_id: Optional[int] = None,
+        enterprise_name: Optional[str] = None,
+        **details: Any
+    ):
+        """记录一条事件"""
+        self._counts[kind] += 1
+        if self._events.maxlen:
+            self._events.append((next(self._sequence), time.time(), kind, alert_id, enterprise_name, details or None))
+
+    def record_many(self, kind: str, alerts: Iterable[Tuple[Optional[int], Optional[str]]], **details: Any):
+        """为一批告警记录同一类型的事件，alerts 为 (告警 ID, 企业名称)，同一批事件共享 details"""
+        now = time.time()
+        shared = details or None
+        count = 0
+        append = self._events.append if self._events.maxlen else None
+        for alert_id, enterprise_name in alerts:
+            count += 1
+            if append is not None:
+                append((next(self._sequence), now, kind, alert_id, enterprise_name, shared))
+        self._counts[kind] += count
+
+    def query(
+        self,
+        kinds: Optional[List[str]] = None,
+        alert_id: Optional[int] = None,
+        enterprise_name: Optional[str] = None,
+        since: Optional[datetime] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """按条件过滤事件，从新到旧返回最多 limit 条；since 为不带时区的北京时间或带时区的时间"""
+        since_timestamp = None
+        if since is not None:
+            since_timestamp = (since if since.tzinfo else since.replace(tzinfo=BEIJING_TZ)).timestamp()
+        kind_set = set(kinds) if kinds else None
+        matched = []
+        for event in reversed(self._events):
+            sequence, timestamp, kind, event_alert_id, event_enterprise, details = event
+            if since_timestamp is not None and timestamp < since_timestamp:
+                break  # 事件按时间顺序追加，更早的事件都不满足
+            if kind_set is not None and kind not in kind_set:
+                continue
+            if alert_id is not None and event_alert_id != alert_id:
+                continue
+            if enterprise_name is not None and event_enterprise != enterprise_name:
+                continue
+            matched.append({
+                "seq": sequence,
+                "time": datetime.fromtimestamp(timestamp, BEIJING_TZ).replace(tzinfo=None).isoformat(),
+                "kind": kind,
+                "alert_id": event_alert_id,
+                "enterprise_name": event_enterprise,
+                **(details or {})
+            })
+            if len(matched) >= limit:
+                break
+        return matched
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "size": len(self._events),
+            "counts": {kind: self._counts[kind] for kind in EVENT_KINDS if self._counts[kind]},
+        }
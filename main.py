@@ -1,56 +1,130 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, Depends, HTTPException, Request, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import aliased, undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, insert, update, exists, func
 from datetime import datetime, timedelta, timezone
 import httpx
 import asyncio
 import os
 import logging
 import json
-from typing import List
+import base64
+import csv
+import io
+import hashlib
+import time
+from typing import List, Optional, Union
 
-from database import get_db, Alert, init_db, SessionLocal
-from models import AlertInput, AlertResponse
-from parser import parse_time
+from database import (
+    engine,
+    async_engine,
+    get_async_db,
+    Alert,
+    init_db,
+    AsyncSessionLocal,
+    to_db_time,
+    beijing_now_naive,
+    PENDING_TRIGGER_CONDITION,
+    NotificationOutbox,
+    AlertRollup,
+    AlertBody,
+    dialect_insert,
+    parsed_alert_columns
+)
+from models import (
+    AlertInput,
+    AlertResponse,
+    AlertSummary,
+    AlertPage,
+    AlertStatsCounts,
+    AlertStatsRow,
+    AlertStatsResponse,
+    BatchAlertItemResult,
+    BatchAlertResponse
+)
+from parser import parse_time, PARSED_FIELDS
+from scheduler import DeadlineScheduler
+from outbox import OutboxWorker
+from retention import RetentionEngine
+from dify_client import run_workflow, start_dify_client, close_dify_client
+from cache import QueryCache, alert_cache_key, cursor_end_time
+from rollups import apply_rollup_increments, received_increments, timeout_increments, bucket_start
+from bodies import store_bodies, load_bodies, rehydrate_alerts, alert_input, decode_body
+from app_logging import setup_logging, RequestLoggingMiddleware
+from profiling import ProfileBuffer, ProfilingMiddleware, install_sql_hooks
+from events import (
+    EventRecorder,
+    EVENT_KINDS,
+    EVENT_RECEIVED,
+    EVENT_DUPLICATE,
+    EVENT_SCHEDULED,
+    EVENT_CHECKED,
+    EVENT_SKIPPED,
+    EVENT_RECOVERED,
+    EVENT_TIMED_OUT
+)
+from metrics import (
+    registry as metrics_registry,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    ALERTS_RECEIVED,
+    RECEIVE_DURATION,
+    BATCH_RECEIVE_DURATION,
+    PENDING_TRIGGERS,
+    CHECKER_DURATION,
+    CHECKER_ROWS,
+    WORKFLOW_DURATION,
+    WORKFLOW_ERRORS,
+    ASYNCIO_TASKS,
+    pool_gauges
+)
 from config import (
     DIFY_WEBHOOK_URL, 
     DIFY_WEBHOOK_URL_TIMEOUT, 
     DIFY_API_KEY,
     DIFY_USER_ID,
     ALERT_TIMEOUT_MINUTES,
-    CHECK_INTERVAL_SECONDS
+    CHECK_INTERVAL_SECONDS,
+    TIMEOUT_FIRE_BATCH_SIZE,
+    DIFY_DISPATCH_CONCURRENCY,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_POLL_INTERVAL_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_BACKOFF_BASE_SECONDS,
+    OUTBOX_BACKOFF_MAX_SECONDS,
+    OUTBOX_LEASE_SECONDS,
+    DIFY_HTTP_TIMEOUT_SECONDS,
+    OUTBOX_COALESCE_ENABLED,
+    OUTBOX_COALESCE_WINDOW_SECONDS,
+    OUTBOX_COALESCE_MAX_ALERTS,
+    OUTBOX_COALESCE_MAX_DELAY_SECONDS,
+    RETENTION_INTERVAL_SECONDS,
+    RETENTION_MAX_ROWS_PER_RUN,
+    RETENTION_CHUNK_SIZE,
+    RETENTION_CHUNK_PAUSE_SECONDS,
+    RETENTION_GRACE_MINUTES,
+    ALERT_PARTITION_DAYS_AHEAD,
+    EXPORT_BATCH_SIZE,
+    ROLLUP_RETENTION_DAYS,
+    ALERT_CACHE_MAX_ENTRIES,
+    ALERT_CACHE_TTL_SECONDS,
+    ALERT_BODY_STORE_ENABLED,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    REQUEST_LOG_SAMPLE_RATE,
+    REQUEST_LOG_SLOW_SECONDS,
+    EVENT_BUFFER_SIZE,
+    PROFILING_TOKEN,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_BUFFER_SIZE,
+    PROFILING_SLOW_STATEMENTS,
+    PROFILING_STACK_INTERVAL_MS
 )
 
-# 配置日志 - 使用北京时间
-class BeijingFormatter(logging.Formatter):
-    """使用北京时间的日志格式化器"""
-    def formatTime(self, record, datefmt=None):
-        # 获取北京时间
-        beijing_tz = timezone(timedelta(hours=8))
-        beijing_time = datetime.fromtimestamp(record.created, beijing_tz)
-        
-        if datefmt:
-            return beijing_time.strftime(datefmt)
-        else:
-            # 默认格式：YYYY-MM-DD HH:MM:SS,毫秒
-            return beijing_time.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
-
-# 创建日志处理器
-file_handler = logging.FileHandler('app.log', encoding='utf-8')
-console_handler = logging.StreamHandler()
-
-# 设置格式化器（使用北京时间）
-formatter = BeijingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
-
-# 配置根日志记录器
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[file_handler, console_handler]
-)
+# 配置日志：根日志记录器只挂 QueueHandler，文件和控制台写入在 QueueListener 线程中完成，不阻塞事件循环
+log_listener = setup_logging('app.log', level=LOG_LEVEL, queue_size=LOG_QUEUE_SIZE)
 
 logger = logging.getLogger(__name__)
 
@@ -65,52 +139,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 请求日志中间件
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """记录所有请求的详细信息"""
-    # 使用北京时间
-    beijing_tz = timezone(timedelta(hours=8))
-    start_time = datetime.now(beijing_tz)
-    
-    # 记录请求基本信息（不读取 body，避免影响下游处理）
-    log_data = {
-        "timestamp": start_time.isoformat(),
-        "method": request.method,
-        "url": str(request.url),
-        "path": request.url.path,
-        "query_params": dict(request.query_params),
-        "headers": {k: v for k, v in request.headers.items() if k.lower() not in ['authorization', 'cookie']},  # 排除敏感信息
-        "client": request.client.host if request.client else None,
-    }
-    
-    logger.info(f"收到请求: {request.method} {request.url.path}")
-    logger.debug(f"请求详情: {json.dumps(log_data, indent=2, ensure_ascii=False)}")
-    
-    # 处理请求
-    try:
-        response = await call_next(request)
-        
-        # 记录响应信息（使用北京时间）
-        process_time = (datetime.now(beijing_tz) - start_time).total_seconds()
-        
-        logger.info(f"响应: {request.method} {request.url.path} - {response.status_code} ({process_time:.3f}s)")
-        
-        # 如果是 404，记录详细信息
-        if response.status_code == 404:
-            logger.warning(f"404 错误 - 路径不存在: {request.url.path}")
-            logger.warning(f"完整 URL: {request.url}")
-            available_routes = []
-            for route in app.routes:
-                if hasattr(route, 'path'):
-                    methods = list(route.methods) if hasattr(route, 'methods') and route.methods else ['GET']
-                    available_routes.append(f"{methods[0]} {route.path}")
-            logger.warning(f"可用路由 ({len(available_routes)} 个): {available_routes}")
-        
-        return response
-    except Exception as e:
-        logger.error(f"处理请求时出错: {str(e)}", exc_info=True)
-        raise
+# 按请求开启的性能剖析：请求头 X-Profile-Token 或按比例抽样，统计请求中每条 SQL 的耗时
+profile_buffer = ProfileBuffer(capacity=PROFILING_BUFFER_SIZE)
+install_sql_hooks(engine, async_engine.sync_engine)
+app.add_middleware(
+    ProfilingMiddleware,
+    buffer=profile_buffer,
+    token=PROFILING_TOKEN,
+    sample_rate=PROFILING_SAMPLE_RATE,
+    slow_statements=PROFILING_SLOW_STATEMENTS,
+    stack_interval=PROFILING_STACK_INTERVAL_MS / 1000
+)
+
+# 请求日志中间件（纯 ASGI，最后添加，位于最外层）
+app.add_middleware(
+    RequestLoggingMiddleware,
+    logger=logger,
+    sample_rate=REQUEST_LOG_SAMPLE_RATE,
+    slow_seconds=REQUEST_LOG_SLOW_SECONDS
+)
 
 
 @app.get("/")
@@ -126,9 +173,16 @@ async def root():
             "api_redoc": "/redoc",
             "health": "/health",
             "create_alert": "POST /api/alert",
+            "create_alerts_batch": "POST /api/alerts/batch",
             "list_alerts": "GET /api/alerts",
+            "export_alerts": "GET /api/alerts/export",
             "get_alert": "GET /api/alerts/{alert_id}",
-            "debug_routes": "GET /debug/routes"
+            "alert_stats": "GET /api/stats",
+            "debug_routes": "GET /debug/routes",
+            "debug_cache": "GET /debug/cache",
+            "debug_events": "GET /debug/events",
+            "debug_profiles": "GET /debug/profiles",
+            "metrics": "GET /metrics"
         },
         "database": {
             "type": "PostgreSQL" if "postgresql" in os.getenv("DATABASE_URL", "").lower() else "SQLite",
@@ -156,80 +210,206 @@ async def debug_routes():
     }
 
 
+@app.get("/debug/cache")
+async def debug_cache():
+    """调试端点：告警查询缓存的命中、未命中、淘汰和失效计数"""
+    return query_cache.stats()
+
+
+@app.get("/debug/events")
+async def debug_events(
+    kind: Optional[str] = None,
+    alert_id: Optional[int] = None,
+    enterprise_name: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = 100
+):
+    """
+    调试端点：查询最近的结构化事件（从新到旧），以及每种事件的累计数量
+    kind 为逗号分隔的事件类型（received、duplicate、scheduled、checked、skipped、recovered、timed_out、
+    notified、notify_retry、notify_dead）；since 为北京时间，只返回此后的事件
+    """
+    kinds = [name.strip() for name in kind.split(",") if name.strip()] if kind else None
+    unknown = [name for name in kinds or [] if name not in EVENT_KINDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"无效的 kind 参数: {', '.join(unknown)}，可选类型: {', '.join(EVENT_KINDS)}"
+        )
+    return {
+        **events.stats(),
+        "events": events.query(kinds, alert_id, enterprise_name, since, max(min(limit, 1000), 1))
+    }
+
+
+@app.get("/debug/profiles")
+async def debug_profiles(path: Optional[str] = None, min_duration_ms: Optional[float] = None, limit: int = 50):
+    """调试端点：最近的请求剖析结果摘要（从新到旧），可按路径和最小耗时（毫秒）过滤"""
+    return {
+        "capacity": profile_buffer.capacity,
+        "profiles": profile_buffer.query(path, min_duration_ms, max(min(limit, 500), 1))
+    }
+
+
+@app.get("/debug/profiles/{profile_id}")
+async def debug_profile(profile_id: int):
+    """调试端点：单个请求的剖析结果，包括最慢的 SQL 语句和调用栈采样（折叠格式，可用于火焰图）"""
+    profile = profile_buffer.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在（可能已被新的结果挤出）")
+    return profile.details()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标（文本格式）：接收告警、超时检查、超时通知、数据清理、数据库连接池和 asyncio 任务"""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化数据库和后台任务"""
     init_db()
+    # 创建共享的 Dify HTTP 客户端
+    await start_dify_client()
+    # 启动超时通知发件箱投递器（启动时会先投递上次未完成的通知）；未配置超时通知 URL 时不写入发件箱，也不启动投递器
+    if DIFY_WEBHOOK_URL_TIMEOUT:
+        outbox_worker.start()
+    else:
+        logger.warning("[发件箱] ⚠️ 未配置 DIFY_WEBHOOK_URL_TIMEOUT，超时告警只做标记，不发送超时通知")
+    # 从数据库重建超时调度器并启动
+    await rebuild_timeout_scheduler()
+    timeout_scheduler.start()
     # 启动后台检查任务
     asyncio.create_task(check_timeout_alerts_periodically())
-    # 启动定时删除任务
-    asyncio.create_task(schedule_daily_cleanup())
+    # 启动数据清理任务（分块、增量删除旧数据）
+    retention_engine.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止后台任务，释放 Dify 连接池，并写出剩余的日志"""
+    await retention_engine.stop()
+    await timeout_scheduler.stop()
+    await outbox_worker.stop()
+    await close_dify_client()
+    # 最后停止日志线程，写出队列中剩余的日志
+    log_listener.stop()
 
 
 @app.post("/api/alert", response_model=AlertResponse)
 async def receive_alert(
     alert_data: AlertInput,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     接收来自 Dify workflow 的告警数据
     这个接口会被 Dify workflow 调用，接收筛选后的告警信息
+
+    幂等：Dify 超时重试时会重复发送同一条告警。幂等键为请求头 Idempotency-Key，
+    没有时为告警内容的哈希；INSERT ... ON CONFLICT DO NOTHING 命中唯一索引时不写入新记录，
+    不重复登记超时检查，直接返回原记录（响应头 Idempotent-Replay: true）
+
+    启用 ALERT_BODY_STORE_ENABLED 时消息内容写入 alert_bodies（相同的消息只存一份），alerts 只保存 body_hash
+    处理结果记录为事件（received / duplicate / scheduled / recovered，见 GET /debug/events）
     """
-    logger.info(f"收到告警数据: 企业={alert_data.enterprise_name}, 类型={alert_data.om_type}")
+    start = time.perf_counter()
     try:
-        # 解析时间
-        alert_time = parse_time(alert_data.time)
-        logger.debug(f"解析后的时间: {alert_time}")
+        # 解析时间（数据库中存储不带时区的北京时间）
+        alert_time = to_db_time(parse_time(alert_data.time))
+        
+        # 消息内容写入 alert_bodies（与告警在同一事务中）
+        body_hash = None
+        if ALERT_BODY_STORE_ENABLED:
+            [body_hash] = await store_bodies(db, [alert_data.input])
         
-        # 创建告警记录
+        # 创建告警记录（幂等键已存在时不插入）
         alert = Alert(
-            input=alert_data.input,
+            input=None if body_hash else alert_data.input,
+            body_hash=body_hash,
             enterprise_name=alert_data.enterprise_name,
             time=alert_time,
             alert_type=alert_data.alert_type,
             template_name=alert_data.template_name,
             om_type=alert_data.om_type,
             alert_key=alert_data.alert_key,
+            idempotency_key=alert_idempotency_key(alert_data, alert_time, idempotency_key),
             processed=False,
-            timeout_triggered=False
+            timeout_triggered=False,
+            deadline_at=alert_deadline(alert_time) if alert_data.om_type == "告警触发" else None,
+            **parsed_alert_columns(alert_data.input)
         )
         
-        db.add(alert)
-        db.commit()
-        db.refresh(alert)
-        
-        logger.info(f"成功创建告警记录: ID={alert.id}")
+        alert.id = (await db.execute(
+            dialect_insert(Alert)
+            .values({column: getattr(alert, column) for column in ALERT_INSERT_COLUMNS})
+            .on_conflict_do_nothing(index_elements=["idempotency_key", "time"])
+            .returning(Alert.id)
+        )).scalar()
         
-        # 如果是"告警触发"，启动超时检查任务
-        if alert_data.om_type == "告警触发":
-            background_tasks.add_task(check_timeout_for_alert, alert.id)
-            logger.info(f"已启动超时检查任务: 告警 ID={alert.id}")
+        if alert.id is None:
+            # 重放的告警：返回原记录
+            original = (await db.execute(
+                select(Alert)
+                .options(undefer(Alert.input))
+                .where(Alert.idempotency_key == alert.idempotency_key, Alert.time == alert_time)
+            )).scalar_one()
+            await rehydrate_alerts(db, [original])
+            original_response = AlertResponse.model_validate(original)
+            await db.rollback()
+            response.headers["Idempotent-Replay"] = "true"
+            events.record(EVENT_DUPLICATE, original_response.id, alert_data.enterprise_name)
+            logger.info(f"重复告警（幂等键已存在），返回原记录: ID={original_response.id}")
+            observe_receive(alert_data.alert_type, "duplicate", start)
+            return original_response
         
-        # 如果是"告警恢复"，取消所有匹配的"告警触发"的超时通知
-        elif alert_data.om_type == "告警恢复":
+        # 如果是"告警恢复"，在同一事务内取消所有匹配的"告警触发"的超时通知
+        cancelled = []
+        if alert_data.om_type == "告警恢复":
             # 查找所有同 enterprise_name 和 alert_key 的未处理且未触发超时的"告警触发"记录
-            matching_triggers = db.query(Alert).filter(
-                and_(
-                    Alert.enterprise_name == alert_data.enterprise_name,
-                    Alert.alert_key == alert_data.alert_key,
-                    Alert.om_type == "告警触发",
-                    Alert.processed == False,  # 未处理
-                    Alert.timeout_triggered == False,  # 未触发超时
-                    Alert.time <= alert_time  # 告警恢复时间应该晚于告警触发时间
+            # 使用 processed 字段标记为已处理（因为收到告警恢复而取消）
+            cancelled = (await db.execute(
+                update(Alert)
+                .where(
+                    and_(
+                        Alert.enterprise_name == alert_data.enterprise_name,
+                        Alert.alert_key == alert_data.alert_key,
+                        Alert.om_type == "告警触发",
+                        Alert.processed == False,  # 未处理
+                        Alert.timeout_triggered == False,  # 未触发超时
+                        Alert.time <= alert_time  # 告警恢复时间应该晚于告警触发时间
+                    )
                 )
-            ).all()
-            
-            if matching_triggers:
-                # 使用 processed 字段标记为已处理（因为收到告警恢复而取消）
-                for trigger in matching_triggers:
-                    trigger.processed = True
-                db.commit()
-                logger.info(f"告警恢复已取消 {len(matching_triggers)} 个匹配的告警触发的超时通知（标记为 processed=True）")
+                .values(processed=True)
+                .returning(Alert.id, Alert.enterprise_name, Alert.alert_type, Alert.time)
+                .execution_options(synchronize_session=False)
+            )).all()
+        
+        # 同一事务内累加统计汇总
+        await apply_rollup_increments(db, received_increments([
+            (alert.time, alert.enterprise_name, alert.om_type, alert.alert_type)
+        ]))
+        
+        await db.commit()
+        query_cache.invalidate_alerts([(alert.id, alert.enterprise_name, alert.alert_type, alert.time), *cancelled])
         
-        response = AlertResponse(
+        events.record(EVENT_RECEIVED, alert.id, alert.enterprise_name, om_type=alert.om_type, alert_key=alert.alert_key)
+        
+        # 如果是"告警触发"，登记到超时调度器
+        if alert_data.om_type == "告警触发":
+            timeout_scheduler.schedule(alert.id, alert.deadline_at)
+            events.record(EVENT_SCHEDULED, alert.id, alert.enterprise_name, deadline_at=alert.deadline_at)
+        elif cancelled:
+            timeout_scheduler.cancel(row.id for row in cancelled)
+            events.record_many(EVENT_RECOVERED, ((row.id, row.enterprise_name) for row in cancelled), recovery_id=alert.id)
+        logger.info(f"成功创建告警记录: ID={alert.id}, 企业={alert.enterprise_name}, 类型={alert.om_type}, "
+                    f"取消超时通知 {len(cancelled)} 个")
+        
+        alert_response = AlertResponse(
             id=alert.id,
-            input=alert.input,
+            input=alert_data.input,
             enterprise_name=alert.enterprise_name,
             time=alert.time,
             alert_type=alert.alert_type,
@@ -237,449 +417,856 @@ async def receive_alert(
             om_type=alert.om_type,
             alert_key=alert.alert_key,
             processed=alert.processed,
-            timeout_triggered=alert.timeout_triggered
+            timeout_triggered=alert.timeout_triggered,
+            **{name: getattr(alert, name) for name in PARSED_FIELDS}
         )
-        
-        logger.info(f"返回响应: 告警 ID={alert.id}")
-        return response
+        observe_receive(alert_data.alert_type, "created", start)
+        return alert_response
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        observe_receive(alert_data.alert_type, "error", start)
         logger.error(f"处理告警数据时出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"处理告警数据时出错: {str(e)}")
 
 
-async def check_timeout_for_alert(alert_id: int):
+@app.post("/api/alerts/batch", response_model=BatchAlertResponse)
+async def receive_alerts_batch(
+    alerts_data: List[AlertInput],
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    检查特定告警是否超时（20分钟内没有收到同 enterprise_name 和 alert_key 的"告警恢复"）
+    批量接收来自 Dify workflow 的告警数据（告警风暴场景）
+    整批告警使用一条批量 INSERT 写入，批次内所有"告警恢复"通过一条集合式 UPDATE
+    取消匹配的"告警触发"，全部在同一个事务内完成
+    每条告警按内容计算幂等键，已存在（或在本批次中重复）的告警不再写入，返回原记录 ID，状态为 "duplicate"；
+    带请求头 Idempotency-Key 时每条告警的幂等键为 "<Idempotency-Key>#<序号>"，
+    用同一个 Idempotency-Key 重试整批请求时逐条返回原记录（即使内容有变化）
+    启用 ALERT_BODY_STORE_ENABLED 时整批消息内容按哈希去重后用一条批量 upsert 写入 alert_bodies
     """
-    db = SessionLocal()
+    logger.info(f"收到批量告警数据: {len(alerts_data)} 条")
+    if not alerts_data:
+        return BatchAlertResponse(total=0, resolved_triggers=0, items=[])
+
+    start = time.perf_counter()
     try:
-        alert = db.query(Alert).filter(Alert.id == alert_id).first()
-        if not alert or alert.om_type != "告警触发":
-            logger.debug(f"[异步任务] 告警 ID={alert_id} 不是告警触发类型或不存在，跳过检查")
-            return
-        
-        logger.info(f"[异步任务] 启动超时检查任务: 告警 ID={alert.id}, "
-                   f"告警时间={alert.time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                   f"企业={alert.enterprise_name}, "
-                   f"alert_key={alert.alert_key}, "
-                   f"等待{ALERT_TIMEOUT_MINUTES}分钟后检查")
-        
-        # 等待超时时间
-        wait_seconds = ALERT_TIMEOUT_MINUTES * 60
-        logger.info(f"[异步任务] 等待 {wait_seconds} 秒 ({ALERT_TIMEOUT_MINUTES} 分钟)...")
-        await asyncio.sleep(wait_seconds)
-        
-        # 重新查询（可能已更新）- 使用新的数据库会话确保读取最新数据
-        db.close()  # 关闭旧会话
-        db = SessionLocal()  # 创建新会话
-        alert = db.query(Alert).filter(Alert.id == alert_id).first()
-        # 如果已被处理（收到告警恢复）或已触发超时，则不再处理
-        if not alert:
-            logger.debug(f"[异步任务] 告警 ID={alert_id} 已不存在，跳过检查")
-            return
-        if alert.processed:
-            logger.info(f"[异步任务] 告警 ID={alert_id} 已被处理（收到告警恢复），跳过超时检查")
-            return
-        if alert.timeout_triggered:
-            logger.info(f"[异步任务] 告警 ID={alert_id} 已触发超时通知（可能由定期检查触发），跳过重复检查")
-            return
-        
-        # 检查20分钟内是否有同 enterprise_name 和 alert_key 的"告警恢复"
-        # 开始时间：使用数据库中的 time 字段（告警触发时间）
-        check_start_time = alert.time
-        # 结束时间：开始时间 + 20分钟
-        check_end_time = check_start_time + timedelta(minutes=ALERT_TIMEOUT_MINUTES)
-        
-        logger.info(f"[异步任务] 检查告警 ID={alert.id}: "
-                   f"开始时间={check_start_time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                   f"结束时间={check_end_time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                   f"企业={alert.enterprise_name}, "
-                   f"alert_key={alert.alert_key}")
-        
-        recent_recovery = db.query(Alert).filter(
-            and_(
-                Alert.enterprise_name == alert.enterprise_name,
-                Alert.alert_key == alert.alert_key,
-                Alert.om_type == "告警恢复",
-                Alert.time > check_start_time,  # 告警恢复时间应该晚于告警触发时间（数据库中的time字段）
-                Alert.time <= check_end_time    # 告警恢复时间必须在20分钟内
+        rows = []
+        for index, item in enumerate(alerts_data):
+            alert_time = to_db_time(parse_time(item.time))
+            rows.append({
+                "input": item.input,
+                "enterprise_name": item.enterprise_name,
+                "time": alert_time,
+                "alert_type": item.alert_type,
+                "template_name": item.template_name,
+                "om_type": item.om_type,
+                "alert_key": item.alert_key,
+                "body_hash": None,
+                "idempotency_key": alert_idempotency_key(
+                    item, alert_time, f"{idempotency_key}#{index}" if idempotency_key else None
+                ),
+                "processed": False,
+                "timeout_triggered": False,
+                "deadline_at": alert_deadline(alert_time) if item.om_type == "告警触发" else None,
+                **parsed_alert_columns(item.input),
+            })
+
+        # 批次内重复的告警只保留第一条
+        first_index = {}
+        for index, row in enumerate(rows):
+            first_index.setdefault(row["idempotency_key"], index)
+        new_rows = [rows[index] for index in first_index.values()]
+
+        if ALERT_BODY_STORE_ENABLED:
+            for row, body_hash in zip(new_rows, await store_bodies(db, [row["input"] for row in new_rows])):
+                if body_hash:
+                    row["body_hash"] = body_hash
+                    row["input"] = None
+
+        # 一条批量 INSERT ... ON CONFLICT DO NOTHING，只返回实际写入的记录
+        inserted_ids = dict((await db.execute(
+            dialect_insert(Alert)
+            .on_conflict_do_nothing(index_elements=["idempotency_key", "time"])
+            .returning(Alert.idempotency_key, Alert.id),
+            new_rows
+        )).all())
+        # 已存在的告警按幂等键查出原记录 ID
+        replayed_keys = [key for key in first_index if key not in inserted_ids]
+        existing_ids = {}
+        if replayed_keys:
+            existing_ids = dict((await db.execute(
+                select(Alert.idempotency_key, Alert.id).where(Alert.idempotency_key.in_(replayed_keys))
+            )).all())
+        new_rows = [row for row in new_rows if row["idempotency_key"] in inserted_ids]
+        alert_ids = [inserted_ids.get(row["idempotency_key"]) or existing_ids.get(row["idempotency_key"]) for row in rows]
+        is_new = [
+            row["idempotency_key"] in inserted_ids and first_index[row["idempotency_key"]] == index
+            for index, row in enumerate(rows)
+        ]
+
+        # 批次内所有新的"告警恢复"一次性取消匹配的"告警触发"（同 enterprise_name 和 alert_key，且触发时间不晚于恢复时间）
+        recovery_ids = [
+            inserted_ids[row["idempotency_key"]] for row in new_rows
+            if row["om_type"] == "告警恢复"
+        ]
+        resolved = []
+        if recovery_ids:
+            recovery = aliased(Alert)
+            resolved = (await db.execute(
+                update(Alert)
+                .where(
+                    and_(
+                        Alert.om_type == "告警触发",
+                        Alert.processed == False,  # 未处理
+                        Alert.timeout_triggered == False,  # 未触发超时
+                        exists().where(
+                            and_(
+                                recovery.id.in_(recovery_ids),
+                                recovery.enterprise_name == Alert.enterprise_name,
+                                recovery.alert_key == Alert.alert_key,
+                                Alert.time <= recovery.time
+                            )
+                        )
+                    )
+                )
+                .values(processed=True)
+                .returning(Alert.id, Alert.enterprise_name, Alert.alert_type, Alert.time)
+                .execution_options(synchronize_session=False)
+            )).all()
+        resolved_ids = {row.id for row in resolved}
+
+        # 新写入的告警按汇总行合并后一次 upsert 统计汇总
+        await apply_rollup_increments(db, received_increments(
+            (row["time"], row["enterprise_name"], row["om_type"], row["alert_type"]) for row in new_rows
+        ))
+
+        await db.commit()
+        query_cache.invalidate_alerts([
+            *((inserted_ids[row["idempotency_key"]], row["enterprise_name"], row["alert_type"], row["time"])
+              for row in new_rows),
+            *resolved
+        ])
+
+        events.record_many(EVENT_RECEIVED, (
+            (inserted_ids[row["idempotency_key"]], row["enterprise_name"]) for row in new_rows
+        ))
+        timeout_scheduler.cancel(resolved_ids)
+        events.record_many(EVENT_RECOVERED, ((row.id, row.enterprise_name) for row in resolved))
+
+        items = []
+        for index, (alert_id, item) in enumerate(zip(alert_ids, alerts_data)):
+            if not is_new[index]:
+                status = "duplicate"
+                events.record(EVENT_DUPLICATE, alert_id, item.enterprise_name)
+            elif item.om_type == "告警触发":
+                if alert_id in resolved_ids:
+                    status = "resolved"
+                else:
+                    status = "pending"
+                    timeout_scheduler.schedule(alert_id, rows[index]["deadline_at"])
+                    events.record(EVENT_SCHEDULED, alert_id, item.enterprise_name, deadline_at=rows[index]["deadline_at"])
+            elif item.om_type == "告警恢复":
+                status = "recovered"
+            else:
+                status = "stored"
+            items.append(BatchAlertItemResult(index=index, id=alert_id, status=status))
+            ALERTS_RECEIVED.labels(item.alert_type, "duplicate" if status == "duplicate" else "created").inc()
+        BATCH_RECEIVE_DURATION.observe(time.perf_counter() - start)
+
+        duplicates = len(rows) - len(new_rows)
+        logger.info(f"成功批量创建告警记录: {len(new_rows)} 条（重复 {duplicates} 条），"
+                    f"告警恢复已取消 {len(resolved_ids)} 个告警触发的超时通知")
+        return BatchAlertResponse(
+            total=len(alert_ids),
+            duplicates=duplicates,
+            resolved_triggers=len(resolved_ids),
+            items=items
+        )
+    except Exception as e:
+        await db.rollback()
+        for item in alerts_data:
+            ALERTS_RECEIVED.labels(item.alert_type, "error").inc()
+        BATCH_RECEIVE_DURATION.observe(time.perf_counter() - start)
+        logger.error(f"批量处理告警数据时出错: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"批量处理告警数据时出错: {str(e)}")
+
+
+def observe_receive(alert_type: Optional[str], result: str, start: float):
+    """记录一次单条接收的结果和耗时（start 为 time.perf_counter()）"""
+    ALERTS_RECEIVED.labels(alert_type, result).inc()
+    RECEIVE_DURATION.labels(alert_type).observe(time.perf_counter() - start)
+
+
+# 接收告警时写入的列（其余列使用模型默认值）
+ALERT_INSERT_COLUMNS = (
+    "input", "body_hash", "enterprise_name", "time", "alert_type", "template_name", "om_type", "alert_key",
+    "idempotency_key", "processed", "timeout_triggered", "deadline_at", *PARSED_FIELDS
+)
+
+
+def alert_idempotency_key(alert_data: AlertInput, alert_time: datetime, client_key: Optional[str] = None) -> str:
+    """
+    告警的幂等键（64 位十六进制 SHA-256）
+    客户端提供 Idempotency-Key 时使用它，否则使用告警内容：企业名称、alert_key、告警时间、告警类型、OM 类型
+    唯一索引为 (idempotency_key, time)，同一个 Idempotency-Key 配不同的告警时间不视为重复
+    """
+    if client_key:
+        source = f"header|{client_key}"
+    else:
+        source = "|".join([
+            alert_data.enterprise_name,
+            alert_data.alert_key,
+            alert_time.isoformat(),
+            alert_data.alert_type,
+            alert_data.om_type
+        ])
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def alert_deadline(alert_time: datetime) -> datetime:
+    """计算"告警触发"的超时截止时间（告警时间 + ALERT_TIMEOUT_MINUTES）"""
+    return alert_time + timedelta(minutes=ALERT_TIMEOUT_MINUTES)
+
+
+def matching_recovery_exists():
+    """
+    关联子查询：检查窗口内（告警时间 ~ deadline_at）存在同 enterprise_name 和 alert_key 的"告警恢复"
+    与外层查询中的 Alert（"告警触发"）关联
+    """
+    recovery = aliased(Alert)
+    return exists().where(
+        and_(
+            recovery.enterprise_name == Alert.enterprise_name,
+            recovery.alert_key == Alert.alert_key,
+            recovery.om_type == "告警恢复",
+            recovery.time >= Alert.time,  # 告警恢复时间应该晚于或等于告警触发时间
+            recovery.time <= Alert.deadline_at  # 告警恢复时间必须在检查窗口内
+        )
+    )
+
+
+async def process_expired_triggers(log_prefix: str, alert_ids: Optional[List[int]] = None):
+    """
+    集合式处理检查窗口已过期（deadline_at <= 当前时间）的"告警触发"，SQL 条数固定，与积压量无关：
+    1. 窗口内已收到"告警恢复"的，一条 UPDATE 标记为 processed=True，之后不再重复检查
+    2. 没有匹配"告警恢复"的，一条 NOT EXISTS 查询取出，只选择超时通知需要的列
+    3. 同一事务中把超时告警标记为 timeout_triggered=True、写入通知发件箱并累加统计汇总中的超时数量，
+       由发件箱投递器异步发送（失败重试），检查循环不等待 Dify 的响应；
+       未配置 DIFY_WEBHOOK_URL_TIMEOUT 时只标记，不写入发件箱
+    alert_ids 不为空时只处理这些告警（超时调度器到期的批次）
+    每个告警的结果记录为事件（recovered / timed_out / skipped），日志只输出本轮的汇总
+    """
+    start = time.perf_counter()
+    now = beijing_now_naive()
+    expired = and_(PENDING_TRIGGER_CONDITION, Alert.deadline_at <= now)
+    if alert_ids is not None:
+        expired = and_(expired, Alert.id.in_(alert_ids))
+
+    async with AsyncSessionLocal() as db:
+        recovered = (await db.execute(
+            update(Alert)
+            .where(and_(expired, matching_recovery_exists()))
+            .values(processed=True)
+            .returning(Alert.id, Alert.enterprise_name, Alert.alert_type, Alert.time)
+            .execution_options(synchronize_session=False)
+        )).all()
+
+        # UPDATE ... RETURNING：条件中包含 timeout_triggered=False，超时调度器和定期检查同时处理时只会写入一次
+        timeout_alerts = (await db.execute(
+            update(Alert)
+            .where(and_(expired, ~matching_recovery_exists()))
+            .values(timeout_triggered=True)
+            .returning(
+                Alert.id,
+                Alert.enterprise_name,
+                Alert.alert_key,
+                Alert.time,
+                Alert.alert_type,
+                Alert.input,
+                Alert.body_hash
             )
-        ).first()
-        
-        # 如果没有找到"告警恢复"，触发超时通知
-        if not recent_recovery:
-            # 再次检查 timeout_triggered，防止并发情况下定期检查已经触发
-            db.refresh(alert)  # 刷新对象，确保读取最新数据
-            if alert.timeout_triggered:
-                logger.info(f"[异步任务] 告警 ID={alert.id} 在检查期间已被定期检查触发超时，跳过重复触发")
-                return
-            
-            logger.warning(f"[异步任务] ⚠️ 告警触发超时! ID={alert.id}, "
-                          f"告警时间={check_start_time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                          f"企业={alert.enterprise_name}, "
-                          f"alert_key={alert.alert_key}, "
-                          f"未在{ALERT_TIMEOUT_MINUTES}分钟内收到告警恢复")
-            await trigger_timeout_workflow(alert)
-            # 标记为已触发
-            alert.timeout_triggered = True
-            db.commit()
-            logger.info(f"[异步任务] ✅ 已触发超时通知并标记: 告警 ID={alert.id}")
-        else:
-            logger.info(f"[异步任务] ✓ 告警触发已收到恢复: ID={alert.id}, "
-                       f"恢复时间={recent_recovery.time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                       f"告警时间={check_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-    finally:
-        db.close()
+            .execution_options(synchronize_session=False)
+        )).all()
+
+        if timeout_alerts and DIFY_WEBHOOK_URL_TIMEOUT:
+            bodies = await load_bodies(db, [alert.body_hash for alert in timeout_alerts])
+            outbox_rows = []
+            for alert in timeout_alerts:
+                input_text = alert.input if alert.input is not None else bodies.get(alert.body_hash)
+                if input_text is None:
+                    # 不把缺失消息的占位文本转发给 Dify，超时通知只带企业名称和告警时间
+                    logger.warning(f"{log_prefix} ⚠️ 告警 ID={alert.id} 的消息内容缺失（alert_bodies 中没有 "
+                                   f"{alert.body_hash}），超时通知不带告警消息")
+                outbox_rows.append({
+                    "alert_id": alert.id,
+                    "enterprise_name": alert.enterprise_name,
+                    "payload": json.dumps(build_timeout_inputs(alert, input_text), ensure_ascii=False)
+                })
+            await db.execute(insert(NotificationOutbox), outbox_rows)
+        if timeout_alerts:
+            await apply_rollup_increments(db, timeout_increments(
+                (alert.time, alert.enterprise_name, alert.alert_type) for alert in timeout_alerts
+            ))
+
+        await db.commit()
+    query_cache.invalidate_alerts([
+        *recovered,
+        *((alert.id, alert.enterprise_name, alert.alert_type, alert.time) for alert in timeout_alerts)
+    ])
+
+    events.record_many(EVENT_RECOVERED, ((row.id, row.enterprise_name) for row in recovered), source=log_prefix)
+    for alert in timeout_alerts:
+        events.record(EVENT_TIMED_OUT, alert.id, alert.enterprise_name, alert_key=alert.alert_key, alert_time=alert.time)
+    skipped = []
+    if alert_ids is not None:
+        handled = {row.id for row in recovered} | {alert.id for alert in timeout_alerts}
+        skipped = [alert_id for alert_id in alert_ids if alert_id not in handled]
+        events.record_many(EVENT_SKIPPED, ((alert_id, None) for alert_id in skipped), source=log_prefix)
+    events.record(
+        EVENT_CHECKED, source=log_prefix, recovered=len(recovered), timed_out=len(timeout_alerts), skipped=len(skipped)
+    )
+    CHECKER_ROWS.labels("recovered").inc(len(recovered))
+    CHECKER_ROWS.labels("timed_out").inc(len(timeout_alerts))
+    CHECKER_ROWS.labels("skipped").inc(len(skipped))
+    CHECKER_DURATION.labels("periodic" if alert_ids is None else "scheduler").observe(time.perf_counter() - start)
+
+    if timeout_alerts and not DIFY_WEBHOOK_URL_TIMEOUT:
+        logger.warning(f"{log_prefix} ⚠️ {len(timeout_alerts)} 个告警触发未在{ALERT_TIMEOUT_MINUTES}分钟内收到告警恢复"
+                       f"（未配置 DIFY_WEBHOOK_URL_TIMEOUT，不发送超时通知），详情见 /debug/events?kind=timed_out")
+    elif timeout_alerts:
+        outbox_worker.notify()
+        logger.warning(f"{log_prefix} ⚠️ {len(timeout_alerts)} 个告警触发未在{ALERT_TIMEOUT_MINUTES}分钟内收到告警恢复"
+                       f"（已写入通知发件箱），详情见 /debug/events?kind=timed_out")
+    if recovered or timeout_alerts or skipped:
+        logger.info(f"{log_prefix} 检查完成: 已收到恢复 {len(recovered)} 个, 超时 {len(timeout_alerts)} 个, "
+                    f"已处理跳过 {len(skipped)} 个")
+
+
+async def fire_expired_alerts(alert_ids: List[int]):
+    """处理超时调度器中到期的一批"告警触发"（已被告警恢复或定期检查处理的会被跳过）"""
+    await process_expired_triggers("[超时调度]", alert_ids)
+
+
+async def rebuild_timeout_scheduler():
+    """启动时用一次查询加载所有待检查的"告警触发"，重建调度器中的截止时间堆"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Alert.id, Alert.deadline_at).where(
+                and_(PENDING_TRIGGER_CONDITION, Alert.deadline_at.isnot(None))
+            )
+        )).all()
+    timeout_scheduler.rebuild((row.id, row.deadline_at) for row in rows)
+    logger.info(f"[超时调度] 已从数据库重建调度器: {len(rows)} 个待检查告警")
+
+
+# 结构化事件：每个告警的处理结果（接收、超时检查、通知投递）记录在固定容量的环形缓冲区中，GET /debug/events 查询
+events = EventRecorder(capacity=EVENT_BUFFER_SIZE)
+
+# 告警查询缓存：进程内 LRU + TTL，本进程写入告警（接收、超时检查、数据清理）时精确失效
+query_cache = QueryCache(max_entries=ALERT_CACHE_MAX_ENTRIES, ttl=ALERT_CACHE_TTL_SECONDS)
+
+# 超时截止时间调度器：单个协程按截止时间批量处理所有"告警触发"
+timeout_scheduler = DeadlineScheduler(fire_expired_alerts, batch_size=TIMEOUT_FIRE_BATCH_SIZE)
+
+# 超时通知发件箱投递器：并发发送 Dify 通知，失败按指数退避重试；启用合并时同一企业的通知合并发送
+outbox_worker = OutboxWorker(
+    lambda alert_ids, inputs: trigger_timeout_workflow(alert_ids, inputs),  # 定义在下方
+    batch_size=OUTBOX_BATCH_SIZE,
+    concurrency=DIFY_DISPATCH_CONCURRENCY,
+    poll_interval=OUTBOX_POLL_INTERVAL_SECONDS,
+    max_attempts=OUTBOX_MAX_ATTEMPTS,
+    backoff_base=OUTBOX_BACKOFF_BASE_SECONDS,
+    backoff_max=OUTBOX_BACKOFF_MAX_SECONDS,
+    lease_seconds=OUTBOX_LEASE_SECONDS,
+    send_timeout=DIFY_HTTP_TIMEOUT_SECONDS,
+    merge=(lambda inputs_list: merge_timeout_inputs(inputs_list)) if OUTBOX_COALESCE_ENABLED else None,
+    coalesce_window=OUTBOX_COALESCE_WINDOW_SECONDS,
+    coalesce_max_alerts=OUTBOX_COALESCE_MAX_ALERTS,
+    coalesce_max_delay=OUTBOX_COALESCE_MAX_DELAY_SECONDS,
+    events=events
+)
+
+
+# 采集时才计算的指标：待检查告警数（超时调度器中的截止时间）、连接池、asyncio 任务数
+PENDING_TRIGGERS.set_function(lambda: len(timeout_scheduler))
+pool_gauges("async", async_engine.sync_engine)
+pool_gauges("sync", engine)
+ASYNCIO_TASKS.set_function(lambda: len(asyncio.all_tasks()))
+
+
+# 数据清理：全天按预算分块删除前一天的记录，代替每天 00:00:05 的一次性删除；PostgreSQL 分区表整体删除过期分区
+retention_engine = RetentionEngine(
+    chunk_size=RETENTION_CHUNK_SIZE,
+    max_rows_per_run=RETENTION_MAX_ROWS_PER_RUN,
+    interval=RETENTION_INTERVAL_SECONDS,
+    grace_minutes=RETENTION_GRACE_MINUTES,
+    chunk_pause=RETENTION_CHUNK_PAUSE_SECONDS,
+    partition_days_ahead=ALERT_PARTITION_DAYS_AHEAD,
+    rollup_retention_days=ROLLUP_RETENTION_DAYS,
+    on_alerts_deleted=lambda cutoff: query_cache.invalidate_before(cutoff)
+)
 
 
 async def check_timeout_alerts_periodically():
     """
     定期检查所有未处理的"告警触发"是否超时
-    这是一个额外的保障机制，防止异步任务丢失
+    这是一个额外的保障机制，防止超时调度器中的截止时间丢失（例如调度器处理出错）
+    通过 deadline_at 部分索引只扫描已到期的告警，开销与到期告警数量成正比，而不是与积压总量成正比
     """
     logger.info(f"定期检查任务已启动，检查间隔: {CHECK_INTERVAL_SECONDS}秒，超时时间: {ALERT_TIMEOUT_MINUTES}分钟")
     while True:
         try:
             await asyncio.sleep(CHECK_INTERVAL_SECONDS)
-            db = SessionLocal()
-            try:
-                # 查找所有未处理的"告警触发"记录（使用北京时间）
-                # 注意：不再使用 cutoff_time 筛选，而是检查所有未处理的告警
-                beijing_tz = timezone(timedelta(hours=8))
-                now = datetime.now(beijing_tz)
-                
-                logger.info(f"[定期检查] 开始检查超时告警 - 当前时间: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # 查找所有未处理的"告警触发"记录（不再使用 time <= cutoff_time 筛选）
-                timeout_alerts = db.query(Alert).filter(
-                    and_(
-                        Alert.om_type == "告警触发",
-                        Alert.processed == False,  # 未处理（未收到告警恢复）
-                        Alert.timeout_triggered == False  # 未触发超时
-                        # ✅ 移除 Alert.time <= cutoff_time 筛选条件
-                    )
-                ).all()
-                
-                if timeout_alerts:
-                    logger.info(f"[定期检查] 找到 {len(timeout_alerts)} 个未处理的告警触发记录")
-                    for a in timeout_alerts:
-                        logger.info(f"[定期检查]   - 告警 ID={a.id}, 时间={a.time.strftime('%Y-%m-%d %H:%M:%S')}, 企业={a.enterprise_name}, alert_key={a.alert_key}")
-                else:
-                    logger.info(f"[定期检查] 未找到未处理的告警触发记录")
-                
-                for alert in timeout_alerts:
-                    # 确定检查窗口（基于告警的 time 字段）
-                    # 处理时区：如果 alert.time 没有时区信息，添加北京时间时区
-                    check_start_time = alert.time
-                    if check_start_time.tzinfo is None:
-                        beijing_tz = timezone(timedelta(hours=8))
-                        check_start_time = check_start_time.replace(tzinfo=beijing_tz)
-                    
-                    check_end_time = check_start_time + timedelta(minutes=ALERT_TIMEOUT_MINUTES)
-                    
-                    # ✅ 判断检查窗口是否已过期
-                    if now <= check_end_time:
-                        # 窗口未过期，跳过（不触发超时）
-                        logger.info(f"[定期检查] 告警 ID={alert.id} 检查窗口未过期，跳过检查 "
-                                  f"(当前时间={now.strftime('%H:%M:%S')}, "
-                                  f"窗口结束时间={check_end_time.strftime('%H:%M:%S')})")
-                        continue
-                    
-                    # 窗口已过期，继续检查是否有恢复
-                    # 计算已过去的时间
-                    time_elapsed = (now - check_start_time).total_seconds() / 60  # 转换为分钟
-                    
-                    # 计算检查窗口的间隔时间（秒）
-                    window_duration = (check_end_time - check_start_time).total_seconds()
-                    
-                    logger.info(f"[定期检查] 检查告警 ID={alert.id}: "
-                              f"告警时间={check_start_time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                              f"检查窗口开始={check_start_time.strftime('%H:%M:%S')}, "
-                              f"检查窗口结束={check_end_time.strftime('%H:%M:%S')}, "
-                              f"间隔时间={window_duration:.1f}秒, "
-                              f"已过去={time_elapsed:.2f}分钟, "
-                              f"企业={alert.enterprise_name}, "
-                              f"alert_key={alert.alert_key}")
-                    
-                    # 检查窗口内是否有对应的"告警恢复"
-                    recent_recovery = db.query(Alert).filter(
-                        and_(
-                            Alert.enterprise_name == alert.enterprise_name,
-                            Alert.alert_key == alert.alert_key,
-                            Alert.om_type == "告警恢复",
-                            Alert.time >= check_start_time,  # 告警恢复时间应该晚于或等于告警触发时间
-                            Alert.time <= check_end_time     # 告警恢复时间必须在检查窗口内
-                        )
-                    ).first()
-                    
-                    # 如果窗口已过期且没有找到"告警恢复"，触发超时通知
-                    if not recent_recovery:
-                        logger.warning(f"[定期检查] ⚠️ 告警触发超时! ID={alert.id}, "
-                                     f"告警时间={check_start_time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                                     f"已过去={time_elapsed:.2f}分钟, "
-                                     f"企业={alert.enterprise_name}, "
-                                     f"alert_key={alert.alert_key}")
-                        await trigger_timeout_workflow(alert)
-                        alert.timeout_triggered = True
-                        db.commit()
-                        logger.info(f"[定期检查] ✅ 已触发超时通知并标记: 告警 ID={alert.id}")
-                    else:
-                        logger.info(f"[定期检查] ✓ 告警触发已收到恢复: ID={alert.id}, "
-                                  f"恢复时间={recent_recovery.time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                                  f"告警时间={check_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            finally:
-                db.close()
+            await process_expired_triggers("[定期检查]")
         except Exception as e:
             logger.error(f"[定期检查] ❌ 检查超时告警时出错: {str(e)}", exc_info=True)
 
 
-async def trigger_timeout_workflow(alert: Alert):
+def build_timeout_inputs(alert, input_text: Optional[str]) -> dict:
+    """构建超时通知 workflow 的 inputs：input（告警消息内容，缺失时为空字符串）、enterprise_name、time 三个字段"""
+    # 格式化时间为字符串（北京时间格式：YYYY-MM-DD HH:MM:SS）
+    if isinstance(alert.time, datetime):
+        # 如果有时区信息，转换为北京时间
+        if alert.time.tzinfo:
+            beijing_tz = timezone(timedelta(hours=8))
+            beijing_time = alert.time.astimezone(beijing_tz)
+            time_str = beijing_time.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            # 如果没有时区信息，直接格式化
+            time_str = alert.time.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        time_str = str(alert.time)
+
+    return {
+        "input": input_text or "",
+        "enterprise_name": alert.enterprise_name,
+        "time": time_str
+    }
+
+
+def merge_timeout_inputs(inputs_list: List[dict]) -> dict:
+    """
+    合并同一企业的多个超时通知 inputs，字段与单条通知相同，workflow 不需要修改：
+    input 为汇总说明加按告警时间排序的各条告警内容，time 为最早的告警时间
+    """
+    items = sorted(inputs_list, key=lambda item: item["time"])
+    header = (f"共 {len(items)} 个告警触发未在{ALERT_TIMEOUT_MINUTES}分钟内收到告警恢复"
+              f"（告警时间 {items[0]['time']} ~ {items[-1]['time']}）")
+    sections = [
+        f"[{index}] 告警时间: {item['time']}" + (f"\n{item['input']}" if item["input"] else "")
+        for index, item in enumerate(items, start=1)
+    ]
+    return {
+        "input": "\n\n".join([header] + sections),
+        "enterprise_name": items[0]["enterprise_name"],
+        "time": items[0]["time"]
+    }
+
+
+async def trigger_timeout_workflow(alert_ids: List[int], inputs: dict):
     """
     触发超时后的 Dify workflow API
     使用 Dify 官方 API 格式：POST /v1/workflows/run
-    在 inputs 中发送 input、enterprise_name、time 三个字段
+    alert_ids 包含多个告警时，inputs 是按企业合并后的通知
+    发送失败时抛出异常，由发件箱投递器按退避策略重试
     """
-    logger.info(f"[触发超时] 准备触发超时通知: 告警 ID={alert.id}, 企业={alert.enterprise_name}, alert_key={alert.alert_key}")
-    
     if not DIFY_WEBHOOK_URL_TIMEOUT:
-        logger.error(f"[触发超时] ❌ 未配置 DIFY_WEBHOOK_URL_TIMEOUT，无法触发超时通知! 告警 ID={alert.id}")
-        return
-    
+        raise RuntimeError("未配置 DIFY_WEBHOOK_URL_TIMEOUT，无法触发超时通知")
+
     if not DIFY_API_KEY:
         logger.warning(f"[触发超时] ⚠️ 未配置 DIFY_API_KEY，将尝试不使用认证发送请求")
-    
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[触发超时] 发送超时通知到 Dify workflow，告警 ID: {alert_ids}，URL: {DIFY_WEBHOOK_URL_TIMEOUT}，"
+                     f"inputs: {json.dumps(inputs, ensure_ascii=False)}")
+
+    start = time.perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # 格式化时间为字符串（北京时间格式：YYYY-MM-DD HH:MM:SS）
-            if isinstance(alert.time, datetime):
-                # 如果有时区信息，转换为北京时间
-                if alert.time.tzinfo:
-                    beijing_tz = timezone(timedelta(hours=8))
-                    beijing_time = alert.time.astimezone(beijing_tz)
-                    time_str = beijing_time.strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    # 如果没有时区信息，直接格式化
-                    time_str = alert.time.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                time_str = str(alert.time)
-            
-            # 按照 Dify 官方 API 格式构建请求
-            # inputs 字段包含工作流变量
-            payload = {
-                "inputs": {
-                    "input": alert.input,
-                    "enterprise_name": alert.enterprise_name,
-                    "time": time_str
-                },
-                "response_mode": "blocking",  # 阻塞模式，等待响应
-                "user": DIFY_USER_ID
-            }
-            
-            # 构建请求头
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            # 如果配置了 API Key，添加到 Authorization header
-            if DIFY_API_KEY:
-                headers["Authorization"] = f"Bearer {DIFY_API_KEY}"
-            
-            logger.info(f"[触发超时] 发送超时通知到 Dify workflow，告警 ID: {alert.id}")
-            logger.info(f"[触发超时] 请求 URL: {DIFY_WEBHOOK_URL_TIMEOUT}")
-            logger.info(f"[触发超时] 请求 Headers: {json.dumps({k: v if k != 'Authorization' else 'Bearer ***' for k, v in headers.items()}, ensure_ascii=False)}")
-            logger.info(f"[触发超时] 请求 Body: {json.dumps(payload, indent=2, ensure_ascii=False)}")
-            
-            response = await client.post(
-                DIFY_WEBHOOK_URL_TIMEOUT,
-                json=payload,
-                headers=headers
-            )
-            response.raise_for_status()
-            logger.info(f"[触发超时] ✅ 成功触发超时通知 workflow，告警 ID: {alert.id}, 响应状态: {response.status_code}")
-            
-            # 记录响应内容（如果有）
-            if response.text:
-                logger.info(f"[触发超时] 响应内容: {response.text[:500]}")  # 只记录前500字符
+        response = await run_workflow(DIFY_WEBHOOK_URL_TIMEOUT, inputs)
     except httpx.HTTPStatusError as e:
+        WORKFLOW_ERRORS.labels(f"http_{e.response.status_code}").inc()
         logger.error(f"[触发超时] ❌ HTTP 错误: {e.response.status_code} - {e.response.text}")
-    except Exception as e:
-        logger.error(f"[触发超时] ❌ 触发超时通知 workflow 时出错: {str(e)}", exc_info=True)
+        raise
+    except httpx.TimeoutException:
+        WORKFLOW_ERRORS.labels("timeout").inc()
+        raise
+    except httpx.TransportError:
+        WORKFLOW_ERRORS.labels("transport").inc()
+        raise
+    except Exception:
+        WORKFLOW_ERRORS.labels("other").inc()
+        raise
+    finally:
+        WORKFLOW_DURATION.observe(time.perf_counter() - start)
+    # 投递结果由发件箱投递器记录为事件（notified / notify_retry / notify_dead）
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[触发超时] ✅ 成功触发超时通知 workflow，告警 ID: {alert_ids}, "
+                     f"响应状态: {response.status_code}, 响应内容: {response.text[:500]}")
 
 
-async def delete_old_alerts():
-    """
-    删除旧数据：每天删除前一天的记录
-    保留条件：昨天 23:35 之后且未处理且未超时的记录
-    """
-    beijing_tz = timezone(timedelta(hours=8))
-    db = SessionLocal()
+def encode_alert_cursor(alert_time: datetime, alert_id: int) -> str:
+    """把 (time, id) 编码为不透明的分页游标"""
+    raw = json.dumps([alert_time.isoformat(), alert_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_alert_cursor(cursor: str):
+    """解析分页游标，返回 (time, id)；格式错误时返回 400"""
     try:
-        now = datetime.now(beijing_tz)
-        # 计算时间边界
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        yesterday_23_35 = today_start - timedelta(minutes=25)  # 昨天 23:35:00
-        
-        logger.info(f"[定时删除] 开始执行定时删除任务 - 当前时间: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-        logger.info(f"[定时删除] 删除时间范围: < {today_start.strftime('%Y-%m-%d %H:%M:%S')}")
-        logger.info(f"[定时删除] 保留时间窗口: {yesterday_23_35.strftime('%Y-%m-%d %H:%M:%S')} ~ {today_start.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # 将 aware datetime 转换为 naive datetime（移除时区信息）用于数据库比较
-        # 因为数据库中的 datetime 字段是 naive 的，存储的是北京时间
-        today_start_naive = today_start.replace(tzinfo=None) if today_start.tzinfo else today_start
-        yesterday_23_35_naive = yesterday_23_35.replace(tzinfo=None) if yesterday_23_35.tzinfo else yesterday_23_35
-        
-        # 统计：查询所有需要删除的记录（用于日志）
-        all_to_delete = db.query(Alert).filter(
-            Alert.time < today_start_naive
-        ).all()
-        
-        # 统计：查询保留的记录
-        kept_records = db.query(Alert).filter(
-            and_(
-                Alert.time >= yesterday_23_35_naive,
-                Alert.time < today_start_naive,
-                Alert.timeout_triggered == False,
-                Alert.processed == False
-            )
-        ).all()
-        
-        # 统计：按类型分组
-        to_delete_by_type = {
-            "告警触发": 0,
-            "告警恢复": 0,
-            "其他": 0
-        }
-        kept_by_type = {
-            "告警触发": 0,
-            "告警恢复": 0,
-            "其他": 0
-        }
-        
-        for alert in all_to_delete:
-            # 检查是否应该保留（使用 naive datetime 比较）
-            should_keep = (
-                alert.time >= yesterday_23_35_naive
-                and alert.time < today_start_naive
-                and alert.timeout_triggered == False
-                and alert.processed == False
-            )
-            
-            if not should_keep:
-                # 统计要删除的记录
-                om_type = alert.om_type or "其他"
-                if om_type in to_delete_by_type:
-                    to_delete_by_type[om_type] += 1
-                else:
-                    to_delete_by_type["其他"] += 1
-        
-        for alert in kept_records:
-            # 统计保留的记录
-            om_type = alert.om_type or "其他"
-            if om_type in kept_by_type:
-                kept_by_type[om_type] += 1
-            else:
-                kept_by_type["其他"] += 1
-        
-        # 执行删除（使用 naive datetime）
-        # 删除条件1：所有前几天的数据 + 昨天23:35之前的数据
-        deleted_count_1 = db.query(Alert).filter(
-            Alert.time < yesterday_23_35_naive
-        ).delete(synchronize_session=False)
-        
-        # 删除条件2：昨天23:35-23:59:59之间，但已处理或已超时的数据
-        deleted_count_2 = db.query(Alert).filter(
-            and_(
-                Alert.time >= yesterday_23_35_naive,
-                Alert.time < today_start_naive,
-                or_(Alert.timeout_triggered == True, Alert.processed == True)
-            )
-        ).delete(synchronize_session=False)
-        
-        db.commit()
-        deleted_count = deleted_count_1 + deleted_count_2
-        
-        # 记录日志
-        logger.info(f"[定时删除] ✅ 删除完成")
-        logger.info(f"[定时删除] 删除记录总数: {deleted_count}")
-        logger.info(f"[定时删除] 删除记录统计 - 告警触发: {to_delete_by_type['告警触发']}, 告警恢复: {to_delete_by_type['告警恢复']}, 其他: {to_delete_by_type['其他']}")
-        logger.info(f"[定时删除] 保留记录总数: {len(kept_records)}")
-        logger.info(f"[定时删除] 保留记录统计 - 告警触发: {kept_by_type['告警触发']}, 告警恢复: {kept_by_type['告警恢复']}, 其他: {kept_by_type['其他']}")
-        
-        # 如果有保留的记录，记录详细信息
-        if kept_records:
-            logger.info(f"[定时删除] 保留的记录详情:")
-            for alert in kept_records:
-                logger.info(f"[定时删除]   - ID={alert.id}, time={alert.time.strftime('%Y-%m-%d %H:%M:%S')}, "
-                          f"om_type={alert.om_type}, enterprise_name={alert.enterprise_name}, "
-                          f"alert_key={alert.alert_key}")
-        
-    except Exception as e:
-        logger.error(f"[定时删除] ❌ 删除旧数据时出错: {str(e)}", exc_info=True)
-        db.rollback()
-    finally:
-        db.close()
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        time_str, alert_id = json.loads(raw)
+        return datetime.fromisoformat(time_str), int(alert_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标 after")
 
 
-async def schedule_daily_cleanup():
-    """
-    定时删除任务调度器：每天 00:00:05 执行删除
-    """
-    beijing_tz = timezone(timedelta(hours=8))
-    logger.info(f"[定时删除] 定时删除任务调度器已启动，将在每天 00:00:05 执行删除")
-    
-    while True:
-        try:
-            now = datetime.now(beijing_tz)
-            # 计算下一次执行时间（今天或明天的 00:00:05）
-            next_run = now.replace(hour=0, minute=0, second=5, microsecond=0)
-            if next_run <= now:
-                # 如果今天的 00:00:05 已过，则设置为明天的 00:00:05
-                next_run += timedelta(days=1)
-            
-            # 计算需要等待的秒数
-            wait_seconds = (next_run - now).total_seconds()
-            logger.info(f"[定时删除] 下次执行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}, 等待 {wait_seconds:.0f} 秒")
-            
-            # 等待到执行时间
-            await asyncio.sleep(wait_seconds)
-            
-            # 执行删除
-            await delete_old_alerts()
-            
-        except Exception as e:
-            logger.error(f"[定时删除] ❌ 定时删除任务调度器出错: {str(e)}", exc_info=True)
-            # 出错后等待 1 小时再重试
-            await asyncio.sleep(3600)
+# fields 参数可选的字段（与 AlertResponse 的字段和顺序一致）
+ALERT_FIELDS = list(AlertResponse.model_fields)
+
+
+def parse_alert_fields(fields: str) -> List[str]:
+    """解析 fields 参数：逗号分隔的字段名，或 summary 表示 AlertSummary 的字段；格式错误时返回 400"""
+    if fields.strip() == "summary":
+        return list(AlertSummary.model_fields)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(ALERT_FIELDS)
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"无效的 fields 参数: {', '.join(sorted(unknown)) or fields}，可选字段: {', '.join(ALERT_FIELDS)}"
+        )
+    return [name for name in ALERT_FIELDS if name in requested]
 
 
-@app.get("/api/alerts", response_model=List[AlertResponse])
+@app.get("/api/alerts", response_model=Union[List[AlertResponse], AlertPage])
 async def get_alerts(
     enterprise_name: str = None,
     alert_type: str = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    region: Optional[str] = None,
+    metric: Optional[str] = None,
+    rule_name: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """查询告警列表"""
-    query = db.query(Alert)
+    """
+    查询告警列表
+    start_time / end_time 按告警时间过滤（[start_time, end_time)），PostgreSQL 分区表上只扫描相关日期的分区
+    region / metric / rule_name 按从告警消息中解析出的字段过滤（均有索引）
+
+    传入 after 时使用游标分页（第一页传空字符串），返回 {"items": [...], "next_cursor": "..."}，
+    把 next_cursor 作为下一页的 after；按 (time DESC, id) 排序，每一页的开销与页码无关。
+    不传 after 时保持原来的 skip/limit 分页，返回告警列表
+
+    fields 指定返回的字段（例如 fields=id,enterprise_name,alert_key,alert_type,time），
+    或 fields=summary 返回 AlertSummary 的字段；SQL 只查询这些列，不请求 input 时不读取消息内容
+
+    结果按规范化后的查询参数缓存（query_cache），写入的告警落在过滤条件内时失效
+    """
+    columns = parse_alert_fields(fields) if fields else None
+    after_position = decode_alert_cursor(after) if after else None
+    start_time = to_db_time(start_time) if start_time else None
+    end_time = to_db_time(end_time) if end_time else None
+    parsed_filters = parsed_field_filters(region=region, metric=metric, rule_name=rule_name)
+    cache_key = (
+        "list_alerts",
+        enterprise_name or None,
+        alert_type or None,
+        tuple(sorted(parsed_filters.items())),
+        start_time,
+        end_time,
+        None if after is not None else skip,
+        limit,
+        after_position,
+        after is not None,
+        tuple(columns) if columns is not None else None
+    )
+    cached = query_cache.get(cache_key)
+    if cached is None:
+        generation = query_cache.generation()
+        cached = await query_alert_list(
+            db, enterprise_name, alert_type, parsed_filters, start_time, end_time, skip, limit, after, after_position, columns
+        )
+        query_cache.put_list(
+            cache_key,
+            cached,
+            generation,
+            enterprise_name=enterprise_name or None,
+            alert_type=alert_type or None,
+            start_time=start_time,
+            end_time=cursor_end_time(end_time, after_position[0]) if after_position else end_time
+        )
+    if columns is not None:
+        # 指定 fields 时缓存的是已编码的 JSON 内容
+        return JSONResponse(content=cached)
+    return cached
+
+
+async def query_alert_list(
+    db: AsyncSession,
+    enterprise_name: Optional[str],
+    alert_type: Optional[str],
+    parsed_filters: dict,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    skip: int,
+    limit: int,
+    after: Optional[str],
+    after_position: Optional[tuple],
+    columns: Optional[List[str]]
+):
+    """执行告警列表查询；指定 columns 时返回 jsonable_encoder 编码后的内容"""
+    if columns is None:
+        query = select(Alert).options(undefer(Alert.input))
+    else:
+        # 游标分页还需要 time 和 id 生成 next_cursor；请求 input 时还需要 body_hash 还原消息内容
+        selected = list(dict.fromkeys(
+            columns + (["time", "id"] if after is not None else []) + (["body_hash"] if "input" in columns else [])
+        ))
+        query = select(*[getattr(Alert, name) for name in selected])
+
+    async def to_items(rows) -> list:
+        if columns is None:
+            await rehydrate_alerts(db, rows)
+            return [AlertResponse.model_validate(alert) for alert in rows]
+        items = [{name: row._mapping[name] for name in columns} for row in rows]
+        if "input" in columns:
+            bodies = await load_bodies(db, [row.body_hash for row in rows])
+            for item, row in zip(items, rows):
+                item["input"] = alert_input(row.input, row.body_hash, bodies)
+        return items
     
     if enterprise_name:
-        query = query.filter(Alert.enterprise_name == enterprise_name)
+        query = query.where(Alert.enterprise_name == enterprise_name)
     if alert_type:
-        query = query.filter(Alert.alert_type == alert_type)
+        query = query.where(Alert.alert_type == alert_type)
+    for name, value in parsed_filters.items():
+        query = query.where(getattr(Alert, name) == value)
+    if start_time:
+        query = query.where(Alert.time >= start_time)
+    if end_time:
+        query = query.where(Alert.time < end_time)
+
+    if after is not None:
+        if after_position:
+            after_time, after_id = after_position
+            # time <= after_time 是冗余条件，让数据库直接用索引定位到游标位置，而不是逐行过滤 OR 条件
+            query = query.where(
+                Alert.time <= after_time,
+                or_(Alert.time < after_time, and_(Alert.time == after_time, Alert.id > after_id))
+            )
+        # 多取一条判断是否还有下一页
+        result = await db.execute(query.order_by(Alert.time.desc(), Alert.id).limit(limit + 1))
+        rows = result.scalars().all() if columns is None else result.all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_alert_cursor(rows[-1].time, rows[-1].id)
+        if columns is not None:
+            return jsonable_encoder({"items": await to_items(rows), "next_cursor": next_cursor})
+        return AlertPage(items=await to_items(rows), next_cursor=next_cursor)
     
-    alerts = query.order_by(Alert.time.desc()).offset(skip).limit(limit).all()
-    return [AlertResponse.model_validate(alert) for alert in alerts]
+    result = await db.execute(query.order_by(Alert.time.desc()).offset(skip).limit(limit))
+    if columns is not None:
+        return jsonable_encoder(await to_items(result.all()))
+    return await to_items(result.scalars().all())
+
+
+def parsed_field_filters(**filters: Optional[str]) -> dict:
+    """按解析字段（region / metric / rule_name）过滤的条件，忽略空值"""
+    return {name: value for name, value in filters.items() if value}
+
+
+def format_export_value(value):
+    """导出时的字段格式：时间为 ISO 格式"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_row_values(row, columns: List[str]) -> tuple:
+    """
+    导出查询的一行：前面为导出字段；导出 input 时最后两列为 alert_bodies 的 encoding 和 content，
+    消息存入 alert_bodies 的告警在这里解压还原 input
+    """
+    if len(row) == len(columns):
+        return tuple(row)
+    values = list(row[:len(columns)])
+    encoding, content = row[len(columns):]
+    if content is not None:
+        values[columns.index("input")] = decode_body(encoding, content)
+    return tuple(values)
+
+
+async def export_alert_rows(query, columns: List[str], export_format: str):
+    """
+    在独立的会话中用服务端游标按批（yield_per）读取告警并逐批输出 NDJSON / CSV 文本
+    （StreamingResponse 在依赖注入的会话关闭后才开始迭代，不能使用 get_async_db 的会话）
+    """
+    exported = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            if export_format == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(columns)
+                yield buffer.getvalue()
+            async for rows in result.partitions():
+                rows = [export_row_values(row, columns) for row in rows]
+                if export_format == "csv":
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows([[format_export_value(value) for value in row] for row in rows])
+                    chunk = buffer.getvalue()
+                else:
+                    chunk = "".join(
+                        json.dumps(
+                            {name: format_export_value(value) for name, value in zip(columns, row)},
+                            ensure_ascii=False
+                        ) + "\n"
+                        for row in rows
+                    )
+                exported += len(rows)
+                yield chunk
+        logger.info(f"[导出] ✅ 导出完成: {exported} 条，格式 {export_format}")
+    except Exception as e:
+        # 响应头已经发出，只能记录错误并提前结束输出
+        logger.error(f"[导出] ❌ 导出告警时出错（已输出 {exported} 条）: {str(e)}", exc_info=True)
+        raise
+
+
+@app.get("/api/alerts/export")
+async def export_alerts(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    enterprise_name: str = None,
+    alert_type: str = None,
+    format: str = "ndjson",
+    fields: Optional[str] = None,
+    region: Optional[str] = None,
+    metric: Optional[str] = None,
+    rule_name: Optional[str] = None
+):
+    """
+    流式导出告警（NDJSON 或 CSV），按 (time, id) 升序
+    start_time / end_time 按告警时间过滤（[start_time, end_time)），fields、region / metric / rule_name 与列表接口相同；
+    数据库端使用服务端游标按 EXPORT_BATCH_SIZE 条一批读取，内存占用与导出的总条数无关
+    注意：必须声明在 /api/alerts/{alert_id} 之前，否则 "export" 会被当作 alert_id
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format 只能是 ndjson 或 csv")
+    columns = parse_alert_fields(fields) if fields else ALERT_FIELDS
+    if "input" in columns:
+        # 消息存入 alert_bodies 的告警通过外连接一起读出（不需要额外查询）
+        query = (
+            select(*[getattr(Alert, name) for name in columns], AlertBody.encoding, AlertBody.content)
+            .outerjoin(AlertBody, and_(Alert.input.is_(None), AlertBody.hash == Alert.body_hash))
+        )
+    else:
+        query = select(*[getattr(Alert, name) for name in columns])
+    if start_time:
+        query = query.where(Alert.time >= to_db_time(start_time))
+    if end_time:
+        query = query.where(Alert.time < to_db_time(end_time))
+    if enterprise_name:
+        query = query.where(Alert.enterprise_name == enterprise_name)
+    if alert_type:
+        query = query.where(Alert.alert_type == alert_type)
+    for name, value in parsed_field_filters(region=region, metric=metric, rule_name=rule_name).items():
+        query = query.where(getattr(Alert, name) == value)
+    query = query.order_by(Alert.time, Alert.id)
+
+    logger.info(f"[导出] 开始导出告警: 格式={format}, 时间范围={start_time} ~ {end_time}, "
+                f"企业={enterprise_name}, 类型={alert_type}")
+    filename = f"alerts_{beijing_now_naive().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        export_alert_rows(query, columns, format),
+        media_type="text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @app.get("/api/alerts/{alert_id}", response_model=AlertResponse)
-async def get_alert(alert_id: int, db: Session = Depends(get_db)):
-    """查询单个告警详情"""
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+async def get_alert(alert_id: int, db: AsyncSession = Depends(get_async_db)):
+    """查询单个告警详情（缓存到告警被更新或删除为止，最长 ALERT_CACHE_TTL_SECONDS 秒）"""
+    cached = query_cache.get(alert_cache_key(alert_id))
+    if cached is not None:
+        return cached
+    generation = query_cache.generation()
+    alert = await db.get(Alert, alert_id, options=[undefer(Alert.input)])
     if not alert:
         raise HTTPException(status_code=404, detail="告警记录不存在")
-    return AlertResponse.model_validate(alert)
+    await rehydrate_alerts(db, [alert])
+    response = AlertResponse.model_validate(alert)
+    query_cache.put_alert(alert_id, response, generation, alert.time)
+    return response
+
+
+STATS_GROUP_BY = {
+    "bucket": AlertRollup.bucket_start,
+    "enterprise_name": AlertRollup.enterprise_name,
+    "om_type": AlertRollup.om_type,
+    "alert_type": AlertRollup.alert_type,
+}
+STATS_COUNTERS = ("alert_count", "trigger_count", "recovery_count", "timeout_count")
+
+
+@app.get("/api/stats", response_model=AlertStatsResponse)
+async def get_alert_stats(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    enterprise_name: str = None,
+    om_type: str = None,
+    alert_type: str = None,
+    group_by: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    告警统计：告警总数、"告警触发"、"告警恢复"和超时数量
+    只读取统计汇总表 alert_rollups（接收告警和超时检测时增量维护），不扫描 alerts 表；
+    start_time / end_time 按 5 分钟时间桶过滤（start_time 向下取整到时间桶，[start_time, end_time)）
+    group_by 为逗号分隔的分组维度：bucket、enterprise_name、om_type、alert_type
+    """
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()] if group_by else []
+    unknown = [name for name in dimensions if name not in STATS_GROUP_BY]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"无效的 group_by 参数: {', '.join(unknown)}，可选维度: {', '.join(STATS_GROUP_BY)}"
+        )
+    dimensions = list(dict.fromkeys(dimensions))
+
+    conditions = []
+    if start_time:
+        conditions.append(AlertRollup.bucket_start >= bucket_start(to_db_time(start_time)))
+    if end_time:
+        conditions.append(AlertRollup.bucket_start < to_db_time(end_time))
+    if enterprise_name:
+        conditions.append(AlertRollup.enterprise_name == enterprise_name)
+    if om_type:
+        conditions.append(AlertRollup.om_type == om_type)
+    if alert_type:
+        conditions.append(AlertRollup.alert_type == alert_type)
+
+    sums = [func.coalesce(func.sum(getattr(AlertRollup, name)), 0).label(name) for name in STATS_COUNTERS]
+    totals = (await db.execute(select(*sums).where(*conditions))).one()
+
+    rows = []
+    if dimensions:
+        group_columns = [STATS_GROUP_BY[name] for name in dimensions]
+        result = await db.execute(
+            select(*group_columns, *sums).where(*conditions).group_by(*group_columns).order_by(*group_columns)
+        )
+        rows = [AlertStatsRow(**row._mapping) for row in result]
+
+    return AlertStatsResponse(
+        group_by=dimensions,
+        totals=AlertStatsCounts(**totals._mapping),
+        rows=rows
+    )
 
 
 @app.get("/health")
@@ -707,8 +1294,11 @@ async def not_found_handler(request: Request, exc):
             "available_routes": [route.path for route in app.routes],
             "suggestions": {
                 "create_alert": "POST /api/alert",
+                "create_alerts_batch": "POST /api/alerts/batch",
                 "list_alerts": "GET /api/alerts",
+                "export_alerts": "GET /api/alerts/export",
                 "get_alert": "GET /api/alerts/{alert_id}",
+                "alert_stats": "GET /api/stats",
                 "health": "GET /health",
                 "api_docs": "GET /docs"
             }
@@ -0,0 +1,310 @@
+"""
+进程内指标：计数器、仪表和直方图，以 Prometheus 文本格式输出（GET /metrics）
+
+不依赖 prometheus_client。记录一次指标只是一次字典查找加整数/浮点数累加（直方图多一次 bisect），
+不加锁：所有指标只在事件循环线程中更新。需要在采集时才计算的值（连接池、任务数、待检查告警数）
+用 Gauge.set_function() 注册回调，只在 /metrics 被请求时调用。
+"""
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 默认直方图区间（秒），覆盖接口请求的毫秒级到外部调用的十秒级
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(
+        f'{name}="{_escape("" if value is None else str(value))}"' for name, value in zip(names, values)
+    ) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """按标签取值返回子指标（首次使用时创建）；取值为 None 时记为空字符串"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要 {len(self.labelnames)} 个标签值，收到 {len(values)} 个")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """返回 (指标名后缀, 标签文本, 值) 列表"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """只增不减的计数器，名称以 _total 结尾"""
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._children[()].value += amount
+
+    def samples(self):
+        return [("", _format_labels(self.labelnames, values), child.value) for values, child in self._children.items()]
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], Optional[float]]):
+        """采集时调用 function 取值；返回 None 时不输出这个样本（例如连接池不支持该统计）"""
+        self.function = function
+
+    def get(self) -> Optional[float]:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    """可增可减的仪表，或在采集时通过回调计算"""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._children[()].value = value
+
+    def set_function(self, function: Callable[[], Optional[float]]):
+        self._children[()].set_function(function)
+
+    def samples(self):
+        samples = []
+        for values, child in self._children.items():
+            value = child.get()
+            if value is not None:
+                samples.append(("", _format_labels(self.labelnames, values), value))
+        return samples
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # bisect_left：value 等于区间上界时计入该区间（Prometheus 的 le 语义）
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """直方图：按区间计数（采集时输出累计值）以及总和、总数"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def samples(self):
+        samples = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), child.counts):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*values, _format_value(bound)))
+                samples.append(("_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, values)
+            samples.append(("_sum", labels, child.sum))
+            samples.append(("_count", labels, child.count))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表，render() 生成 Prometheus 文本格式（text/plain; version=0.0.4）"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标 {metric.name} 已注册")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry()
+
+# 接收告警
+ALERTS_RECEIVED = registry.counter(
+    "alert_data_alerts_received_total",
+    "接收的告警数量（单条和批量接口），result 为 created、duplicate 或 error",
+    ("alert_type", "result")
+)
+RECEIVE_DURATION = registry.histogram(
+    "alert_data_receive_duration_seconds",
+    "POST /api/alert 的处理耗时（不含请求体解析）",
+    ("alert_type",)
+)
+BATCH_RECEIVE_DURATION = registry.histogram(
+    "alert_data_batch_receive_duration_seconds",
+    "POST /api/alerts/batch 的处理耗时（不含请求体解析）"
+)
+PENDING_TRIGGERS = registry.gauge(
+    "alert_data_pending_triggers",
+    "超时调度器中等待告警恢复的告警触发数量"
+)
+
+# 超时检查
+CHECKER_DURATION = registry.histogram(
+    "alert_data_checker_pass_duration_seconds",
+    "一轮超时检查的耗时，source 为 scheduler（超时调度器到期）或 periodic（定期检查）",
+    ("source",)
+)
+CHECKER_ROWS = registry.counter(
+    "alert_data_checker_rows_total",
+    "超时检查处理的到期告警数量，result 为 recovered、timed_out 或 skipped",
+    ("result",)
+)
+
+# 超时通知
+WORKFLOW_DURATION = registry.histogram(
+    "alert_data_timeout_workflow_duration_seconds",
+    "调用 Dify 超时通知 workflow 的耗时（包括失败的调用）"
+)
+WORKFLOW_ERRORS = registry.counter(
+    "alert_data_timeout_workflow_errors_total",
+    "调用 Dify 超时通知 workflow 失败的次数，reason 为 http_<状态码>、timeout、transport 或 other",
+    ("reason",)
+)
+
+# 数据清理
+RETENTION_ROWS_DELETED = registry.counter(
+    "alert_data_retention_rows_deleted_total",
+    "数据清理删除的行数（按表；alerts 包括整体删除的过期分区中的行）",
+    ("table",)
+)
+
+# 运行时
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "alert_data_db_pool_checked_out",
+    "SQLAlchemy 连接池中已借出的连接数，engine 为 async（接口和后台任务）或 sync（启动和迁移）",
+    ("engine",)
+)
+DB_POOL_OVERFLOW = registry.gauge(
+    "alert_data_db_pool_overflow",
+    "SQLAlchemy 连接池当前的溢出连接数（超过 pool_size 时为正数）",
+    ("engine",)
+)
+ASYNCIO_TASKS = registry.gauge(
+    "alert_data_asyncio_tasks",
+    "事件循环中未完成的 asyncio 任务数量"
+)
+
+
+def pool_gauges(engine_label: str, engine):
+    """
+    为引擎的连接池注册已借出和溢出连接数的回调（采集时读取 engine.pool，dispose() 换了连接池也不影响）；
+    NullPool、StaticPool 等不支持这些统计的连接池不输出样本
+    """
+    def pool_stat(name: str, minimum: Optional[float] = None) -> Callable[[], Optional[float]]:
+        def read():
+            stat = getattr(engine.pool, name, None)
+            if not callable(stat):
+                return None
+            return stat() if minimum is None else max(stat(), minimum)
+        return read
+
+    DB_POOL_CHECKED_OUT.labels(engine_label).set_function(pool_stat("checkedout"))
+    # QueuePool.overflow() 从 -pool_size 开始计数，负数表示池内还没有建满连接，这里只输出溢出的部分
+    DB_POOL_OVERFLOW.labels(engine_label).set_function(pool_stat("overflow", 0))
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class AlertInput(BaseModel):
@@ -26,6 +26,69 @@ class AlertResponse(BaseModel):
     alert_key: str
     processed: bool
     timeout_triggered: bool
+    # 从告警消息中解析出的字段（无法解析时为 null）
+    region: Optional[str] = None
+    metric: Optional[str] = None
+    rule_name: Optional[str] = None
+    generator_url: Optional[str] = None
+    alert_summary: Optional[str] = None
+    alert_details: Optional[str] = None
+    script_name: Optional[str] = None
     
     model_config = {"from_attributes": True}
 
+
+class AlertSummary(BaseModel):
+    """告警摘要模型（列表视图使用，不包含 input 消息内容）"""
+    id: int
+    enterprise_name: str
+    time: datetime
+    alert_type: str
+    om_type: str
+    alert_key: str
+    processed: bool
+    timeout_triggered: bool
+
+
+class BatchAlertItemResult(BaseModel):
+    """批量接收中单条告警的处理结果"""
+    index: int  # 在请求列表中的位置
+    id: int  # 告警记录 ID
+    status: str  # "pending"（等待超时检查）、"resolved"（已被同批次恢复取消）、"recovered"（告警恢复）、"stored"（其他）、"duplicate"（重复告警，id 为原记录）
+
+
+class BatchAlertResponse(BaseModel):
+    """批量接收告警的响应模型"""
+    total: int  # 本批次告警数量
+    duplicates: int = 0  # 重复（已存在或批次内重复）的告警数量，这些告警没有写入新记录
+    resolved_triggers: int  # 本批次"告警恢复"取消的"告警触发"数量
+    items: List[BatchAlertItemResult]
+
+
+class AlertPage(BaseModel):
+    """游标分页的告警列表"""
+    items: List[AlertResponse]
+    next_cursor: Optional[str] = None  # 下一页的 after 参数，没有更多数据时为 null
+
+
+class AlertStatsCounts(BaseModel):
+    """告警统计计数"""
+    alert_count: int = 0  # 告警总数
+    trigger_count: int = 0  # "告警触发"数量
+    recovery_count: int = 0  # "告警恢复"数量
+    timeout_count: int = 0  # 超时未恢复的"告警触发"数量
+
+
+class AlertStatsRow(AlertStatsCounts):
+    """按 group_by 分组的一行统计，未参与分组的维度为 null"""
+    bucket_start: Optional[datetime] = None  # 5 分钟时间桶的开始时间
+    enterprise_name: Optional[str] = None
+    om_type: Optional[str] = None
+    alert_type: Optional[str] = None
+
+
+class AlertStatsResponse(BaseModel):
+    """告警统计响应模型"""
+    group_by: List[str]  # 分组维度
+    totals: AlertStatsCounts  # 过滤条件范围内的合计
+    rows: List[AlertStatsRow]  # 分组统计（未指定 group_by 时为空）
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update, func
+
+from events import EventRecorder, EVENT_NOTIFIED, EVENT_NOTIFY_RETRY, EVENT_NOTIFY_DEAD
+from database import (
+    AsyncSessionLocal,
+    NotificationOutbox,
+    beijing_now_naive,
+    OUTBOX_PENDING,
+    OUTBOX_SENT,
+    OUTBOX_DEAD
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """
+    超时通知发件箱投递器
+
+    单个协程循环领取到期的 pending 记录（每批最多 batch_size 条），以固定并发上限调用 send 发送，
+    每次发送完成后立即在一个短事务中写回结果：成功的标记为 sent，失败的按指数退避推迟 next_attempt_at，
+    达到 max_attempts 后标记为 dead 不再投递。
+    领取时把 next_attempt_at 推迟一个租约时间并累加 attempts，其他投递器不会重复领取；
+    进程在发送中途退出时，租约到期后记录会被重新领取。写回时要求 attempts 仍等于领取时的值，
+    租约到期后已被其他投递器重新领取的记录不会被覆盖。
+    每次 send 最多等待 send_timeout 秒；租约不短于一批中排在最后的发送可能等待的时间
+    （ceil(batch_size / concurrency) + 1 个 send_timeout），lease_seconds 为 0 时取这个下限，
+    配置更短时自动调大并记录警告（未设置 send_timeout 时 lease_seconds 为 0 按 120 秒）。
+
+    提供 merge 时启用按企业合并：同一 enterprise_name 的通知在 coalesce_window 秒内没有新记录写入、
+    累计达到 coalesce_max_alerts 条，或最早的记录已等待 coalesce_max_delay 秒时，
+    合并为一次 send 调用（inputs 由 merge 生成），成功或失败对整组记录一起生效。
+
+    每条通知的投递结果记录到 events（notified / notify_retry / notify_dead），日志只输出每批的汇总和最终放弃的通知。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[int], Dict[str, Any]], Awaitable[None]],
+        batch_size: int = 100,
+        concurrency: int = 10,
+        poll_interval: float = 5.0,
+        max_attempts: int = 8,
+        backoff_base: float = 5.0,
+        backoff_max: float = 600.0,
+        lease_seconds: float = 0.0,
+        send_timeout: Optional[float] = None,
+        merge: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = None,
+        coalesce_window: float = 30.0,
+        coalesce_max_alerts: int = 20,
+        coalesce_max_delay: float = 120.0,
+        events: Optional[EventRecorder] = None,
+        clock: Callable[[], datetime] = beijing_now_naive
+    ):
+        self._send = send
+        self._batch_size = batch_size
+        self._concurrency = concurrency
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._send_timeout = send_timeout
+        self._lease_seconds = max(lease_seconds, self.minimum_lease_seconds()) or 120.0
+        if 0 < lease_seconds < self._lease_seconds:
+            logger.warning(f"[发件箱] ⚠️ 投递租约 {lease_seconds:g}秒 短于一批通知的最长投递时间，"
+                           f"已调整为 {self._lease_seconds:g}秒（批量大小 {batch_size}，并发上限 {concurrency}，"
+                           f"单次发送超时 {send_timeout:g}秒）")
+        self._merge = merge
+        self._coalesce_window = timedelta(seconds=coalesce_window)
+        self._coalesce_max_alerts = coalesce_max_alerts
+        self._coalesce_max_delay = timedelta(seconds=coalesce_max_delay)
+        self._events = events or EventRecorder(capacity=0)
+        self._clock = clock
+        self._next_ready: Optional[datetime] = None  # 合并模式下最近一个企业分组满足发送条件的时间
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """有新的通知写入发件箱时调用，立即唤醒投递协程，不必等到下一次轮询"""
+        self._wakeup.set()
+
+    def start(self):
+        """启动投递协程（在当前事件循环中创建唤醒事件）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[发件箱] 投递器已启动，批量大小 {self._batch_size}，并发上限 {self._concurrency}，"
+                    f"最大投递次数 {self._max_attempts}，投递租约 {self._lease_seconds:g}秒")
+        if self._merge is not None:
+            logger.info(f"[发件箱] 已启用按企业合并通知：静默窗口 {self._coalesce_window.total_seconds():g}秒，"
+                        f"每次最多 {self._coalesce_max_alerts} 个告警，"
+                        f"最长等待 {self._coalesce_max_delay.total_seconds():g}秒")
+
+    async def stop(self, timeout: float = 30.0):
+        """停止投递：不再领取新批次，等待当前批次发送并写回结果（超时则取消，由租约保证重新投递）"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[发件箱] ⚠️ 等待当前批次完成超时（{timeout}秒），未写回的通知将在租约到期后重新投递")
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def minimum_lease_seconds(self) -> float:
+        """一批中排在最后的通知最多等待 ceil(batch_size / concurrency) 轮发送，再加一轮写回的余量"""
+        if not self._send_timeout:
+            return 0.0
+        return (math.ceil(self._batch_size / max(self._concurrency, 1)) + 1) * self._send_timeout
+
+    def backoff(self, attempts: int) -> float:
+        """第 attempts 次投递失败后的等待时间（秒）：backoff_base * 2^(attempts-1)，不超过 backoff_max"""
+        return min(self._backoff_base * (2 ** max(attempts - 1, 0)), self._backoff_max)
+
+    async def drain_once(self) -> int:
+        """领取并投递一批到期的通知，返回本批领取的数量"""
+        if self._merge is None:
+            entries = await self._claim()
+            groups = [[entry] for entry in entries]
+        else:
+            entries = await self._claim(await self._ready_enterprises())
+            groups = self._group_by_enterprise(entries)
+        if not entries:
+            return 0
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        totals = {OUTBOX_SENT: 0, OUTBOX_PENDING: 0, OUTBOX_DEAD: 0, "stale": 0}
+        errors = []
+
+        async def deliver(group: list):
+            async with semaphore:
+                try:
+                    inputs = [json.loads(entry.payload) for entry in group]
+                    await asyncio.wait_for(
+                        self._send(
+                            [entry.alert_id for entry in group],
+                            inputs[0] if len(group) == 1 else self._merge(inputs)
+                        ),
+                        timeout=self._send_timeout
+                    )
+                    error = None
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                    errors.append(error)
+            # 每组发送完成后立即写回，不等待同一批的其他发送，写回不占用发送并发
+            try:
+                counts = await self._record_results(group, error)
+            except Exception as e:
+                logger.error(f"[发件箱] ❌ 写回投递结果失败，{len(group)} 个通知将在租约到期后重新投递: {str(e)}")
+                return
+            for status, count in counts.items():
+                totals[status] += count
+
+        await asyncio.gather(*(deliver(group) for group in groups))
+
+        if totals[OUTBOX_PENDING]:
+            logger.warning(f"[发件箱] ⚠️ 本批 {totals[OUTBOX_PENDING]} 个超时通知投递失败，等待重试"
+                           f"（首个错误: {errors[0]}），详情见 /debug/events?kind=notify_retry")
+        if totals["stale"]:
+            logger.warning(f"[发件箱] ⚠️ {totals['stale']} 个通知在写回前租约已到期并被重新领取，本次结果未写回")
+        logger.info(f"[发件箱] 本批投递完成（{len(groups)} 次 workflow 调用）: 成功 {totals[OUTBOX_SENT]} 个, "
+                    f"等待重试 {totals[OUTBOX_PENDING]} 个, 放弃 {totals[OUTBOX_DEAD]} 个")
+        return len(entries)
+
+    def _due(self, now: datetime):
+        return and_(NotificationOutbox.status == OUTBOX_PENDING, NotificationOutbox.next_attempt_at <= now)
+
+    async def _ready_enterprises(self) -> List[Optional[str]]:
+        """
+        按 enterprise_name 汇总到期的通知，返回已满足发送条件的企业，
+        并记录其余企业中最早满足条件的时间（投递协程据此决定等待多久）
+        """
+        now = self._clock()
+        async with AsyncSessionLocal() as db:
+            summaries = (await db.execute(
+                select(
+                    NotificationOutbox.enterprise_name,
+                    func.count().label("count"),
+                    func.min(NotificationOutbox.created_at).label("first_created"),
+                    func.max(NotificationOutbox.created_at).label("last_created")
+                )
+                .where(self._due(now))
+                .group_by(NotificationOutbox.enterprise_name)
+            )).all()
+
+        ready = []
+        self._next_ready = None
+        for summary in summaries:
+            ready_at = min(
+                summary.last_created + self._coalesce_window,
+                summary.first_created + self._coalesce_max_delay
+            )
+            if summary.count >= self._coalesce_max_alerts or ready_at <= now:
+                ready.append(summary.enterprise_name)
+            elif self._next_ready is None or ready_at < self._next_ready:
+                self._next_ready = ready_at
+        return ready
+
+    def _group_by_enterprise(self, entries: list) -> List[list]:
+        """把领取到的通知按 enterprise_name 分组，每组不超过 coalesce_max_alerts 条"""
+        by_enterprise: Dict[Optional[str], list] = {}
+        for entry in entries:
+            by_enterprise.setdefault(entry.enterprise_name, []).append(entry)
+        groups = []
+        for group in by_enterprise.values():
+            for start in range(0, len(group), self._coalesce_max_alerts):
+                groups.append(group[start:start + self._coalesce_max_alerts])
+        return groups
+
+    async def _claim(self, enterprises: Optional[List[Optional[str]]] = None) -> list:
+        now = self._clock()
+        due = self._due(now)
+        if enterprises is not None:
+            if not enterprises:
+                return []
+            names = [name for name in enterprises if name is not None]
+            enterprise_match = NotificationOutbox.enterprise_name.in_(names)
+            if len(names) < len(enterprises):
+                enterprise_match = or_(enterprise_match, NotificationOutbox.enterprise_name.is_(None))
+            due = and_(due, enterprise_match)
+        due_ids = (
+            select(NotificationOutbox.id)
+            .where(due)
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            # 条件中再次检查 next_attempt_at，并发领取时只有一个投递器能更新成功
+            entries = (await db.execute(
+                update(NotificationOutbox)
+                .where(and_(NotificationOutbox.id.in_(due_ids), self._due(now)))
+                .values(
+                    attempts=NotificationOutbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=self._lease_seconds)
+                )
+                .returning(
+                    NotificationOutbox.id,
+                    NotificationOutbox.alert_id,
+                    NotificationOutbox.enterprise_name,
+                    NotificationOutbox.payload,
+                    NotificationOutbox.attempts
+                )
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+        return entries
+
+    async def _record_results(self, group: list, error: Optional[str]) -> Dict[str, int]:
+        """
+        写回一组通知的发送结果，返回按结果（sent / pending / dead / stale）计数；
+        每条记录的 UPDATE 都要求 attempts 等于领取时的值，不匹配（已被重新领取）的计为 stale，不修改
+        """
+        now = self._clock()
+        counts = {OUTBOX_SENT: 0, OUTBOX_PENDING: 0, OUTBOX_DEAD: 0, "stale": 0}
+        written = []
+        async with AsyncSessionLocal() as db:
+            for entry in group:
+                if error is None:
+                    status = OUTBOX_SENT
+                    values = {"status": OUTBOX_SENT, "sent_at": now, "last_error": None}
+                elif entry.attempts >= self._max_attempts:
+                    status = OUTBOX_DEAD
+                    values = {"status": OUTBOX_DEAD, "last_error": error}
+                else:
+                    status = OUTBOX_PENDING
+                    values = {"next_attempt_at": now + timedelta(seconds=self.backoff(entry.attempts)), "last_error": error}
+                updated = (await db.execute(
+                    update(NotificationOutbox)
+                    .where(
+                        NotificationOutbox.id == entry.id,
+                        NotificationOutbox.attempts == entry.attempts,
+                        NotificationOutbox.status == OUTBOX_PENDING
+                    )
+                    .values(updated_at=now, **values)
+                    .execution_options(synchronize_session=False)
+                )).rowcount
+                if updated:
+                    written.append((entry, status))
+                    counts[status] += 1
+                else:
+                    counts["stale"] += 1
+            await db.commit()
+
+        self._events.record_many(
+            EVENT_NOTIFIED, ((entry.alert_id, entry.enterprise_name) for entry, status in written if status == OUTBOX_SENT)
+        )
+        for entry, status in written:
+            if status == OUTBOX_SENT:
+                continue
+            if status == OUTBOX_DEAD:
+                self._events.record(
+                    EVENT_NOTIFY_DEAD, entry.alert_id, entry.enterprise_name, attempts=entry.attempts, error=error
+                )
+                logger.error(f"[发件箱] ❌ 超时通知投递失败 {entry.attempts} 次，不再重试: "
+                             f"告警 ID={entry.alert_id}, 企业={entry.enterprise_name}, 错误: {error}")
+            else:
+                self._events.record(
+                    EVENT_NOTIFY_RETRY, entry.alert_id, entry.enterprise_name,
+                    attempts=entry.attempts, retry_in_seconds=self.backoff(entry.attempts), error=error
+                )
+        return counts
+
+    async def _run(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"[发件箱] ❌ 投递超时通知时出错: {str(e)}", exc_info=True)
+                claimed = 0
+            if claimed >= self._batch_size or self._stopping:
+                # 满批说明可能还有积压，立即领取下一批
+                continue
+            timeout = self._poll_interval
+            if self._next_ready is not None:
+                timeout = min(timeout, max((self._next_ready - self._clock()).total_seconds(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,10 +1,46 @@
 import re
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional
 
 # 北京时间时区 (UTC+8)
 BEIJING_TZ = timezone(timedelta(hours=8))
 
+# 解析结果中保存到 alerts 表的字段（alert_type 由请求直接提供，不使用解析结果）
+PARSED_FIELDS = (
+    "region",
+    "metric",
+    "rule_name",
+    "generator_url",
+    "alert_summary",
+    "alert_details",
+    "script_name",
+)
+
+
+# 字段标签，例如 **区域 (Region):**；一次扫描找出所有标签的位置，每个分组对应一个字段
+LABEL_PATTERN = re.compile(
+    r"\*\*(?:"
+    r"(?P<region>区域\s*\(Region\))"
+    r"|(?P<metric>指标\s*\(Metric\))"
+    r"|(?P<rule_name>规则名称\s*\(Rule Name\))"
+    r"|(?P<generator_url>告警链接\s*\(GeneratorURL\))"
+    r"|(?P<alert_summary>告警摘要)"
+    r"|(?P<alert_details>告警详情)"
+    r"):\*\*"
+)
+# 标签后的取值，从标签结束位置开始匹配（re.match，不在全文中搜索）
+VALUE_PATTERNS = {
+    "region": re.compile(r"\s*(\w+)"),
+    "metric": re.compile(r"\s*(\w+)"),
+    "rule_name": re.compile(r"\s*([^\n]+)"),
+    "generator_url": re.compile(r"\s*(https?://[^\s\n\)]+)"),
+    "alert_summary": re.compile(r"\s*\n([^\n]+)"),
+}
+# 告警详情从标签后的换行开始（至少还有一个字符），到空行、"**" 或文本结尾为止，结束位置用 str.find 查找
+DETAILS_START_PATTERN = re.compile(r"\s*\n(?=[\s\S])")
+SCRIPT_NAME_PATTERN = re.compile(r"企业\s+([^的\n]+?)(?:\s+CG)?\s+的")
+
 
 def parse_alert_input(input_text: str) -> Dict[str, Optional[str]]:
     """
@@ -24,6 +60,9 @@ def parse_alert_input(input_text: str) -> Dict[str, Optional[str]]:
     在过去十五分钟内的接通率为 14.03%
     呼叫量为 2776
     参考阈值: 0.5%~20%
+
+    只从前往后扫描一遍标签：每个字段取第一个能解析出值的标签，之后出现的同名标签跳过，
+    所有字段都已解析时提前结束；结果与逐个字段 re.search 全文的旧实现一致
     """
     result = {
         "alert_type": None,
@@ -42,52 +81,79 @@ def parse_alert_input(input_text: str) -> Dict[str, Optional[str]]:
     elif "【告警恢复】" in input_text:
         result["alert_type"] = "告警恢复"
     
-    # 解析区域
-    region_match = re.search(r"\*\*区域\s*\(Region\):\*\*\s*(\w+)", input_text)
-    if region_match:
-        result["region"] = region_match.group(1).strip()
-    
-    # 解析指标
-    metric_match = re.search(r"\*\*指标\s*\(Metric\):\*\*\s*(\w+)", input_text)
-    if metric_match:
-        result["metric"] = metric_match.group(1).strip()
-    
-    # 解析规则名称
-    rule_match = re.search(r"\*\*规则名称\s*\(Rule Name\):\*\*\s*([^\n]+)", input_text)
-    if rule_match:
-        result["rule_name"] = rule_match.group(1).strip()
-    
-    # 解析告警链接（支持多种格式）
-    url_match = re.search(r"\*\*告警链接\s*\(GeneratorURL\):\*\*\s*(https?://[^\s\n\)]+)", input_text)
-    if url_match:
-        result["generator_url"] = url_match.group(1).strip()
-    
-    # 解析告警摘要
-    summary_match = re.search(r"\*\*告警摘要:\*\*\s*\n([^\n]+)", input_text)
-    if summary_match:
-        result["alert_summary"] = summary_match.group(1).strip()
-    
-    # 解析告警详情
-    details_match = re.search(r"\*\*告警详情:\*\*\s*\n((?:.|\n)+?)(?=\n\n|\*\*|$)", input_text)
-    if details_match:
-        result["alert_details"] = details_match.group(1).strip()
+    remaining = len(VALUE_PATTERNS) + 1
+    position = 0
+    while remaining:
+        label = LABEL_PATTERN.search(input_text, position)
+        if label is None:
+            break
+        # 标签以 "**" 结尾，下一个标签可能从这两个星号开始
+        position = label.end() - 2
+        field = label.lastgroup
+        if result[field] is not None:
+            continue
+        if field == "alert_details":
+            value = _match_details(input_text, label.end())
+        else:
+            match = VALUE_PATTERNS[field].match(input_text, label.end())
+            value = match.group(1) if match else None
+        if value is not None:
+            result[field] = value.strip()
+            remaining -= 1
     
     # 从告警摘要或详情中提取话术名称
     # 通常格式：企业 XXX 的接通率 或 企业 XXX CG 的接通率
-    # 也可能在企业名称字段中已经提供了完整信息
-    script_match = re.search(r"企业\s+([^的\n]+?)(?:\s+CG)?\s+的", input_text)
-    if script_match:
-        result["script_name"] = script_match.group(1).strip()
-    
-    # 如果从摘要中提取失败，尝试从 rule_name 中提取（如果包含企业信息）
-    if not result["script_name"] and result["rule_name"]:
-        # 规则名称可能包含企业信息，如 IDN-Enterprise-ConnectionRate
-        # 这里可以根据实际规则命名规范进行调整
-        pass
+    if "企业" in input_text:
+        script_match = SCRIPT_NAME_PATTERN.search(input_text)
+        if script_match:
+            result["script_name"] = script_match.group(1).strip()
     
     return result
 
 
+def _match_details(input_text: str, start: int) -> Optional[str]:
+    """告警详情标签之后的内容：到第一个空行、"**" 或文本结尾（忽略结尾的换行）为止，至少一个字符"""
+    match = DETAILS_START_PATTERN.match(input_text, start)
+    if match is None:
+        return None
+    begin = match.end()
+    end = len(input_text)
+    if input_text.endswith("\n") and end - 1 > begin:
+        end -= 1
+    for stop in (input_text.find("\n\n", begin + 1), input_text.find("**", begin + 1)):
+        if stop != -1 and stop < end:
+            end = stop
+    return input_text[begin:end]
+
+
+def parse_many(
+    texts: Iterable[Optional[str]],
+    processes: int = 0,
+    chunksize: int = 256,
+    executor: Optional[Executor] = None
+) -> List[Dict[str, Optional[str]]]:
+    """
+    批量解析告警消息（空的 input 按空字符串解析），按输入顺序返回 parse_alert_input 的结果
+    传入 executor，或 processes > 1 时临时创建进程池，把解析分摊到多个进程（用于大批量回填）；
+    默认在当前进程中逐条解析
+    """
+    texts = [text or "" for text in texts]
+    if executor is not None:
+        return list(executor.map(parse_alert_input, texts, chunksize=chunksize))
+    if processes > 1 and len(texts) > chunksize:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(parse_alert_input, texts, chunksize=chunksize))
+    return [parse_alert_input(text) for text in texts]
+
+
+def extract_alert_fields(input_text: Optional[str]) -> Dict[str, Optional[str]]:
+    """解析 input 并只返回需要保存的字段（PARSED_FIELDS），input 为空时全部为 None"""
+    if not input_text:
+        return dict.fromkeys(PARSED_FIELDS)
+    parsed = parse_alert_input(input_text)
+    return {name: parsed[name] for name in PARSED_FIELDS}
+
+
 def parse_time(time_str: str) -> datetime:
     """解析时间字符串为 datetime 对象（北京时间）"""
     try:
@@ -0,0 +1,199 @@
+"""
+alerts 表按天分区（仅 PostgreSQL）
+
+分区表以 time 为分区键，每天一个分区（alerts_pYYYYMMDD），另有一个 DEFAULT 分区（alerts_default）
+存放不在任何分区范围内的记录。主键为 (id, time)，id 仍由序列 alerts_id_seq 生成。
+这里的函数都接收同步 Connection，Alembic 迁移和 init_db() 直接调用，
+异步代码通过 AsyncConnection.run_sync() 调用。SQLite 部署继续使用单表，不调用这些函数。
+建表相关的函数默认使用 Alert 模型的列和索引（init_db() 新建的表即最新结构）；
+Alembic 迁移传入迁移时的表结构（table 参数），之后的迁移新增的列和索引由各自的迁移创建。
+"""
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import Table, text
+from sqlalchemy.engine import Connection
+
+from database import Alert, beijing_now_naive
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "alerts"
+DEFAULT_PARTITION = "alerts_default"
+ID_SEQUENCE = "alerts_id_seq"
+PARTITION_NAME_PATTERN = re.compile(r"^alerts_p(\d{8})$")
+
+
+def partition_name(day: date) -> str:
+    """分区表名：alerts_pYYYYMMDD"""
+    return f"{PARENT_TABLE}_p{day.strftime('%Y%m%d')}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """alerts 是否为分区表（非 PostgreSQL 始终返回 False）"""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid))"
+    ), {"table": PARENT_TABLE}).scalar())
+
+
+def list_partitions(conn: Connection) -> Dict[date, str]:
+    """返回已有的按天分区 {日期: 分区表名}（不包括 DEFAULT 分区）"""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+    ), {"table": PARENT_TABLE}).scalars().all()
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions[datetime.strptime(match.group(1), "%Y%m%d").date()] = name
+    return partitions
+
+
+def has_default_partition(conn: Connection) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar()
+
+
+def create_partitioned_table(conn: Connection, with_indexes: bool = True, table: Table = Alert.__table__):
+    """
+    按 table（默认为 Alert 模型）的列创建分区父表和 DEFAULT 分区
+    with_indexes=False 时不创建主键和索引（迁移中先导入数据再建索引），之后调用 create_indexes()
+    """
+    columns = []
+    for column in table.columns:
+        if column.name == "id":
+            columns.append(f"id INTEGER NOT NULL DEFAULT nextval('{ID_SEQUENCE}')")
+        else:
+            columns.append(f"{column.name} {column.type.compile(dialect=conn.dialect)}")
+    conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {ID_SEQUENCE}"))
+    conn.execute(text(f"CREATE TABLE {PARENT_TABLE} ({', '.join(columns)}) PARTITION BY RANGE (time)"))
+    conn.execute(text(f"ALTER SEQUENCE {ID_SEQUENCE} OWNED BY {PARENT_TABLE}.id"))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    if with_indexes:
+        create_indexes(conn, table)
+
+
+def create_indexes(conn: Connection, table: Table = Alert.__table__):
+    """在分区父表上创建主键 (id, time) 和 table（默认为 Alert 模型）中定义的索引，PostgreSQL 会自动创建到每个分区"""
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_pkey PRIMARY KEY (id, time)"))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def create_partition(conn: Connection, day: date):
+    """
+    创建某一天的分区
+    DEFAULT 分区中可能已经有这一天的记录（例如告警时间超出了预建范围），直接 CREATE ... PARTITION OF 会失败，
+    所以先建普通表，把这些记录从 DEFAULT 分区移过去，再 ATTACH 为分区
+    """
+    name = partition_name(day)
+    lower = datetime.combine(day, datetime.min.time())
+    upper = lower + timedelta(days=1)
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    if has_default_partition(conn):
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE time >= :lower AND time < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), {"lower": lower, "upper": upper})
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower.isoformat(sep=' ')}') TO ('{upper.isoformat(sep=' ')}')"
+    ))
+
+
+def ensure_partitions(conn: Connection, first_day: date, last_day: date) -> List[str]:
+    """确保 first_day ~ last_day（含）每天都有分区，返回新建的分区名"""
+    existing = list_partitions(conn)
+    if not has_default_partition(conn):
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    created = []
+    day = first_day
+    while day <= last_day:
+        if day not in existing:
+            create_partition(conn, day)
+            created.append(partition_name(day))
+        day += timedelta(days=1)
+    return created
+
+
+def drop_partitions_before(conn: Connection, before: date) -> List[str]:
+    """删除日期早于 before 的整个分区（DROP TABLE，不产生行级删除和死元组），返回删除的分区名"""
+    dropped = []
+    for day, name in sorted(list_partitions(conn).items()):
+        if day < before:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def convert_to_partitioned(
+    conn: Connection,
+    days_ahead: int,
+    max_days_back: int = 31,
+    table: Table = Alert.__table__
+):
+    """
+    把已有的普通 alerts 表转换为分区表（Alembic 迁移使用，table 为迁移时的表结构）
+    为已有数据的日期（最多 max_days_back 天前）和未来 days_ahead 天建分区，更早的记录进入 DEFAULT 分区
+    """
+    legacy = f"{PARENT_TABLE}_legacy"
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": PARENT_TABLE}).scalar()
+    legacy_columns = {
+        row[0] for row in conn.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = :table"
+        ), {"table": PARENT_TABLE})
+    }
+
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {legacy}"))
+    if sequence:
+        # 旧表的 id 序列继续使用，删除旧表时不能连带删除
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        if sequence.split(".")[-1] != ID_SEQUENCE:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {ID_SEQUENCE}"))
+
+    create_partitioned_table(conn, with_indexes=False, table=table)
+
+    today = beijing_now_naive().date()
+    first_time: Optional[datetime] = conn.execute(text(f"SELECT min(time) FROM {legacy}")).scalar()
+    first_day = today
+    if first_time is not None:
+        first_day = max(min(first_time.date(), today), today - timedelta(days=max_days_back))
+    ensure_partitions(conn, first_day, today + timedelta(days=days_ahead))
+
+    # 分区键不能为空：没有告警时间的旧记录使用创建时间
+    columns = [column.name for column in table.columns if column.name in legacy_columns]
+    select_columns = [
+        "COALESCE(time, created_at, now()::timestamp)" if name == "time" else name for name in columns
+    ]
+    conn.execute(text(
+        f"INSERT INTO {PARENT_TABLE} ({', '.join(columns)}) SELECT {', '.join(select_columns)} FROM {legacy}"
+    ))
+    conn.execute(text(
+        f"SELECT setval('{ID_SEQUENCE}', COALESCE((SELECT max(id) FROM {PARENT_TABLE}), 0) + 1, false)"
+    ))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    create_indexes(conn, table)
+
+
+def convert_to_plain(conn: Connection, table: Table = Alert.__table__):
+    """把分区表还原为普通 alerts 表（迁移降级使用，table 为迁移时的表结构）"""
+    staging = f"{PARENT_TABLE}_staging"
+    conn.execute(text(f"CREATE TABLE {staging} AS SELECT * FROM {PARENT_TABLE}"))
+    conn.execute(text(f"DROP TABLE {PARENT_TABLE} CASCADE"))
+    conn.execute(text(f"DROP SEQUENCE IF EXISTS {ID_SEQUENCE}"))
+    table.create(conn)
+    columns = ", ".join(column.name for column in table.columns)
+    conn.execute(text(f"INSERT INTO {PARENT_TABLE} ({columns}) SELECT {columns} FROM {staging}"))
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+        f"COALESCE((SELECT max(id) FROM {PARENT_TABLE}), 0) + 1, false)"
+    ))
+    conn.execute(text(f"DROP TABLE {staging}"))
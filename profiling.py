@@ -0,0 +1,284 @@
+"""
+按请求开启的性能剖析：SQL 语句计数和耗时，以及可选的调用栈采样
+
+ProfilingMiddleware（纯 ASGI）为被选中的请求创建 RequestProfile 并放入 ContextVar，
+install_sql_hooks() 在引擎上注册的 before_cursor_execute / after_cursor_execute 钩子据此记录
+每条 SQL 的耗时（不包括参数）。没有被选中的请求，钩子只多一次 ContextVar 读取。
+
+请求被选中的方式：
+- 请求头 X-Profile-Token 与配置的 token 一致（未配置 token 时不接受请求头开启）；
+  同时带 X-Profile: stack 时还会采样调用栈
+- 按 sample_rate 的比例随机抽样（只统计 SQL，不采样调用栈）
+
+结果写入响应头（X-Profile-Id 和 Server-Timing：sql 为 SQL 总耗时，app 为其余的处理耗时），
+并保存到容量固定的 ProfileBuffer，通过 GET /debug/profiles 查询。
+"""
+import heapq
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 保存的 SQL 语句最大长度（字符）
+STATEMENT_MAX_LENGTH = 1000
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+class StackSampler:
+    """
+    调用栈采样线程：每隔 interval 秒读取一次事件循环线程的调用栈，按 "函数;函数;..." 折叠计数
+    （可直接用于火焰图）。事件循环线程同时在处理其他请求时，它们的调用栈也会被采到
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 64):
+        self._thread_id = thread_id
+        self._interval = interval
+        self._max_depth = max_depth
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-stack-sampler", daemon=True)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            names = []
+            while frame is not None and len(names) < self._max_depth:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+
+
+class RequestProfile:
+    """一个请求的剖析结果：SQL 语句数、SQL 总耗时、最慢的几条语句，以及可选的调用栈采样"""
+
+    def __init__(self, profile_id: int, method: str, path: str, reason: str, slow_statements: int = 5):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.reason = reason  # header 或 sample
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.status: Optional[int] = None
+        self.duration: Optional[float] = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self._slow_statements = slow_statements
+        self._slowest: List[tuple] = []  # 最小堆：(耗时, 序号, 相对请求开始的时间, 语句)
+        self._sequence = itertools.count()
+        self.sampler: Optional[StackSampler] = None
+        self.finished = False
+
+    def record_statement(self, statement: str, started: float, elapsed: float):
+        if self.finished:
+            return  # 请求结束后，请求中创建的任务继承了 ContextVar，它们的 SQL 不计入
+        self.sql_count += 1
+        self.sql_time += elapsed
+        if self._slow_statements <= 0:
+            return
+        entry = (elapsed, next(self._sequence), started - self.start, statement)
+        if len(self._slowest) < self._slow_statements:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头：sql 为 SQL 总耗时，app 为到发送响应头为止的其余耗时（毫秒）"""
+        elapsed = time.perf_counter() - self.start
+        return (f'sql;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} queries", '
+                f'app;dur={max(elapsed - self.sql_time, 0) * 1000:.2f}')
+
+    def finish(self, status: Optional[int]):
+        self.finished = True
+        self.status = status
+        self.duration = time.perf_counter() - self.start
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "time": datetime.fromtimestamp(self.started_at, BEIJING_TZ).replace(tzinfo=None).isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_time * 1000, 3),
+        }
+
+    def details(self, max_stacks: int = 50) -> Dict[str, Any]:
+        result = self.summary()
+        result["slowest_statements"] = [
+            {"duration_ms": round(elapsed * 1000, 3), "offset_ms": round(offset * 1000, 3), "statement": statement}
+            for elapsed, _, offset, statement in sorted(self._slowest, reverse=True)
+        ]
+        if self.sampler is not None:
+            result["stack_samples"] = self.sampler.samples
+            result["stacks"] = [
+                {"stack": stack, "count": count} for stack, count in self.sampler.stacks.most_common(max_stacks)
+            ]
+        return result
+
+
+class ProfileBuffer:
+    """最近的剖析结果（deque(maxlen=capacity)，满后丢弃最早的）"""
+
+    def __init__(self, capacity: int = 200):
+        self._profiles: "deque[RequestProfile]" = deque(maxlen=max(capacity, 0))
+        self._sequence = itertools.count(1)
+
+    @property
+    def capacity(self) -> int:
+        return self._profiles.maxlen
+
+    def next_id(self) -> int:
+        return next(self._sequence)
+
+    def add(self, profile: RequestProfile):
+        if self._profiles.maxlen:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def query(
+        self,
+        path: Optional[str] = None,
+        min_duration_ms: Optional[float] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """按路径和最小耗时过滤，从新到旧返回摘要"""
+        matched = []
+        for profile in reversed(self._profiles):
+            if path is not None and profile.path != path:
+                continue
+            if min_duration_ms is not None and (profile.duration or 0) * 1000 < min_duration_ms:
+                continue
+            matched.append(profile.summary())
+            if len(matched) >= limit:
+                break
+        return matched
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is not None:
+        starts = conn.info.get("profile_query_start")
+        if starts:
+            started = starts.pop()
+            profile.record_statement(statement[:STATEMENT_MAX_LENGTH], started, time.perf_counter() - started)
+
+
+def install_sql_hooks(*engines):
+    """在同步引擎（异步引擎传 async_engine.sync_engine）上注册 SQL 计时钩子，每个引擎只注册一次"""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfilingMiddleware:
+    """
+    请求剖析中间件（纯 ASGI）
+    token 为空时不接受请求头开启；sample_rate 为随机抽样的比例（0 表示不抽样）
+    """
+
+    def __init__(
+        self,
+        app,
+        buffer: ProfileBuffer,
+        token: str = "",
+        sample_rate: float = 0.0,
+        slow_statements: int = 5,
+        stack_interval: float = 0.005,
+        sampler: Callable[[], float] = random.random
+    ):
+        self.app = app
+        self._buffer = buffer
+        self._token = token.encode("latin-1")
+        self._sample_rate = sample_rate
+        self._slow_statements = slow_statements
+        self._stack_interval = stack_interval
+        self._sampler = sampler
+
+    def _selected(self, scope) -> Optional[str]:
+        """返回开启剖析的原因：stack（请求头，采样调用栈）、header（请求头）、sample（抽样），不开启时返回 None"""
+        if self._token:
+            token = mode = None
+            for name, value in scope["headers"]:
+                if name == b"x-profile-token":
+                    token = value
+                elif name == b"x-profile":
+                    mode = value
+            if token == self._token:
+                return "stack" if mode == b"stack" else "header"
+        if self._sample_rate > 0 and self._sampler() < self._sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reason = self._selected(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            self._buffer.next_id(), scope["method"], scope["path"],
+            "header" if reason == "stack" else reason, self._slow_statements
+        )
+        if reason == "stack":
+            profile.sampler = StackSampler(threading.get_ident(), self._stack_interval)
+            profile.sampler.start()
+        status = None
+
+        async def send_with_profile(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", str(profile.id).encode("latin-1")),
+                    (b"server-timing", profile.server_timing().encode("latin-1")),
+                ]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current_profile.reset(token)
+            profile.finish(status if status is not None else 500)
+            self._buffer.add(profile)
@@ -0,0 +1,292 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, not_, select, delete, exists, func, MetaData, column, table
+from sqlalchemy.engine import Connection
+
+from database import (
+    AsyncSessionLocal,
+    async_engine,
+    Alert,
+    NotificationOutbox,
+    AlertRollup,
+    AlertBody,
+    beijing_now_naive,
+    OUTBOX_SENT,
+    OUTBOX_DEAD
+)
+from metrics import RETENTION_ROWS_DELETED
+from partitions import DEFAULT_PARTITION, is_partitioned, list_partitions, ensure_partitions, drop_partitions_before
+
+logger = logging.getLogger(__name__)
+
+
+def _om_type_counts(rows) -> Dict[str, int]:
+    """把 (om_type, 数量) 汇总为 告警触发 / 告警恢复 / 其他 三类"""
+    counts = {"告警触发": 0, "告警恢复": 0, "其他": 0}
+    for om_type, count in rows:
+        key = om_type if om_type in ("告警触发", "告警恢复") else "其他"
+        counts[key] += count
+    return counts
+
+
+def _drop_expired_partitions(conn: Connection, before: datetime) -> Tuple[List[str], Dict[str, int]]:
+    """在同一事务中统计并删除日期早于 before 的按天分区，返回删除的分区名和这些分区中按 om_type 统计的记录数"""
+    rows = []
+    for day, name in list_partitions(conn).items():
+        if day < before:
+            partition = table(name, column("om_type"))
+            rows.extend(conn.execute(
+                select(partition.c.om_type, func.count()).group_by(partition.c.om_type)
+            ).all())
+    return drop_partitions_before(conn, before), _om_type_counts(rows)
+
+
+class RetentionEngine:
+    """
+    数据保留清理器
+
+    保留规则与原来的每日删除相同：删除今天 00:00 之前的记录，但保留前一天最后 grace_minutes 分钟内
+    未处理且未超时的记录（这些"告警触发"可能仍在等待告警恢复），它们在第二天被删除。
+    不再在 00:00:05 一次性删除：每隔 interval 秒运行一次，按主键 id 区间分块删除，
+    每块一个短事务，块之间让出事件循环；每次运行最多删除 max_rows_per_run 条，剩余的留给下一次运行。
+    已投递（sent）和已放弃（dead）的发件箱记录按同样的时间边界分块清理；
+    统计汇总（alert_rollups）保留 rollup_retention_days 天，比告警本身保留得更久；
+    消息内容（alert_bodies）在今天 00:00 之前最后一次被引用、且已没有告警引用时回收。
+    删除告警后调用 on_alerts_deleted(cutoff)，cutoff 之前的告警可能已被删除（用于失效查询缓存）。
+
+    PostgreSQL 上 alerts 为按天分区表时，每次运行先提前创建未来 partition_days_ahead 天的分区，
+    再整体删除（DROP）已全部过期的分区：某一天的分区在次日保留窗口结束后才全部可删，
+    所以分区模式下前一天的记录会多保留一天，换来没有行级删除和表膨胀；
+    只有 DEFAULT 分区中的记录按上面的规则分块删除。
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        max_rows_per_run: int = 50000,
+        interval: float = 300.0,
+        grace_minutes: float = 25.0,
+        chunk_pause: float = 0.0,
+        partition_days_ahead: int = 7,
+        rollup_retention_days: int = 30,
+        on_alerts_deleted: Optional[Callable[[datetime], None]] = None,
+        clock: Callable[[], datetime] = beijing_now_naive
+    ):
+        self._chunk_size = chunk_size
+        self._max_rows_per_run = max_rows_per_run
+        self._interval = interval
+        self._grace = timedelta(minutes=grace_minutes)
+        self._chunk_pause = chunk_pause
+        self._partition_days_ahead = partition_days_ahead
+        self._rollup_retention_days = rollup_retention_days
+        self._on_alerts_deleted = on_alerts_deleted
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动清理协程"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止清理协程（正在执行的分块事务会被回滚，下次运行继续）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def cutoffs(self, now: datetime) -> Tuple[datetime, datetime]:
+        """返回 (今天 00:00, 前一天保留窗口的开始时间)，均为不带时区的北京时间"""
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return today_start, today_start - self._grace
+
+    def alert_conditions(self, now: datetime, table=Alert.__table__):
+        """返回 (可删除条件, 保留条件)；table 可以是 alerts 表或其 DEFAULT 分区"""
+        today_start, grace_start = self.cutoffs(now)
+        kept = and_(
+            table.c.time >= grace_start,
+            table.c.time < today_start,
+            table.c.timeout_triggered == False,
+            table.c.processed == False
+        )
+        return and_(table.c.time < today_start, not_(kept)), kept
+
+    async def count_by_om_type(self, condition) -> Dict[str, int]:
+        """用 GROUP BY 按 om_type 统计满足条件的记录数"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Alert.om_type, func.count()).where(condition).group_by(Alert.om_type)
+            )).all()
+        return _om_type_counts(rows)
+
+    async def run_once(self) -> int:
+        """执行一次清理，返回本次删除的告警数量（包括整体删除的分区中的记录）"""
+        async with async_engine.connect() as conn:
+            partitioned = await conn.run_sync(is_partitioned)
+        if partitioned:
+            dropped_count, deleted_count = await self._run_partitioned()
+        else:
+            dropped_count, deleted_count = 0, await self._run_rows()
+        # 每次运行的行数上限只计算按行删除的记录，整体删除的分区不占用
+        outbox_deleted = await self._purge_outbox(self._max_rows_per_run - deleted_count)
+        rollup_deleted = await self._purge_rollups(self._max_rows_per_run - deleted_count - outbox_deleted)
+        await self._purge_bodies(self._max_rows_per_run - deleted_count - outbox_deleted - rollup_deleted)
+        return dropped_count + deleted_count
+
+    async def _run_rows(self) -> int:
+        now = self._clock()
+        today_start, grace_start = self.cutoffs(now)
+        deletable, kept = self.alert_conditions(now)
+
+        to_delete_by_type = await self.count_by_om_type(deletable)
+        backlog = sum(to_delete_by_type.values())
+        deleted_count = 0
+        if backlog:
+            logger.info(f"[数据清理] 开始清理: 删除时间范围 < {today_start.strftime('%Y-%m-%d %H:%M:%S')}, "
+                        f"保留窗口 {grace_start.strftime('%Y-%m-%d %H:%M:%S')} ~ "
+                        f"{today_start.strftime('%Y-%m-%d %H:%M:%S')}（未处理且未超时）")
+            logger.info(f"[数据清理] 待删除记录 {backlog} 个 - 告警触发: {to_delete_by_type['告警触发']}, "
+                        f"告警恢复: {to_delete_by_type['告警恢复']}, 其他: {to_delete_by_type['其他']}")
+            deleted_count = await self._delete_in_chunks(Alert.__table__, deletable, self._max_rows_per_run)
+            self._notify_deleted(deleted_count, today_start)
+
+            kept_by_type = await self.count_by_om_type(kept)
+            logger.info(f"[数据清理] ✅ 本次删除 {deleted_count} 个，剩余待删除 {max(backlog - deleted_count, 0)} 个")
+            logger.info(f"[数据清理] 保留记录 {sum(kept_by_type.values())} 个 - 告警触发: {kept_by_type['告警触发']}, "
+                        f"告警恢复: {kept_by_type['告警恢复']}, 其他: {kept_by_type['其他']}")
+        return deleted_count
+
+    async def _run_partitioned(self) -> Tuple[int, int]:
+        """返回 (整体删除的分区中的记录数, DEFAULT 分区中按行删除的记录数)"""
+        now = self._clock()
+        today = now.date()
+        _, grace_start = self.cutoffs(now)
+        # 分区 [D, D+1) 的上界不晚于保留窗口开始时间时，整个分区都可以删除
+        drop_before = grace_start.date()
+
+        async with async_engine.begin() as conn:
+            created = await conn.run_sync(
+                ensure_partitions, today, today + timedelta(days=self._partition_days_ahead)
+            )
+        if created:
+            logger.info(f"[数据清理] 已提前创建分区: {created}")
+
+        async with async_engine.begin() as conn:
+            dropped, dropped_by_type = await conn.run_sync(_drop_expired_partitions, drop_before)
+        dropped_count = sum(dropped_by_type.values())
+        self._notify_deleted(dropped_count, datetime.combine(drop_before, datetime.min.time()))
+        if dropped:
+            RETENTION_ROWS_DELETED.labels(Alert.__tablename__).inc(dropped_count)
+            logger.info(f"[数据清理] ✅ 已删除过期分区 {dropped}，共 {dropped_count} 个记录 - "
+                        f"告警触发: {dropped_by_type['告警触发']}, 告警恢复: {dropped_by_type['告警恢复']}, "
+                        f"其他: {dropped_by_type['其他']}")
+
+        # DEFAULT 分区中不属于任何按天分区的记录仍按行分块删除
+        default_table = Alert.__table__.to_metadata(MetaData(), name=DEFAULT_PARTITION)
+        deletable, _ = self.alert_conditions(now, default_table)
+        deleted_count = await self._delete_in_chunks(default_table, deletable, self._max_rows_per_run)
+        self._notify_deleted(deleted_count, self.cutoffs(now)[0])
+        if deleted_count:
+            logger.info(f"[数据清理] ✅ 删除 DEFAULT 分区中的过期记录 {deleted_count} 个")
+        return dropped_count, deleted_count
+
+    def _notify_deleted(self, deleted: int, cutoff: datetime):
+        if deleted and self._on_alerts_deleted is not None:
+            self._on_alerts_deleted(cutoff)
+
+    async def _purge_outbox(self, budget: int) -> int:
+        if budget <= 0:
+            return 0
+        today_start, _ = self.cutoffs(self._clock())
+        outbox_deleted = await self._delete_in_chunks(
+            NotificationOutbox.__table__,
+            and_(
+                NotificationOutbox.status.in_([OUTBOX_SENT, OUTBOX_DEAD]),
+                NotificationOutbox.created_at < today_start
+            ),
+            budget
+        )
+        if outbox_deleted:
+            logger.info(f"[数据清理] ✅ 删除已完成的发件箱记录 {outbox_deleted} 个")
+        return outbox_deleted
+
+    async def _purge_rollups(self, budget: int) -> int:
+        if budget <= 0 or self._rollup_retention_days <= 0:
+            return 0
+        today_start, _ = self.cutoffs(self._clock())
+        rollup_deleted = await self._delete_in_chunks(
+            AlertRollup.__table__,
+            AlertRollup.bucket_start < today_start - timedelta(days=self._rollup_retention_days),
+            budget
+        )
+        if rollup_deleted:
+            logger.info(f"[数据清理] ✅ 删除 {self._rollup_retention_days} 天前的统计汇总 {rollup_deleted} 行")
+        return rollup_deleted
+
+    async def _purge_bodies(self, budget: int) -> int:
+        if budget <= 0:
+            return 0
+        today_start, _ = self.cutoffs(self._clock())
+        # 接收告警时 upsert 会更新 last_used_at：与删除并发时，删除条件在更新后的行上重新判断，不会删掉刚被引用的消息
+        body_deleted = await self._delete_in_chunks(
+            AlertBody.__table__,
+            and_(
+                AlertBody.last_used_at < today_start,
+                ~exists().where(Alert.body_hash == AlertBody.hash)
+            ),
+            budget
+        )
+        if body_deleted:
+            logger.info(f"[数据清理] ✅ 回收不再被引用的消息内容 {body_deleted} 份")
+        return body_deleted
+
+    async def _delete_in_chunks(self, table, condition, budget: int) -> int:
+        """
+        按 id 区间分块删除满足条件的记录，每块一个事务；
+        每块最多删除 min(chunk_size, 剩余额度) 条，一次运行删除的总数不超过 budget
+        """
+        async with AsyncSessionLocal() as db:
+            low, high = (await db.execute(
+                select(func.min(table.c.id), func.max(table.c.id)).where(condition)
+            )).one()
+        if low is None:
+            return 0
+
+        deleted = 0
+        # DEFAULT 分区的删除也计入 alerts
+        rows_deleted = RETENTION_ROWS_DELETED.labels(table.name if table.name != DEFAULT_PARTITION else Alert.__tablename__)
+        while low <= high and deleted < budget:
+            upper = low + self._chunk_size
+            chunk_ids = (
+                select(table.c.id)
+                .where(and_(table.c.id >= low, table.c.id < upper, condition))
+                .order_by(table.c.id)
+                .limit(min(self._chunk_size, budget - deleted))
+            )
+            async with AsyncSessionLocal() as db:
+                chunk_deleted = (await db.execute(
+                    delete(table).where(table.c.id.in_(chunk_ids))
+                )).rowcount
+                await db.commit()
+            deleted += chunk_deleted
+            rows_deleted.inc(chunk_deleted)
+            low = upper
+            # 让出事件循环，接口请求和超时检查不会被长时间的清理阻塞
+            await asyncio.sleep(self._chunk_pause)
+        return deleted
+
+    async def _run(self):
+        logger.info(f"[数据清理] 清理任务已启动：每 {self._interval:g} 秒运行一次，"
+                    f"每次最多删除 {self._max_rows_per_run} 条，每块 {self._chunk_size} 个 id")
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"[数据清理] ❌ 清理旧数据时出错: {str(e)}", exc_info=True)
+            await asyncio.sleep(self._interval)
@@ -0,0 +1,193 @@
+"""
+告警统计汇总（alert_rollups）的增量更新和重建
+
+增量更新：apply_rollup_increments() 在调用方的事务中执行，与告警写入 / 超时标记一起提交或回滚。
+重建：rebuild_rollups() 用一条 INSERT ... SELECT ... GROUP BY 从 alerts 表批量重新计算，不逐行读取告警，
+可以在迁移中调用，也可以在命令行执行：
+
+    python rollups.py rebuild [--start "2026-01-01 00:00:00"] [--end "2026-01-02 00:00:00"]
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, and_, case, delete, func, insert, literal, literal_column, select, true
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Alert, AlertRollup, beijing_now_naive, dialect_insert
+
+
+ROLLUP_BUCKET_SECONDS = 300  # 时间桶大小：5 分钟
+COUNTER_COLUMNS = ("alert_count", "trigger_count", "recovery_count", "timeout_count")
+
+RollupKey = Tuple[datetime, str, str, str]
+
+
+def bucket_start(alert_time: datetime) -> datetime:
+    """告警时间向下取整到 5 分钟时间桶"""
+    return alert_time.replace(
+        minute=alert_time.minute - alert_time.minute % (ROLLUP_BUCKET_SECONDS // 60),
+        second=0,
+        microsecond=0
+    )
+
+
+def rollup_key(alert_time: datetime, enterprise_name: str, om_type: str, alert_type: str) -> RollupKey:
+    """告警所属的汇总行（时间桶, 企业, OM 类型, 告警类型）"""
+    return bucket_start(alert_time), enterprise_name or "", om_type or "", alert_type or ""
+
+
+def received_increments(alerts: Iterable[tuple]) -> List[dict]:
+    """
+    新接收告警的计数增量，alerts 为 (告警时间, 企业名称, OM 类型, 告警类型)
+    同一汇总行合并为一条
+    """
+    increments: Dict[RollupKey, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for alert_time, enterprise_name, om_type, alert_type in alerts:
+        counters = increments[rollup_key(alert_time, enterprise_name, om_type, alert_type)]
+        counters["alert_count"] += 1
+        if om_type == "告警触发":
+            counters["trigger_count"] += 1
+        elif om_type == "告警恢复":
+            counters["recovery_count"] += 1
+    return _to_rows(increments)
+
+
+def timeout_increments(alerts: Iterable[tuple]) -> List[dict]:
+    """
+    超时"告警触发"的计数增量，alerts 为 (告警时间, 企业名称, 告警类型)
+    计入告警时间所在的时间桶
+    """
+    increments: Dict[RollupKey, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for alert_time, enterprise_name, alert_type in alerts:
+        increments[rollup_key(alert_time, enterprise_name, "告警触发", alert_type)]["timeout_count"] += 1
+    return _to_rows(increments)
+
+
+def _to_rows(increments: Dict[RollupKey, Dict[str, int]]) -> List[dict]:
+    # 按汇总行排序，并发事务以相同顺序加锁，避免死锁
+    now = beijing_now_naive()
+    return [
+        {
+            "bucket_start": key[0],
+            "enterprise_name": key[1],
+            "om_type": key[2],
+            "alert_type": key[3],
+            **counters,
+            "updated_at": now
+        }
+        for key, counters in sorted(increments.items())
+    ]
+
+
+async def apply_rollup_increments(db: AsyncSession, rows: List[dict]):
+    """在当前事务中 upsert 汇总行：不存在则插入，存在则累加计数"""
+    if not rows:
+        return
+    stmt = dialect_insert(AlertRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket_start", "enterprise_name", "om_type", "alert_type"],
+        set_={
+            **{column: getattr(AlertRollup, column) + getattr(stmt.excluded, column) for column in COUNTER_COLUMNS},
+            "updated_at": stmt.excluded.updated_at
+        }
+    )
+    await db.execute(stmt, rows)
+
+
+def bucket_expression(conn: Connection):
+    """SQL 中把 alerts.time 向下取整到时间桶的表达式（与 bucket_start() 结果一致）"""
+    if conn.dialect.name == "postgresql":
+        return literal_column(
+            f"timestamp 'epoch' + floor(extract(epoch from alerts.time) / {ROLLUP_BUCKET_SECONDS}) "
+            f"* {ROLLUP_BUCKET_SECONDS} * interval '1 second'",
+            DateTime
+        )
+    # SQLite 中 DateTime 以 'YYYY-MM-DD HH:MM:SS.ffffff' 文本存储，输出格式需要一致，唯一约束才能生效
+    return literal_column(
+        f"strftime('%Y-%m-%d %H:%M:%S.000000', "
+        f"CAST(strftime('%s', alerts.time) AS INTEGER) / {ROLLUP_BUCKET_SECONDS} * {ROLLUP_BUCKET_SECONDS}, "
+        f"'unixepoch')",
+        DateTime
+    )
+
+
+def rebuild_rollups(
+    conn: Connection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    full: bool = False
+) -> int:
+    """
+    从 alerts 表批量重建 [start, end) 范围内的汇总行，返回重建的汇总行数
+    start 向下、end 向上对齐到时间桶；范围外的汇总行（包括 alerts 中已被清理的历史数据）保持不变
+    未指定 start / end 时取 alerts 中最早 / 最晚的告警时间，不会删除已被清理的告警对应的历史汇总；
+    full=True 时不限制范围，先清空整个汇总表（只用于新建汇总表的迁移）
+    """
+    if not full and (start is None or end is None):
+        earliest, latest = conn.execute(select(func.min(Alert.time), func.max(Alert.time))).one()
+        if earliest is None:
+            return 0
+        start = start if start is not None else earliest
+        end = end if end is not None else bucket_start(latest) + timedelta(seconds=ROLLUP_BUCKET_SECONDS)
+
+    alert_conditions = [Alert.time.isnot(None)]
+    rollup_conditions = []
+    if start is not None:
+        start = bucket_start(start)
+        alert_conditions.append(Alert.time >= start)
+        rollup_conditions.append(AlertRollup.bucket_start >= start)
+    if end is not None:
+        if bucket_start(end) != end:
+            end = bucket_start(end) + timedelta(seconds=ROLLUP_BUCKET_SECONDS)
+        alert_conditions.append(Alert.time < end)
+        rollup_conditions.append(AlertRollup.bucket_start < end)
+
+    conn.execute(delete(AlertRollup).where(and_(true(), *rollup_conditions)))
+
+    bucket = bucket_expression(conn)
+    enterprise_name = func.coalesce(Alert.enterprise_name, "")
+    om_type = func.coalesce(Alert.om_type, "")
+    alert_type = func.coalesce(Alert.alert_type, "")
+    is_trigger = Alert.om_type == "告警触发"
+    aggregated = (
+        select(
+            bucket,
+            enterprise_name,
+            om_type,
+            alert_type,
+            func.count(),
+            func.sum(case((is_trigger, 1), else_=0)),
+            func.sum(case((Alert.om_type == "告警恢复", 1), else_=0)),
+            func.sum(case((and_(is_trigger, Alert.timeout_triggered == True), 1), else_=0)),
+            literal(beijing_now_naive(), DateTime)
+        )
+        .where(*alert_conditions)
+        .group_by(bucket, enterprise_name, om_type, alert_type)
+    )
+    return conn.execute(insert(AlertRollup).from_select(
+        ["bucket_start", "enterprise_name", "om_type", "alert_type", *COUNTER_COLUMNS, "updated_at"],
+        aggregated
+    )).rowcount
+
+
+if __name__ == "__main__":
+    from database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="告警统计汇总表维护")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="从 alerts 表批量重建统计汇总")
+    rebuild_parser.add_argument("--start", help="开始时间（北京时间），例如 2026-01-01 00:00:00")
+    rebuild_parser.add_argument("--end", help="结束时间（北京时间，不包含）")
+    args = parser.parse_args()
+
+    init_db()
+    start_time = datetime.fromisoformat(args.start) if args.start else None
+    end_time = datetime.fromisoformat(args.end) if args.end else None
+    begin = beijing_now_naive()
+    with engine.begin() as connection:
+        count = rebuild_rollups(connection, start_time, end_time)
+    seconds = (beijing_now_naive() - begin).total_seconds()
+    print(f"已重建统计汇总 {count} 行（时间范围: {args.start or '最早'} ~ {args.end or '最新'}，耗时 {seconds:.2f} 秒）")
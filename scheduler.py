@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+from database import beijing_now_naive
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """
+    超时截止时间调度器
+
+    用最小堆保存所有待检查告警的 (deadline, alert_id)，由单个协程驱动：
+    只在最近的截止时间到达时唤醒，到期的告警按批交给 fire 回调处理。
+    截止时间使用不带时区的北京时间，与数据库中的 time 字段一致。
+    被告警恢复处理的告警用 cancel() 取消：只从待检查集合中移除，堆中的条目在到期时丢弃，
+    已取消的条目远多于待检查的条目时整理一次堆。len() 为仍在等待的告警数量。
+    """
+
+    def __init__(
+        self,
+        fire: Callable[[List[int]], Awaitable[None]],
+        batch_size: int = 100,
+        clock: Callable[[], datetime] = beijing_now_naive
+    ):
+        self._fire = fire
+        self._batch_size = batch_size
+        self._clock = clock
+        self._heap: List[Tuple[datetime, int]] = []
+        self._scheduled: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def schedule(self, alert_id: int, deadline: datetime):
+        """登记告警的截止时间；如果比当前最早的截止时间更早，唤醒调度协程重新计算等待时间"""
+        if alert_id in self._scheduled:
+            return
+        heapq.heappush(self._heap, (deadline, alert_id))
+        self._scheduled.add(alert_id)
+        if self._heap[0][1] == alert_id:
+            self._wakeup.set()
+
+    def cancel(self, alert_ids: Iterable[int]) -> int:
+        """取消告警的截止时间（已被告警恢复处理），返回取消的数量"""
+        cancelled = 0
+        for alert_id in alert_ids:
+            if alert_id in self._scheduled:
+                self._scheduled.discard(alert_id)
+                cancelled += 1
+        if cancelled and len(self._heap) > 2 * len(self._scheduled) + 1000:
+            self._heap = [entry for entry in self._heap if entry[1] in self._scheduled]
+            heapq.heapify(self._heap)
+        return cancelled
+
+    def rebuild(self, entries: Iterable[Tuple[int, datetime]]):
+        """用 (alert_id, deadline) 列表整体重建堆（启动时从数据库一次性加载）"""
+        self._heap = [(deadline, alert_id) for alert_id, deadline in entries]
+        heapq.heapify(self._heap)
+        self._scheduled = {alert_id for _, alert_id in self._heap}
+        self._wakeup.set()
+
+    def start(self):
+        """启动调度协程（在当前事件循环中创建唤醒事件）"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止调度协程"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self._batch_size:
+            _, alert_id = heapq.heappop(self._heap)
+            if alert_id not in self._scheduled:
+                continue  # 已取消
+            self._scheduled.discard(alert_id)
+            due.append(alert_id)
+        return due
+
+    async def _run(self):
+        logger.info(f"[超时调度] 调度器已启动，待检查告警 {len(self)} 个，批量大小 {self._batch_size}")
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = (self._heap[0][0] - self._clock()).total_seconds()
+            if delay > 0:
+                # 等到最近的截止时间，或者有更早的截止时间加入
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(self._clock())
+            if not due:
+                continue
+            try:
+                await self._fire(due)
+            except Exception as e:
+                logger.error(f"[超时调度] ❌ 处理到期告警时出错: {str(e)}", exc_info=True)
@@ -0,0 +1,44 @@
+"""
+测试使用临时目录中的 SQLite 数据库（aiosqlite），在导入 main 之前设置环境变量；
+导入 main 时切换到临时目录，app.log 也写在那里。异步测试使用 anyio 的 pytest 插件（asyncio 后端），每个测试前重建所有表
+"""
+import os
+import tempfile
+
+import httpx
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix="alert-data-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["DIFY_WEBHOOK_URL_TIMEOUT"] = "http://127.0.0.1:9/v1/workflows/run"  # 只写入发件箱，测试中不发送
+os.environ["ALERT_BODY_STORE_ENABLED"] = "false"
+
+_cwd = os.getcwd()
+os.chdir(_workdir)
+try:
+    import main
+finally:
+    os.chdir(_cwd)
+from database import Base, engine, async_engine
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database(anyio_backend):
+    """重建所有表并清空查询缓存；测试结束后关闭连接池（每个测试使用新的事件循环）"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    main.query_cache.clear()
+    yield engine
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def client(database):
+    """通过 ASGI 直接调用应用的 HTTP 客户端（不启动后台任务）"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,114 @@
+"""接收告警的幂等：单条和批量接口重放同一条告警时不重复写入，返回原记录"""
+import pytest
+from sqlalchemy import func, select
+
+from database import Alert
+
+pytestmark = pytest.mark.anyio
+
+
+def alert(alert_key="k1", om_type="告警触发", time="2026-10-17 10:00:00", **overrides):
+    return {
+        "input": f"🔴 **【{om_type}】监控告警**",
+        "enterprise_name": "E",
+        "time": time,
+        "alert_type": om_type,
+        "template_name": "T",
+        "om_type": om_type,
+        "alert_key": alert_key,
+        **overrides,
+    }
+
+
+def alert_count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Alert)).scalar()
+
+
+async def test_single_replay_returns_original(client, database):
+    first = await client.post("/api/alert", json=alert())
+    replay = await client.post("/api/alert", json=alert())
+
+    assert first.status_code == 200 and replay.status_code == 200
+    assert "Idempotent-Replay" not in first.headers
+    assert replay.headers["Idempotent-Replay"] == "true"
+    assert replay.json()["id"] == first.json()["id"]
+    assert alert_count(database) == 1
+
+
+async def test_single_idempotency_key_header(client, database):
+    first = await client.post("/api/alert", json=alert(), headers={"Idempotency-Key": "req-1"})
+    # 同一个 Idempotency-Key 即使内容不同也视为重放
+    replay = await client.post("/api/alert", json=alert(input="重试时内容变化"), headers={"Idempotency-Key": "req-1"})
+    other = await client.post("/api/alert", json=alert(), headers={"Idempotency-Key": "req-2"})
+
+    assert replay.headers["Idempotent-Replay"] == "true"
+    assert replay.json()["id"] == first.json()["id"]
+    assert "Idempotent-Replay" not in other.headers
+    assert other.json()["id"] != first.json()["id"]
+    assert alert_count(database) == 2
+
+
+async def test_different_time_is_not_a_replay(client, database):
+    first = await client.post("/api/alert", json=alert())
+    later = await client.post("/api/alert", json=alert(time="2026-10-17 10:05:00"))
+
+    assert "Idempotent-Replay" not in later.headers
+    assert later.json()["id"] != first.json()["id"]
+    assert alert_count(database) == 2
+
+
+async def test_batch_internal_duplicates(client, database):
+    response = await client.post("/api/alerts/batch", json=[alert("k1"), alert("k1"), alert("k2")])
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 3
+    assert body["duplicates"] == 1
+    statuses = [item["status"] for item in body["items"]]
+    assert statuses == ["pending", "duplicate", "pending"]
+    ids = [item["id"] for item in body["items"]]
+    assert ids[0] == ids[1] != ids[2]
+    assert alert_count(database) == 2
+
+
+async def test_batch_replay_of_existing_alerts(client, database):
+    single = await client.post("/api/alert", json=alert("k1"))
+    first = await client.post("/api/alerts/batch", json=[alert("k1"), alert("k2")])
+    replay = await client.post("/api/alerts/batch", json=[alert("k2"), alert("k1")])
+
+    first_items = first.json()["items"]
+    assert first_items[0] == {"index": 0, "id": single.json()["id"], "status": "duplicate"}
+    assert first_items[1]["status"] == "pending"
+    assert replay.json()["duplicates"] == 2
+    assert [item["id"] for item in replay.json()["items"]] == [first_items[1]["id"], single.json()["id"]]
+    assert alert_count(database) == 2
+
+
+async def test_batch_replayed_recovery_does_not_resolve_again(client, database):
+    trigger = await client.post("/api/alert", json=alert("k1"))
+    recovery = alert("k1", om_type="告警恢复", time="2026-10-17 10:03:00")
+    first = await client.post("/api/alerts/batch", json=[recovery])
+    replay = await client.post("/api/alerts/batch", json=[recovery])
+
+    assert first.json()["resolved_triggers"] == 1
+    assert replay.json()["resolved_triggers"] == 0
+    assert replay.json()["items"][0]["status"] == "duplicate"
+    assert (await client.get(f"/api/alerts/{trigger.json()['id']}")).json()["processed"] is True
+
+
+async def test_batch_idempotency_key_header(client, database):
+    batch = [alert("k1"), alert("k2")]
+    first = await client.post("/api/alerts/batch", json=batch, headers={"Idempotency-Key": "batch-1"})
+    # 用同一个 Idempotency-Key 重试整批：即使内容有变化，也逐条返回原记录
+    retried = [alert("k1", input="重试时内容变化"), alert("k2")]
+    replay = await client.post("/api/alerts/batch", json=retried, headers={"Idempotency-Key": "batch-1"})
+    other = await client.post("/api/alerts/batch", json=batch, headers={"Idempotency-Key": "batch-2"})
+
+    first_ids = [item["id"] for item in first.json()["items"]]
+    assert [item["status"] for item in first.json()["items"]] == ["pending", "pending"]
+    assert replay.json()["duplicates"] == 2
+    assert [item["id"] for item in replay.json()["items"]] == first_ids
+    assert other.json()["duplicates"] == 0
+    assert not set(item["id"] for item in other.json()["items"]) & set(first_ids)
+    assert alert_count(database) == 4
@@ -0,0 +1,113 @@
+"""游标分页：按 (time DESC, id) 翻页，同一时间的多条告警、整页边界、过滤条件和无效游标"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+import main
+from database import Alert
+
+pytestmark = pytest.mark.anyio
+
+BASE_TIME = datetime(2026, 10, 17, 10, 0, 0)
+
+
+def add_alerts(engine, minutes, enterprise_name="E"):
+    """
+    按给定的分钟偏移写入告警（相同的偏移即相同的告警时间），返回 [(time, id)]
+    直接写入数据库不经过接口，需要清空查询缓存
+    """
+    with engine.begin() as conn:
+        rows = conn.execute(
+            insert(Alert).returning(Alert.time, Alert.id),
+            [
+                {
+                    "input": "x",
+                    "enterprise_name": enterprise_name,
+                    "time": BASE_TIME + timedelta(minutes=minute),
+                    "alert_type": "告警触发",
+                    "template_name": "T",
+                    "om_type": "告警触发",
+                    "alert_key": f"{enterprise_name}-{index}",
+                    "idempotency_key": f"{enterprise_name}-{index}",
+                    "processed": False,
+                    "timeout_triggered": False,
+                }
+                for index, minute in enumerate(minutes)
+            ]
+        ).all()
+    main.query_cache.clear()
+    return [(row.time, row.id) for row in rows]
+
+
+async def fetch_pages(client, limit, **params):
+    """从第一页翻到最后一页，返回每一页的 (时间, id) 列表"""
+    pages = []
+    cursor = ""
+    while cursor is not None:
+        response = await client.get("/api/alerts", params={"after": cursor, "limit": limit, **params})
+        assert response.status_code == 200
+        body = response.json()
+        pages.append([(datetime.fromisoformat(item["time"]), item["id"]) for item in body["items"]])
+        cursor = body["next_cursor"]
+        assert len(pages) <= 20
+    return pages
+
+
+def expected_order(rows):
+    return sorted(rows, key=lambda row: (-row[0].timestamp(), row[1]))
+
+
+async def test_pages_cover_every_alert_once_with_ties(client, database):
+    # 多个告警时间相同，页边界落在同一时间的告警中间
+    rows = add_alerts(database, [0, 5, 5, 5, 5, 3, 3, 1])
+
+    pages = await fetch_pages(client, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert [row for page in pages for row in page] == expected_order(rows)
+
+
+async def test_exact_multiple_of_limit_has_no_empty_last_page(client, database):
+    rows = add_alerts(database, [0, 1, 2, 3])
+
+    pages = await fetch_pages(client, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2]
+    assert [row for page in pages for row in page] == expected_order(rows)
+
+
+async def test_single_page_and_empty_result(client, database):
+    response = await client.get("/api/alerts", params={"after": "", "limit": 5})
+    assert response.json() == {"items": [], "next_cursor": None}
+
+    add_alerts(database, [0, 1])
+    body = (await client.get("/api/alerts", params={"after": "", "limit": 5})).json()
+    assert len(body["items"]) == 2
+    assert body["next_cursor"] is None
+
+
+async def test_cursor_with_filter(client, database):
+    rows = add_alerts(database, [0, 2, 2, 4], enterprise_name="A")
+    add_alerts(database, [1, 2, 3], enterprise_name="B")
+
+    pages = await fetch_pages(client, limit=3, enterprise_name="A")
+
+    assert [row for page in pages for row in page] == expected_order(rows)
+
+
+async def test_alerts_written_after_the_cursor_do_not_shift_pages(client, database):
+    rows = add_alerts(database, [0, 1, 2, 3])
+    first = (await client.get("/api/alerts", params={"after": "", "limit": 2})).json()
+
+    # 新告警时间更晚，排在第一页之前，不影响后续页
+    add_alerts(database, [10], enterprise_name="N")
+    second = (await client.get("/api/alerts", params={"after": first["next_cursor"], "limit": 2})).json()
+
+    assert [item["id"] for item in second["items"]] == [row[1] for row in expected_order(rows)[2:]]
+    assert second["next_cursor"] is None
+
+
+async def test_invalid_cursor(client, database):
+    response = await client.get("/api/alerts", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
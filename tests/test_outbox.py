@@ -0,0 +1,157 @@
+"""发件箱投递器：成功、失败重试（指数退避）、达到最大次数后放弃，以及租约到期后被重新领取的记录不被覆盖"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select, update
+
+from database import NotificationOutbox, OUTBOX_DEAD, OUTBOX_PENDING, OUTBOX_SENT
+from outbox import OutboxWorker
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 10, 17, 10, 0, 0)
+
+
+class Clock:
+    def __init__(self, now: datetime = START):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+class Sender:
+    """记录每次发送的告警 ID；failures 为还要失败的次数"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = []
+
+    async def __call__(self, alert_ids, inputs):
+        self.calls.append(list(alert_ids))
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Dify 不可用")
+
+
+def add_entries(engine, count: int = 1):
+    with engine.begin() as conn:
+        conn.execute(insert(NotificationOutbox), [
+            {
+                "alert_id": index + 1,
+                "enterprise_name": "E",
+                "payload": json.dumps({"input": f"告警 {index + 1}"}, ensure_ascii=False),
+                "status": OUTBOX_PENDING,
+                "attempts": 0,
+                "next_attempt_at": START,
+            }
+            for index in range(count)
+        ])
+
+
+def entries(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(NotificationOutbox).order_by(NotificationOutbox.id)).all()
+
+
+def worker(send, clock, **options):
+    options.setdefault("max_attempts", 3)
+    return OutboxWorker(send, backoff_base=10, backoff_max=25, lease_seconds=60, clock=clock, **options)
+
+
+def test_backoff_doubles_up_to_max():
+    outbox = worker(Sender(), Clock())
+    assert [outbox.backoff(attempts) for attempts in (1, 2, 3, 4)] == [10, 20, 25, 25]
+
+
+def test_lease_covers_a_full_batch():
+    outbox = OutboxWorker(Sender(), batch_size=100, concurrency=10, lease_seconds=120, send_timeout=30)
+    assert outbox.minimum_lease_seconds() == 330
+    assert outbox._lease_seconds == 330
+
+
+async def test_success_marks_sent(database):
+    add_entries(database, 2)
+    send, clock = Sender(), Clock()
+
+    assert await worker(send, clock).drain_once() == 2
+
+    assert sorted(send.calls) == [[1], [2]]
+    for entry in entries(database):
+        assert (entry.status, entry.attempts, entry.sent_at, entry.last_error) == (OUTBOX_SENT, 1, START, None)
+
+
+async def test_failure_retries_with_backoff_then_succeeds(database):
+    add_entries(database)
+    send, clock = Sender(failures=2), Clock()
+    outbox = worker(send, clock)
+
+    await outbox.drain_once()
+    [entry] = entries(database)
+    assert (entry.status, entry.attempts) == (OUTBOX_PENDING, 1)
+    assert entry.next_attempt_at == START + timedelta(seconds=10)
+    assert entry.last_error == "Dify 不可用"
+
+    # 退避时间未到时不会被领取
+    clock.advance(9)
+    assert await outbox.drain_once() == 0
+
+    clock.advance(1)
+    await outbox.drain_once()
+    [entry] = entries(database)
+    assert (entry.status, entry.attempts) == (OUTBOX_PENDING, 2)
+    assert entry.next_attempt_at == clock.now + timedelta(seconds=20)
+
+    clock.advance(20)
+    await outbox.drain_once()
+    [entry] = entries(database)
+    assert (entry.status, entry.attempts, entry.last_error) == (OUTBOX_SENT, 3, None)
+    assert len(send.calls) == 3
+
+
+async def test_dead_after_max_attempts(database):
+    add_entries(database)
+    send, clock = Sender(failures=10), Clock()
+    outbox = worker(send, clock)
+
+    for _ in range(3):
+        await outbox.drain_once()
+        clock.advance(60)
+    [entry] = entries(database)
+    assert (entry.status, entry.attempts) == (OUTBOX_DEAD, 3)
+
+    # 放弃的通知不再投递
+    clock.advance(3600)
+    assert await outbox.drain_once() == 0
+    assert len(send.calls) == 3
+
+
+async def test_lease_hides_claimed_entries(database):
+    add_entries(database)
+    clock = Clock()
+    claimed = await worker(Sender(), clock)._claim()
+
+    assert [entry.attempts for entry in claimed] == [1]
+    [entry] = entries(database)
+    assert entry.next_attempt_at == START + timedelta(seconds=60)
+    assert await worker(Sender(), clock)._claim() == []
+
+
+async def test_stale_result_is_not_written_back(database):
+    add_entries(database)
+    clock = Clock()
+
+    async def send(alert_ids, inputs):
+        # 发送期间租约到期，另一个投递器重新领取了这条通知（attempts 已变化）
+        with database.begin() as conn:
+            conn.execute(update(NotificationOutbox).values(attempts=NotificationOutbox.attempts + 1))
+        raise RuntimeError("Dify 不可用")
+
+    await worker(send, clock, max_attempts=1).drain_once()
+
+    [entry] = entries(database)
+    assert (entry.status, entry.attempts, entry.last_error) == (OUTBOX_PENDING, 2, None)
@@ -0,0 +1,53 @@
+"""数据清理：每次运行删除的告警不超过 max_rows_per_run，最后一块只删除剩余额度"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+import main
+from database import Alert
+from retention import RetentionEngine
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2026, 10, 17, 10, 0, 0)
+
+
+def add_old_alerts(engine, count):
+    """写入两天前已处理的告警（都在可删除范围内）"""
+    with engine.begin() as conn:
+        conn.execute(insert(Alert), [
+            {
+                "input": "x",
+                "enterprise_name": "E",
+                "time": NOW - timedelta(days=2),
+                "alert_type": "告警恢复",
+                "template_name": "T",
+                "om_type": "告警恢复",
+                "alert_key": f"k{index}",
+                "idempotency_key": f"k{index}",
+                "processed": True,
+                "timeout_triggered": False,
+            }
+            for index in range(count)
+        ])
+    main.query_cache.clear()
+
+
+def alert_count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Alert)).scalar()
+
+
+async def test_run_stops_at_max_rows_per_run(database):
+    add_old_alerts(database, 2500)
+    deleted_cutoffs = []
+    engine = RetentionEngine(chunk_size=1000, max_rows_per_run=1500,
+                             on_alerts_deleted=deleted_cutoffs.append, clock=lambda: NOW)
+
+    assert await engine.run_once() == 1500
+    assert alert_count(database) == 1000
+    assert deleted_cutoffs == [datetime(2026, 10, 17)]
+
+    assert await engine.run_once() == 1000
+    assert alert_count(database) == 0
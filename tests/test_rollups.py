@@ -0,0 +1,109 @@
+"""统计汇总：接收告警和超时检查的增量更新与从 alerts 表重建的结果一致，重建不影响范围外的汇总行"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+import main
+from database import AlertRollup
+from rollups import COUNTER_COLUMNS, rebuild_rollups
+
+pytestmark = pytest.mark.anyio
+
+
+def alert(alert_key, om_type, time, enterprise_name="E"):
+    return {
+        "input": f"{om_type} {alert_key}",
+        "enterprise_name": enterprise_name,
+        "time": time,
+        "alert_type": om_type,
+        "template_name": "T",
+        "om_type": om_type,
+        "alert_key": alert_key,
+    }
+
+
+def rollups(engine):
+    """汇总表的内容 {(时间桶, 企业, OM 类型, 告警类型): (各计数)}，不包括 updated_at"""
+    with engine.connect() as conn:
+        rows = conn.execute(select(AlertRollup)).all()
+    return {
+        (row.bucket_start, row.enterprise_name, row.om_type, row.alert_type):
+            tuple(getattr(row, column) for column in COUNTER_COLUMNS)
+        for row in rows
+    }
+
+
+async def ingest(client):
+    """单条和批量接口写入告警（包括重放），并让一个"告警触发"超时"""
+    await client.post("/api/alert", json=alert("a", "告警触发", "2026-01-01 10:01:00"))
+    await client.post("/api/alert", json=alert("a", "告警触发", "2026-01-01 10:01:00"))  # 重放，不计数
+    await client.post("/api/alert", json=alert("a", "告警恢复", "2026-01-01 10:07:00"))
+    await client.post("/api/alerts/batch", json=[
+        alert("b", "告警触发", "2026-01-01 10:02:00"),
+        alert("b", "告警触发", "2026-01-01 10:02:00"),  # 批次内重复
+        alert("c", "告警触发", "2026-01-01 10:04:59", enterprise_name="F"),
+        alert("c", "告警恢复", "2026-01-01 10:06:00", enterprise_name="F"),
+    ])
+    # 告警时间远早于现在，没有恢复的 "b" 已超过检查窗口
+    await main.process_expired_triggers("[测试]")
+
+
+async def test_increments_match_rebuild(client, database):
+    await ingest(client)
+    incremental = rollups(database)
+
+    assert incremental[(datetime(2026, 1, 1, 10, 0), "E", "告警触发", "告警触发")] == (2, 2, 0, 1)
+    assert incremental[(datetime(2026, 1, 1, 10, 0), "F", "告警触发", "告警触发")] == (1, 1, 0, 0)
+    assert incremental[(datetime(2026, 1, 1, 10, 5), "E", "告警恢复", "告警恢复")] == (1, 0, 1, 0)
+
+    with database.begin() as conn:
+        rebuilt_rows = rebuild_rollups(conn)
+    assert rebuilt_rows == len(incremental)
+    assert rollups(database) == incremental
+
+
+async def test_stats_totals(client, database):
+    await ingest(client)
+
+    response = await client.get("/api/stats", params={"group_by": "enterprise_name"})
+
+    body = response.json()
+    assert body["totals"] == {"alert_count": 5, "trigger_count": 3, "recovery_count": 2, "timeout_count": 1}
+    assert [(row["enterprise_name"], row["alert_count"]) for row in body["rows"]] == [("E", 3), ("F", 2)]
+
+
+async def test_default_rebuild_keeps_rollups_outside_alert_range(client, database):
+    await ingest(client)
+    # alerts 中已被清理的历史数据只剩汇总行
+    history = (datetime(2025, 6, 1, 8, 0), "E", "告警触发", "告警触发")
+    with database.begin() as conn:
+        conn.execute(insert(AlertRollup).values(
+            bucket_start=history[0], enterprise_name="E", om_type="告警触发", alert_type="告警触发",
+            alert_count=7, trigger_count=7, recovery_count=0, timeout_count=2, updated_at=history[0]
+        ))
+    expected = rollups(database)
+
+    with database.begin() as conn:
+        rebuild_rollups(conn)
+
+    assert rollups(database) == expected
+    assert expected[history] == (7, 7, 0, 2)
+
+
+async def test_rebuild_range_fixes_drift_only_inside_range(client, database):
+    await ingest(client)
+    expected = rollups(database)
+    with database.begin() as conn:
+        conn.execute(AlertRollup.__table__.update().values(alert_count=AlertRollup.alert_count + 100))
+
+    with database.begin() as conn:
+        rebuild_rollups(conn, start=datetime(2026, 1, 1, 10, 3), end=datetime(2026, 1, 1, 10, 5))
+
+    # start 向下、end 向上对齐到 5 分钟时间桶：只重建 10:00 这个时间桶
+    drifted = rollups(database)
+    for key, counters in expected.items():
+        if key[0] == datetime(2026, 1, 1, 10, 0):
+            assert drifted[key] == counters
+        else:
+            assert drifted[key] == (counters[0] + 100, *counters[1:])
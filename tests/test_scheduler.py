@@ -0,0 +1,50 @@
+"""超时调度器：告警恢复取消的告警触发不再计入待检查数量，到期时也不会被处理"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from scheduler import DeadlineScheduler
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 10, 17, 10, 0, 0)
+
+
+async def noop(alert_ids):
+    pass
+
+
+def test_cancel_removes_pending_entries():
+    scheduler = DeadlineScheduler(noop)
+    for alert_id in range(1, 4):
+        scheduler.schedule(alert_id, START + timedelta(minutes=alert_id))
+
+    assert scheduler.cancel([2, 3, 99]) == 2
+    assert len(scheduler) == 1
+    assert scheduler._pop_due(START + timedelta(hours=1)) == [1]
+    assert len(scheduler) == 0
+
+
+async def test_recovery_cancels_scheduled_trigger(client, database):
+    main.timeout_scheduler.rebuild([])
+    trigger = {
+        "input": "🔴 **【告警触发】监控告警**",
+        "enterprise_name": "E",
+        "time": "2026-10-17 10:00:00",
+        "alert_type": "告警触发",
+        "template_name": "T",
+        "om_type": "告警触发",
+        "alert_key": "k1",
+    }
+    recovery = {**trigger, "om_type": "告警恢复", "alert_type": "告警恢复", "time": "2026-10-17 10:05:00"}
+
+    await client.post("/api/alert", json=trigger)
+    assert len(main.timeout_scheduler) == 1
+    await client.post("/api/alert", json=recovery)
+    assert len(main.timeout_scheduler) == 0
+
+    await client.post("/api/alerts/batch", json=[{**trigger, "alert_key": "k2"}])
+    assert len(main.timeout_scheduler) == 1
+    await client.post("/api/alerts/batch", json=[{**recovery, "alert_key": "k2"}])
+    assert len(main.timeout_scheduler) == 0
@@ -0,0 +1,64 @@
+"""超时检测：过期的告警触发写入发件箱，消息内容缺失时通知不带告警消息，也不转发占位文本"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+import main
+from database import Alert, NotificationOutbox
+
+pytestmark = pytest.mark.anyio
+
+ALERT_TIME = datetime(2026, 10, 17, 10, 0, 0)
+
+
+def add_expired_triggers(engine, rows):
+    """写入检查窗口已过期的告警触发，rows 为 [(alert_key, input, body_hash)]"""
+    with engine.begin() as conn:
+        conn.execute(insert(Alert), [
+            {
+                "input": input_text,
+                "body_hash": body_hash,
+                "enterprise_name": "E",
+                "time": ALERT_TIME,
+                "alert_type": "告警触发",
+                "template_name": "T",
+                "om_type": "告警触发",
+                "alert_key": alert_key,
+                "idempotency_key": alert_key,
+                "processed": False,
+                "timeout_triggered": False,
+                "deadline_at": ALERT_TIME + timedelta(minutes=1),
+            }
+            for alert_key, input_text, body_hash in rows
+        ])
+    main.query_cache.clear()
+
+
+def outbox_payloads(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(select(NotificationOutbox.payload).order_by(NotificationOutbox.alert_id)).scalars()
+        return [json.loads(payload) for payload in rows]
+
+
+async def test_timeout_payload_contains_message(database):
+    add_expired_triggers(database, [("k1", "告警消息", None)])
+
+    await main.process_expired_triggers("[测试]")
+
+    assert outbox_payloads(database) == [
+        {"input": "告警消息", "enterprise_name": "E", "time": "2026-10-17 10:00:00"}
+    ]
+
+
+async def test_missing_body_is_not_forwarded(database):
+    add_expired_triggers(database, [("k1", None, "0" * 64)])
+
+    await main.process_expired_triggers("[测试]")
+
+    payloads = outbox_payloads(database)
+    assert payloads == [{"input": "", "enterprise_name": "E", "time": "2026-10-17 10:00:00"}]
+    merged = main.merge_timeout_inputs(payloads)
+    assert "消息内容缺失" not in merged["input"]
+    assert merged["input"].endswith("[1] 告警时间: 2026-10-17 10:00:00")